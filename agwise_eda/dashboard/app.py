@@ -13,16 +13,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-# For ZIP code geocoding
-try:
-    from uszipcode import SearchEngine
-    USZIPCODE_AVAILABLE = True
-except ImportError:
-    USZIPCODE_AVAILABLE = False
-
 # Page configuration
 st.set_page_config(
     page_title="Soil Health EDA Dashboard",
@@ -65,6 +59,12 @@ st.markdown("""
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+from pipeline import (ZIP_CENTROIDS_PATH, build_sketches, cover_crop_summary, dataset_columns, dataset_signature,
+                      dataset_version, default_correlation_pair, geocode_zip_counts, health_factor_correlations, load_dataset,
+                      load_n_columns, load_or_build_cube, load_sketches, load_zip_geocoder, n_comparison,
+                      pair_correlation, savings_summary, unify_columns, valid_numeric_columns, variable_summary)
+from pipeline.economics import HANEY_COL, TRAD_COL
 DATA_FILE = BASE_DIR / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
 FEEDBACK_DIR = BASE_DIR / 'feedback'
 FEEDBACK_FILE = FEEDBACK_DIR / 'user_feedback.csv'
@@ -74,13 +74,37 @@ FEEDBACK_UPLOADS = FEEDBACK_DIR / 'uploads'
 FEEDBACK_DIR.mkdir(parents=True, exist_ok=True)
 FEEDBACK_UPLOADS.mkdir(parents=True, exist_ok=True)
 
-# Cache data loading
+# Cache data loading (keyed by the data files' size/mtime, so a re-ingest is picked up)
 @st.cache_data
-def load_data():
-    """Load and cache the dataset"""
-    df = pd.read_csv(DATA_FILE)
+def load_data(signature):
+    """Load and cache the dataset (columnar store when available, canonical columns,
+    numeric/date/category dtypes fixed at ingest). Only the pages that need
+    individual rows call this; the others are served from the cube."""
+    df = unify_columns(load_dataset(DATA_FILE))
     return df
 
+@st.cache_data
+def load_n_data(signature):
+    """Traditional and Haney N columns only, for the Economic Analysis page"""
+    return load_n_columns(DATA_FILE)
+
+@st.cache_data
+def load_columns(signature):
+    """Canonical column names of the dataset, read without loading any rows"""
+    return unify_columns(pd.DataFrame(columns=dataset_columns(DATA_FILE))).columns.tolist()
+
+@st.cache_data
+def load_cube(signature):
+    """Precomputed page aggregates for this dataset version (built at ingest,
+    rebuilt here only if missing or stale)"""
+    return load_or_build_cube(DATA_FILE, version=dataset_version(DATA_FILE))
+
+@st.cache_data
+def load_quantile_sketches(signature):
+    """Per-column quantile sketches written at ingest (built here if missing)"""
+    sketches = load_sketches(DATA_FILE)
+    return sketches if sketches is not None else build_sketches(load_data(signature))
+
 # Feedback system functions
 def save_feedback(page, feedback_type, message, uploaded_file=None):
     """Save user feedback to CSV file"""
@@ -121,7 +145,10 @@ def save_feedback(page, feedback_type, message, uploaded_file=None):
 
 # Load data
 try:
-    data = load_data()
+    signature = dataset_signature(DATA_FILE)
+    columns = load_columns(signature)
+    cube = load_cube(signature)
+    overview = cube['overview'].iloc[0]
     data_loaded = True
 except Exception as e:
     st.error(f"Error loading data: {e}")
@@ -133,11 +160,11 @@ if data_loaded:
                 unsafe_allow_html=True)
 
     # Count batches dynamically
-    n_batches = data['_source_batch'].nunique() if '_source_batch' in data.columns else 'Unknown'
+    n_batches = overview['batches'] if '_source_batch' in columns else 'Unknown'
 
     st.markdown(f"""
     <div class="info-box">
-    <b>Dataset Overview:</b> {len(data):,} samples | {len(data.columns)} variables |
+    <b>Dataset Overview:</b> {overview['rows']:,} samples | {overview['columns']} variables |
     {n_batches} batches | Interactive analysis of full soil health dataset
     </div>
     """, unsafe_allow_html=True)
@@ -163,7 +190,7 @@ if data_loaded:
     st.sidebar.info(f"""
     **About This Dashboard**
 
-    Interactive exploration of {len(data):,} soil samples from agricultural testing across 4 data batches.
+    Interactive exploration of {overview['rows']:,} soil samples from agricultural testing across 4 data batches.
 
     Built with:
     - Streamlit (UI)
@@ -227,31 +254,28 @@ if data_loaded:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            st.metric("Total Samples", f"{len(data):,}",
-                     delta=f"{len(data):,} samples")
+            st.metric("Total Samples", f"{overview['rows']:,}",
+                     delta=f"{overview['rows']:,} samples")
         with col2:
-            unique = len(data) - data.duplicated().sum()
-            dup_pct = (data.duplicated().sum() / len(data) * 100)
+            unique = overview['unique_rows']
+            dup_pct = (overview['duplicate_rows'] / overview['rows'] * 100)
             st.metric("Unique Samples", f"{unique:,}",
                      delta=f"-{dup_pct:.1f}% duplicates", delta_color="inverse")
         with col3:
-            st.metric("Variables", len(data.columns),
-                     delta=f"{len(data.columns)} total")
+            st.metric("Variables", overview['columns'],
+                     delta=f"{overview['columns']} total")
         with col4:
-            batch_col = '_source_batch'
-            if batch_col in data.columns:
-                n_batches = data[batch_col].nunique()
-                st.metric("Data Batches", n_batches)
+            if overview['batches'] > 0:
+                st.metric("Data Batches", overview['batches'])
 
         st.markdown("---")
 
         # Batch comparison
         st.subheader("📦 Batch Distribution")
-        if '_source_batch' in data.columns:
-            batch_counts = data['_source_batch'].value_counts().sort_index()
-
+        batch_counts = cube['batch_counts']
+        if len(batch_counts) > 0:
             fig = go.Figure(data=[
-                go.Bar(x=batch_counts.index, y=batch_counts.values,
+                go.Bar(x=batch_counts['_source_batch'], y=batch_counts['count'],
                       marker_color=['#2c5f2d', '#97c93d'])
             ])
             fig.update_layout(
@@ -267,139 +291,91 @@ if data_loaded:
         # Geographic Distribution
         st.subheader("🗺️ Geographic Distribution of Samples")
 
-        if 'Zip' in data.columns:
-            zip_data = data['Zip'].dropna()
-
-            if len(zip_data) > 0:
-                # Clean ZIP codes: handle both string and numeric formats
-                def clean_zip(z):
-                    try:
-                        z_str = str(z)
-                        if '.' in z_str:
-                            z_str = str(int(float(z_str)))
-                        return z_str.zfill(5) if z_str.isdigit() and len(z_str) <= 5 else None
-                    except:
-                        return None
-
-                zip_cleaned = zip_data.apply(clean_zip).dropna()
-
-                # Count samples by ZIP code
-                zip_counts = zip_cleaned.value_counts().reset_index()
-                zip_counts.columns = ['zip', 'count']
-
+        # Samples per 5-digit ZIP (normalized at ingest), most frequent first
+        zip_counts = cube['zip_counts']
+        if 'Zip' in columns or len(zip_counts) > 0:
+            if len(zip_counts) > 0:
                 # Display summary stats
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    st.metric("Samples with ZIP", f"{len(zip_cleaned):,}")
+                    st.metric("Samples with ZIP", f"{overview['zip_samples']:,}")
                 with col2:
                     st.metric("Unique ZIP Codes", f"{len(zip_counts):,}")
                 with col3:
                     st.metric("Most Common ZIP", str(zip_counts.iloc[0]['zip']))
                 with col4:
                     st.metric("Samples in Top ZIP", f"{zip_counts.iloc[0]['count']:,}")
+                if overview['zip_invalid'] > 0:
+                    st.caption(f"{overview['zip_invalid']:,} samples have a ZIP that is not a "
+                               "valid US ZIP code (e.g. Canadian postal codes) and are not mapped.")
 
-                # Create map visualization
-                if USZIPCODE_AVAILABLE:
-                    st.info("💡 Geocoding ZIP codes for map visualization... This may take a moment on first load.")
-
-                    # Cache the geocoding result
-                    @st.cache_data
-                    def geocode_zips(zip_counts_df):
-                        search = SearchEngine()
-                        geocoded = []
-
-                        for idx, row in zip_counts_df.head(200).iterrows():  # Limit to top 200 for performance
-                            try:
-                                # Handle both string and numeric ZIP codes
-                                zip_raw = row['zip']
-                                if pd.isna(zip_raw):
-                                    continue
-
-                                # Convert to string, handle float format
-                                zip_str = str(zip_raw)
-                                if '.' in zip_str:
-                                    zip_str = str(int(float(zip_str)))
-
-                                # Ensure 5-digit format
-                                zip_str = zip_str.zfill(5)
-
-                                # Only process valid 5-digit US ZIP codes
-                                if len(zip_str) == 5 and zip_str.isdigit():
-                                    result = search.by_zipcode(zip_str)
-                                    if result and result.lat and result.lng:
-                                        geocoded.append({
-                                            'zip': zip_str,
-                                            'count': row['count'],
-                                            'lat': result.lat,
-                                            'lng': result.lng,
-                                            'city': result.major_city or 'Unknown',
-                                            'state': result.state or 'Unknown'
-                                        })
-                            except (ValueError, TypeError) as e:
-                                # Skip invalid ZIP codes
-                                continue
-
-                        return pd.DataFrame(geocoded)
-
-                    try:
-                        geo_data = geocode_zips(zip_counts)
-
-                        if len(geo_data) > 0:
-                            # Create scatter map
-                            fig = px.scatter_geo(
-                                geo_data,
-                                lat='lat',
-                                lon='lng',
-                                size='count',
-                                hover_name='zip',
-                                hover_data={
-                                    'city': True,
-                                    'state': True,
-                                    'count': True,
-                                    'lat': ':.3f',
-                                    'lng': ':.3f'
-                                },
-                                title=f'Sample Distribution Across ZIP Codes (Top {len(geo_data)} ZIPs)',
-                                size_max=40,
-                                color='count',
-                                color_continuous_scale='Greens'
-                            )
+                # Bundled ZIP centroid table (or the uszipcode database when the
+                # table is missing), loaded once per server process
+                @st.cache_resource
+                def get_zip_geocoder():
+                    return load_zip_geocoder()
 
-                            fig.update_geos(
-                                scope='usa',
-                                showcountries=True,
-                                showsubunits=True,
-                                showlakes=True
-                            )
+                geocoder = get_zip_geocoder()
 
-                            fig.update_layout(
-                                height=600,
-                                geo=dict(
-                                    bgcolor='rgba(0,0,0,0)',
-                                    lakecolor='lightblue',
-                                    landcolor='white'
-                                )
+                # Create map visualization
+                if geocoder is not None:
+                    # Every unique ZIP is geocoded in one vectorized join
+                    geo_data = geocode_zip_counts(zip_counts, geocoder)
+
+                    if len(geo_data) > 0:
+                        # Create scatter map
+                        fig = px.scatter_geo(
+                            geo_data,
+                            lat='lat',
+                            lon='lng',
+                            size='count',
+                            hover_name='zip',
+                            hover_data={
+                                'city': True,
+                                'state': True,
+                                'count': True,
+                                'lat': ':.3f',
+                                'lng': ':.3f'
+                            },
+                            title=f'Sample Distribution Across ZIP Codes ({len(geo_data):,} of {len(zip_counts):,} ZIPs located)',
+                            size_max=40,
+                            color='count',
+                            color_continuous_scale='Greens'
+                        )
+
+                        fig.update_geos(
+                            scope='usa',
+                            showcountries=True,
+                            showsubunits=True,
+                            showlakes=True
+                        )
+
+                        fig.update_layout(
+                            height=600,
+                            geo=dict(
+                                bgcolor='rgba(0,0,0,0)',
+                                lakecolor='lightblue',
+                                landcolor='white'
                             )
+                        )
 
-                            st.plotly_chart(fig, use_container_width=True)
+                        st.plotly_chart(fig, use_container_width=True)
 
-                            # Show top 10 locations
-                            st.subheader("📍 Top 10 Sample Locations")
-                            top_10 = geo_data.nlargest(10, 'count')[['zip', 'city', 'state', 'count']]
-                            top_10.columns = ['ZIP Code', 'City', 'State', 'Sample Count']
-                            st.dataframe(top_10.reset_index(drop=True), use_container_width=True, hide_index=True)
-                        else:
-                            st.warning("Unable to geocode ZIP codes. Showing distribution table instead.")
-                            # Fallback to table
-                            st.dataframe(zip_counts.head(20), use_container_width=True)
-
-                    except Exception as e:
-                        st.warning(f"Map geocoding encountered an issue: {e}. Showing distribution table.")
+                        # Show top 10 locations
+                        st.subheader("📍 Top 10 Sample Locations")
+                        top_10 = geo_data.nlargest(10, 'count')[['zip', 'city', 'state', 'count']]
+                        top_10.columns = ['ZIP Code', 'City', 'State', 'Sample Count']
+                        st.dataframe(top_10.reset_index(drop=True), use_container_width=True, hide_index=True)
+                    else:
+                        st.warning("Unable to geocode ZIP codes. Showing distribution table instead.")
+                        # Fallback to table
                         st.dataframe(zip_counts.head(20), use_container_width=True)
 
                 else:
-                    # Fallback if uszipcode not available
-                    st.warning("⚠️ Geographic mapping requires the `uszipcode` package. Install it with: `pip install uszipcode`")
+                    # Fallback if neither the centroid table nor uszipcode is available
+                    st.warning(f"⚠️ Geographic mapping needs the ZIP centroid table ({ZIP_CENTROIDS_PATH.name}) "
+                               "or the `uszipcode` package. Build the table with: "
+                               "`python scripts/build_zip_centroids.py`")
 
                     st.subheader("📊 Top 20 ZIP Codes by Sample Count")
                     top_20 = zip_counts.head(20)
@@ -426,24 +402,20 @@ if data_loaded:
         # Key metrics statistics
         st.subheader("📊 Key Soil Metrics Statistics")
 
-        key_metrics = ['1:1 Soil pH', 'Organic Matter', 'CO2-C',
-                      'Soil Health Calculation', 'H3A Nitrate']
-        available_metrics = [col for col in key_metrics if col in data.columns]
+        metric_summary = cube['metric_summary']
 
-        if available_metrics:
+        if len(metric_summary) > 0:
             stats_data = []
-            for col in available_metrics:
-                values = pd.to_numeric(data[col], errors='coerce').dropna()
-                if len(values) > 0:
-                    stats_data.append({
-                        'Metric': col,
-                        'Count': f"{len(values):,}",
-                        'Mean': f"{values.mean():.2f}",
-                        'Median': f"{values.median():.2f}",
-                        'Std Dev': f"{values.std():.2f}",
-                        'Min': f"{values.min():.2f}",
-                        'Max': f"{values.max():.2f}"
-                    })
+            for row in metric_summary.itertuples(index=False):
+                stats_data.append({
+                    'Metric': row.metric,
+                    'Count': f"{row.count:,}",
+                    'Mean': f"{row.mean:.2f}",
+                    'Median': f"{row.median:.2f}",
+                    'Std Dev': f"{row.std:.2f}",
+                    'Min': f"{row.min:.2f}",
+                    'Max': f"{row.max:.2f}"
+                })
 
             stats_df = pd.DataFrame(stats_data)
             st.dataframe(stats_df, use_container_width=True, height=250)
@@ -454,23 +426,25 @@ if data_loaded:
     elif page == "🔬 Soil Health Analysis":
         st.header("🔬 Soil Health Score Analysis")
 
-        health_col = 'Soil Health Calculation' if 'Soil Health Calculation' in data.columns else 'Soil Health Score'
+        health_col = 'Soil Health Calculation'
+
+        metric_summary = cube['metric_summary'].set_index('metric')
 
-        if health_col in data.columns:
-            health_data = pd.to_numeric(data[health_col], errors='coerce').dropna()
+        if health_col in columns and health_col in metric_summary.index:
+            health_stats = metric_summary.loc[health_col]
 
             # Key metrics
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
-                st.metric("Mean Score", f"{health_data.mean():.2f}")
+                st.metric("Mean Score", f"{health_stats['mean']:.2f}")
             with col2:
-                st.metric("Median Score", f"{health_data.median():.2f}")
+                st.metric("Median Score", f"{health_stats['median']:.2f}")
             with col3:
-                st.metric("Std Dev", f"{health_data.std():.2f}")
+                st.metric("Std Dev", f"{health_stats['std']:.2f}")
             with col4:
-                st.metric("Min", f"{health_data.min():.2f}")
+                st.metric("Min", f"{health_stats['min']:.2f}")
             with col5:
-                st.metric("Max", f"{health_data.max():.2f}")
+                st.metric("Max", f"{health_stats['max']:.2f}")
 
             st.markdown("---")
 
@@ -478,17 +452,20 @@ if data_loaded:
             col1, col2 = st.columns([2, 1])
 
             with col1:
+                # 50-bin histogram precomputed in the cube
+                histogram = cube['health_histogram']
                 fig = go.Figure()
-                fig.add_trace(go.Histogram(
-                    x=health_data,
-                    nbinsx=50,
+                fig.add_trace(go.Bar(
+                    x=(histogram['left'] + histogram['right']) / 2,
+                    y=histogram['count'],
+                    width=histogram['right'] - histogram['left'],
                     name='Distribution',
                     marker_color='#2c5f2d',
                     opacity=0.7
                 ))
-                fig.add_vline(x=health_data.mean(), line_dash="dash",
+                fig.add_vline(x=health_stats['mean'], line_dash="dash",
                              line_color="red", annotation_text="Mean")
-                fig.add_vline(x=health_data.median(), line_dash="dash",
+                fig.add_vline(x=health_stats['median'], line_dash="dash",
                              line_color="blue", annotation_text="Median")
                 fig.update_layout(
                     title=f"{health_col} Distribution",
@@ -501,13 +478,10 @@ if data_loaded:
             with col2:
                 # Categories
                 st.subheader("Score Categories")
-                bins = [0, 2, 5, 10, 150]
-                labels = ['Poor (0-2)', 'Fair (2-5)', 'Good (5-10)', 'Excellent (10+)']
-                categories = pd.cut(health_data, bins=bins, labels=labels)
-                cat_counts = categories.value_counts().sort_index()
+                cat_counts = cube['health_categories']
 
                 fig = go.Figure(data=[
-                    go.Pie(labels=cat_counts.index, values=cat_counts.values,
+                    go.Pie(labels=cat_counts['category'], values=cat_counts['count'],
                           marker_colors=['#d32f2f', '#ff9800', '#ffc107', '#4caf50'])
                 ])
                 fig.update_layout(height=400, title="Health Categories")
@@ -516,34 +490,22 @@ if data_loaded:
             # Factors analysis
             st.subheader("🎯 Top Factors Correlated with Soil Health")
 
-            analysis_cols = ['CO2-C', 'Organic Matter', '1:1 Soil pH',
-                           'H3A ICAP Potassium', 'H3A ICAP Calcium']
-            available_analysis = [col for col in analysis_cols
-                                if col in data.columns and data[col].notna().sum() > 100]
-
-            if available_analysis:
-                correlations = []
-                for col in available_analysis:
-                    temp_df = data[[health_col, col]].apply(pd.to_numeric, errors='coerce').dropna()
-                    if len(temp_df) > 50:
-                        corr = temp_df[health_col].corr(temp_df[col])
-                        correlations.append({'Factor': col, 'Correlation': corr})
-
-                if correlations:
-                    corr_df = pd.DataFrame(correlations).sort_values('Correlation', ascending=False)
+            data = load_data(signature)
+            corr_df = health_factor_correlations(data, health_col)
 
-                    fig = go.Figure(data=[
-                        go.Bar(x=corr_df['Factor'], y=corr_df['Correlation'],
-                              marker_color=['#2c5f2d' if x > 0 else '#d32f2f'
-                                          for x in corr_df['Correlation']])
-                    ])
-                    fig.update_layout(
-                        title="Correlation with Soil Health",
-                        xaxis_title="Factor",
-                        yaxis_title="Correlation Coefficient",
-                        height=400
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+            if len(corr_df) > 0:
+                fig = go.Figure(data=[
+                    go.Bar(x=corr_df['Factor'], y=corr_df['Correlation'],
+                          marker_color=['#2c5f2d' if x > 0 else '#d32f2f'
+                                      for x in corr_df['Correlation']])
+                ])
+                fig.update_layout(
+                    title="Correlation with Soil Health",
+                    xaxis_title="Factor",
+                    yaxis_title="Correlation Coefficient",
+                    height=400
+                )
+                st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("Soil Health Score data not available in dataset.")
 
@@ -553,22 +515,15 @@ if data_loaded:
     elif page == "🌾 Cover Crop Analysis":
         st.header("🌾 Cover Crop Mix Analysis")
 
-        cover_cols = ['Cover Crop Mix', 'Cover crop mix']
-        cover_col = None
-        for col in cover_cols:
-            if col in data.columns and data[col].notna().sum() > 50:
-                cover_col = col
-                break
+        cover_col = 'Cover Crop Mix' if 'Cover Crop Mix' in columns else None
 
         if cover_col:
-            cover_data = data[cover_col].dropna()
-
             # Distribution
             st.subheader("📊 Cover Crop Mix Distribution")
-            value_counts = cover_data.value_counts()
+            value_counts = cube['cover_counts']
 
             fig = go.Figure(data=[
-                go.Bar(x=value_counts.index, y=value_counts.values,
+                go.Bar(x=value_counts[cover_col], y=value_counts['count'],
                       marker_color='#2c5f2d')
             ])
             fig.update_layout(
@@ -581,22 +536,21 @@ if data_loaded:
             st.plotly_chart(fig, use_container_width=True)
 
             # Health by cover crop
-            health_col = 'Soil Health Calculation' if 'Soil Health Calculation' in data.columns else 'Soil Health Score'
+            health_col = 'Soil Health Calculation'
 
-            if health_col in data.columns:
+            if health_col in columns:
                 st.subheader("🌱 Soil Health by Cover Crop Mix")
 
-                cover_health = data[[cover_col, health_col]].copy()
-                cover_health[health_col] = pd.to_numeric(cover_health[health_col], errors='coerce')
-                cover_health = cover_health.dropna()
+                cover_health = cube['cover_health']
 
                 if len(cover_health) > 0:
-                    # Box plot
+                    # Box plot drawn from the precomputed quartiles and 1.5×IQR whiskers
                     fig = go.Figure()
 
-                    for mix in sorted(cover_health[cover_col].unique()):
-                        mix_data = cover_health[cover_health[cover_col] == mix][health_col]
-                        fig.add_trace(go.Box(y=mix_data, name=mix))
+                    for mix, row in cover_health.set_index(cover_col).iterrows():
+                        fig.add_trace(go.Box(name=mix, q1=[row['q1']], median=[row['median']],
+                                             q3=[row['q3']], lowerfence=[row['lower_whisker']],
+                                             upperfence=[row['upper_whisker']]))
 
                     fig.update_layout(
                         title=f"{health_col} by Cover Crop Mix",
@@ -609,9 +563,7 @@ if data_loaded:
                     st.plotly_chart(fig, use_container_width=True)
 
                     # Summary statistics
-                    summary = cover_health.groupby(cover_col)[health_col].agg([
-                        'count', 'mean', 'median', 'std', 'min', 'max'
-                    ]).round(2).sort_values('mean', ascending=False)
+                    summary = cover_crop_summary(cover_health, cover_col)
 
                     st.subheader("📈 Summary Statistics by Cover Crop")
                     st.dataframe(summary, use_container_width=True)
@@ -624,12 +576,11 @@ if data_loaded:
     elif page == "💰 Economic Analysis":
         st.header("💰 Traditional vs Haney Test Economic Analysis")
 
-        trad_col = 'Traditional N'
-        haney_col = 'Haney Test N'
-
-        if trad_col in data.columns and haney_col in data.columns:
-            comparison = data[[trad_col, haney_col]].apply(pd.to_numeric, errors='coerce').dropna()
+        trad_col = TRAD_COL
+        haney_col = HANEY_COL
+        comparison = n_comparison(load_n_data(signature))
 
+        if comparison is not None:
             if len(comparison) > 0:
                 # Key metrics
                 col1, col2, col3, col4 = st.columns(4)
@@ -703,16 +654,15 @@ if data_loaded:
 
                 n_cost = st.slider("Nitrogen Cost ($/lb)", 0.5, 2.0, 1.0, 0.1)
 
-                difference = comparison[haney_col] - comparison[trad_col]
-                cost_savings = difference * n_cost
+                cost_savings = savings_summary(comparison, n_cost)
 
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Avg Savings/Sample", f"${cost_savings.mean():.2f}")
+                    st.metric("Avg Savings/Sample", f"${cost_savings['mean']:.2f}")
                 with col2:
-                    st.metric("Median Savings/Sample", f"${cost_savings.median():.2f}")
+                    st.metric("Median Savings/Sample", f"${cost_savings['median']:.2f}")
                 with col3:
-                    st.metric("Total Dataset Savings", f"${cost_savings.sum():,.2f}")
+                    st.metric("Total Dataset Savings", f"${cost_savings['total']:,.2f}")
         else:
             st.warning("Traditional vs Haney test data not available.")
 
@@ -722,36 +672,33 @@ if data_loaded:
     elif page == "🔗 Correlation Explorer":
         st.header("🔗 Correlation Explorer")
 
-        # Select variables for correlation
-        numeric_cols = data.select_dtypes(include=[np.number]).columns.tolist()
-        # Filter to columns with sufficient data
-        valid_cols = [col for col in numeric_cols
-                     if data[col].notna().sum() > 100 and col not in ['_source_file', '_source_batch']]
+        # Numeric columns with sufficient data
+        data = load_data(signature)
+        valid_cols = valid_numeric_columns(data)
+        default1, default2 = default_correlation_pair(valid_cols)
 
         st.subheader("Select Variables to Analyze")
 
         col1, col2 = st.columns(2)
 
         with col1:
-            var1 = st.selectbox("Variable 1:", valid_cols,
-                               index=valid_cols.index('Soil Health Calculation')
-                               if 'Soil Health Calculation' in valid_cols else 0)
+            var1 = st.selectbox("Variable 1:", valid_cols, index=default1)
 
         with col2:
-            var2 = st.selectbox("Variable 2:", valid_cols,
-                               index=valid_cols.index('CO2-C')
-                               if 'CO2-C' in valid_cols else 1)
+            var2 = st.selectbox("Variable 2:", valid_cols, index=default2)
 
         if var1 and var2:
-            corr_data = data[[var1, var2]].apply(pd.to_numeric, errors='coerce').dropna()
+            # r over the shared rows; plot sample of up to 2,000 rows for performance
+            pair = pair_correlation(data, var1, var2)
 
-            if len(corr_data) > 0:
-                correlation = corr_data[var1].corr(corr_data[var2])
+            if pair is not None:
+                correlation = pair['r']
+                plot_data = pair['plot_data']
 
                 # Display correlation
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Sample Size", f"{len(corr_data):,}")
+                    st.metric("Sample Size", f"{pair['n']:,}")
                 with col2:
                     corr_color = "normal" if abs(correlation) < 0.5 else "inverse" if correlation < 0 else "normal"
                     st.metric("Correlation (r)", f"{correlation:.3f}")
@@ -762,12 +709,6 @@ if data_loaded:
                     st.metric("Strength", strength)
 
                 # Scatter plot
-                # Sample for performance
-                if len(corr_data) > 2000:
-                    plot_data = corr_data.sample(2000, random_state=42)
-                else:
-                    plot_data = corr_data
-
                 fig = go.Figure()
                 fig.add_trace(go.Scatter(
                     x=plot_data[var1],
@@ -784,8 +725,7 @@ if data_loaded:
                 ))
 
                 # Add regression line
-                z = np.polyfit(plot_data[var1], plot_data[var2], 1)
-                p = np.poly1d(z)
+                p = np.poly1d(pair['fit'])
                 x_line = np.linspace(plot_data[var1].min(), plot_data[var1].max(), 100)
                 fig.add_trace(go.Scatter(
                     x=x_line, y=p(x_line),
@@ -813,30 +753,31 @@ if data_loaded:
         """)
 
         # Variable selection
-        numeric_cols = data.select_dtypes(include=[np.number]).columns.tolist()
-        valid_cols = [col for col in numeric_cols
-                     if data[col].notna().sum() > 100]
+        data = load_data(signature)
+        valid_cols = valid_numeric_columns(data)
 
         st.subheader("🔍 Variable Distribution Explorer")
 
         selected_var = st.selectbox("Select Variable to Analyze:", valid_cols)
 
         if selected_var:
-            var_data = pd.to_numeric(data[selected_var], errors='coerce').dropna()
+            var_data = data[selected_var].dropna()
+            # Median and percentiles come from the column's ingest-time sketch
+            var_summary = variable_summary(var_data, load_quantile_sketches(signature).get(selected_var))
+            median = var_summary['median']
 
             # Statistics
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
-                st.metric("Count", f"{len(var_data):,}")
+                st.metric("Count", f"{var_summary['count']:,}")
             with col2:
-                st.metric("Mean", f"{var_data.mean():.2f}")
+                st.metric("Mean", f"{var_summary['mean']:.2f}")
             with col3:
-                st.metric("Median", f"{var_data.median():.2f}")
+                st.metric("Median", f"{median:.2f}")
             with col4:
-                st.metric("Std Dev", f"{var_data.std():.2f}")
+                st.metric("Std Dev", f"{var_summary['std']:.2f}")
             with col5:
-                cv = (var_data.std() / var_data.mean() * 100) if var_data.mean() != 0 else 0
-                st.metric("CV", f"{cv:.1f}%")
+                st.metric("CV", f"{var_summary['cv']:.1f}%")
 
             # Visualization options
             viz_type = st.radio("Visualization Type:",
@@ -846,9 +787,9 @@ if data_loaded:
                 bins = st.slider("Number of Bins:", 10, 100, 50)
                 fig = go.Figure(data=[go.Histogram(x=var_data, nbinsx=bins,
                                                    marker_color='#2c5f2d')])
-                fig.add_vline(x=var_data.mean(), line_dash="dash",
+                fig.add_vline(x=var_summary['mean'], line_dash="dash",
                              line_color="red", annotation_text="Mean")
-                fig.add_vline(x=var_data.median(), line_dash="dash",
+                fig.add_vline(x=median, line_dash="dash",
                              line_color="blue", annotation_text="Median")
 
             elif viz_type == "Box Plot":
@@ -868,11 +809,10 @@ if data_loaded:
 
             # Percentiles
             st.subheader("📊 Percentile Distribution")
-            percentiles = [0, 10, 25, 50, 75, 90, 100]
-            percentile_vals = [var_data.quantile(p/100) for p in percentiles]
+            percentile_vals = var_summary['percentiles']
 
             perc_df = pd.DataFrame({
-                'Percentile': [f"{p}th" for p in percentiles],
+                'Percentile': [f"{p}th" for p in percentile_vals.index],
                 'Value': [f"{v:.2f}" for v in percentile_vals]
             })
             st.dataframe(perc_df, use_container_width=True)
@@ -954,7 +894,7 @@ if data_loaded:
         # Summary metrics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Samples", f"{len(data):,}")
+            st.metric("Total Samples", f"{overview['rows']:,}")
         with col2:
             st.metric("Data Batches", "4")
         with col3:
@@ -12,6 +12,20 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from pipeline import (ECONOMIC_SCENARIOS, SCENARIO_FIELD_SIZES, SCENARIO_N_PRICES, SENSITIVITY_RANGES,
+                      dataset_columns, dataset_signature, economic_model, group_scores, load_dataset,
+                      load_n_columns, load_scores, n_difference_summary, roi_simulation, scenario_grid_bytes,
+                      scenario_grid_size, scenario_matrix, sensitivity_curve, simulation_bounds,
+                      simulation_distributions, write_scenario_grid)
+from pipeline.economics import HANEY_COL, TRAD_COL
+
+DATA_FILE = Path(__file__).parent.parent.parent / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
+EXPORT_DIR = Path(__file__).parent.parent.parent / 'outputs' / 'tables'
+# Grids up to this many scenarios are offered as a download; larger ones are written to EXPORT_DIR
+DOWNLOAD_LIMIT_ROWS = 200_000
 
 st.set_page_config(page_title="Economic Analysis", page_icon="💰", layout="wide")
 
@@ -48,21 +62,20 @@ st.markdown("""
 st.markdown("<h1 style='color: #2c5f2d;'>💰 Economic Analysis: Soil Testing ROI</h1>", unsafe_allow_html=True)
 st.markdown("### Interactive What-If Simulation for Haney vs Traditional Testing")
 
-# Load data
+# Load data (keyed by the data files' size/mtime, so a re-ingest is picked up)
 @st.cache_data
-def load_data():
-    data_file = Path(__file__).parent.parent.parent / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
-    df = pd.read_csv(data_file)
-    return df
+def load_data(signature):
+    """Traditional and Haney N only, under their canonical names."""
+    return load_n_columns(DATA_FILE)
 
 try:
-    df = load_data()
+    df = load_data(dataset_signature(DATA_FILE))
     st.success(f"✓ Loaded {len(df):,} soil samples for analysis")
 except:
     st.error("Could not load data. Using synthetic data for demonstration.")
     df = pd.DataFrame({
-        'Traditional N Rec': np.random.normal(27, 15, 1000),
-        'Available N (Haney)': np.random.normal(60, 35, 1000)
+        TRAD_COL: np.random.normal(27, 15, 1000),
+        HANEY_COL: np.random.normal(60, 35, 1000)
     })
 
 # ============================================================================
@@ -235,90 +248,57 @@ with st.expander("📐 View Detailed Equations", expanded=False):
 st.markdown("---")
 st.markdown("## 📊 Analysis Based on Your Data")
 
-# Get actual nitrogen data
-trad_col = None
-haney_col = None
-
-for col in df.columns:
-    if 'traditional' in col.lower() and 'rec' in col.lower():
-        trad_col = col
-    if 'available n' in col.lower() or ('haney' in col.lower() and 'n' in col.lower()):
-        haney_col = col
+# Get actual nitrogen data (literature estimates when there are no pairs)
+n_summary = n_difference_summary(df)
+traditional_n_mean = n_summary['traditional_mean']
+haney_n_mean = n_summary['haney_mean']
+n_difference_mean = n_summary['difference_mean']
+n_difference_median = n_summary['difference_median']
+n_differences = n_summary['differences']
 
-if trad_col and haney_col:
-    # Filter valid data
-    valid_data = df[[trad_col, haney_col]].dropna()
-
-    if len(valid_data) > 0:
-        traditional_n_mean = valid_data[trad_col].mean()
-        haney_n_mean = valid_data[haney_col].mean()
-        n_difference_mean = haney_n_mean - traditional_n_mean
-        n_difference_median = valid_data[haney_col].median() - valid_data[trad_col].median()
-
-        st.success(f"✓ Using actual data: {len(valid_data):,} samples with both Traditional and Haney N values")
-    else:
-        st.warning("Using estimated values based on literature")
-        traditional_n_mean = 27.0
-        haney_n_mean = 60.0
-        n_difference_mean = 33.0
-        n_difference_median = 31.0
-else:
-    traditional_n_mean = 27.0
-    haney_n_mean = 60.0
-    n_difference_mean = 33.0
-    n_difference_median = 31.0
+if n_summary['samples'] > 0:
+    st.success(f"✓ Using actual data: {n_summary['samples']:,} samples with both Traditional and Haney N values")
+elif TRAD_COL in df.columns and HANEY_COL in df.columns:
+    st.warning("Using estimated values based on literature")
 
 # ============================================================================
 # SECTION 4: ECONOMIC CALCULATIONS
 # ============================================================================
 
+# Every slider but ΔN; economic_model() broadcasts any of them given as arrays
+model_params = dict(
+    nitrogen_price=nitrogen_price, haney_cost=haney_cost, traditional_cost=traditional_cost,
+    samples_per_field=samples_per_field, num_depths=num_depths,
+    testing_frequency_years=testing_frequency_years, acres_per_field=acres_per_field,
+    application_cost=application_cost, n_response_efficiency=n_response_efficiency,
+    yield_response_per_lb_n=yield_response_per_lb_n, crop_price=corn_price,
+    environmental_cost=environmental_cost,
+)
+model = {name: float(value) for name, value in economic_model(n_difference_mean, **model_params).items()}
+
 # Total samples needed
 total_samples_per_field = samples_per_field * num_depths
-annual_test_cost_traditional = (traditional_cost * total_samples_per_field) / testing_frequency_years
-annual_test_cost_haney = (haney_cost * total_samples_per_field) / testing_frequency_years
-additional_test_cost = annual_test_cost_haney - annual_test_cost_traditional
+additional_test_cost = model['additional_test_cost_per_field']
 
 # Per acre testing cost
-test_cost_per_acre_traditional = annual_test_cost_traditional / acres_per_field
-test_cost_per_acre_haney = annual_test_cost_haney / acres_per_field
-
-# Nitrogen savings
-fertilizer_savings_per_acre = n_difference_mean * nitrogen_price
-application_savings_per_acre = (n_difference_mean / 100) * application_cost if n_difference_mean > 10 else 0
-
-# Yield impact (assuming better precision with Haney)
-# Conservative: assume 20% of excess N was actually needed, 80% was waste
-precision_value_per_acre = (n_difference_mean * 0.2 * (n_response_efficiency/100) *
-                            yield_response_per_lb_n * corn_price)
-
-# Environmental savings
-environmental_savings_per_acre = abs(n_difference_mean) * environmental_cost
+test_cost_per_acre_traditional = model['test_cost_traditional_per_acre']
+test_cost_per_acre_haney = model['test_cost_haney_per_acre']
 
-# Total savings
-total_savings_per_acre = (fertilizer_savings_per_acre +
-                         application_savings_per_acre +
-                         precision_value_per_acre +
-                         environmental_savings_per_acre)
-
-net_benefit_per_acre = total_savings_per_acre - (test_cost_per_acre_haney - test_cost_per_acre_traditional)
+# Savings per acre
+fertilizer_savings_per_acre = model['fertilizer_savings_per_acre']
+application_savings_per_acre = model['application_savings_per_acre']
+precision_value_per_acre = model['precision_value_per_acre']
+environmental_savings_per_acre = model['environmental_savings_per_acre']
+total_savings_per_acre = model['total_savings_per_acre']
+net_benefit_per_acre = model['net_benefit_per_acre']
 
 # Field level
-net_benefit_per_field = net_benefit_per_acre * acres_per_field
+net_benefit_per_field = model['net_benefit_per_field']
 total_field_savings = net_benefit_per_field * testing_frequency_years
 
-# Break-even
-if fertilizer_savings_per_acre > 0:
-    breakeven_acres = additional_test_cost / fertilizer_savings_per_acre
-else:
-    breakeven_acres = float('inf')
-
-# ROI
-if additional_test_cost > 0:
-    roi_1_year = (net_benefit_per_acre * acres_per_field) / additional_test_cost * 100
-    roi_3_year = (net_benefit_per_acre * acres_per_field * 3) / (additional_test_cost * 3) * 100
-else:
-    roi_1_year = 0
-    roi_3_year = 0
+# Break-even and ROI
+breakeven_acres = model['breakeven_acres']
+roi_1_year = model['roi_percent']
 
 # ============================================================================
 # SECTION 5: RESULTS DASHBOARD
@@ -469,54 +449,17 @@ sensitivity_var = st.selectbox(
     ["Nitrogen Price", "Field Size", "N Difference", "Haney Test Cost", "Testing Frequency"]
 )
 
-if sensitivity_var == "Nitrogen Price":
-    x_range = np.linspace(0.40, 1.50, 50)
-    y_values = [(n_difference_mean * x - (test_cost_per_acre_haney - test_cost_per_acre_traditional))
-                for x in x_range]
-    x_label = "Nitrogen Price ($/lb)"
-    current_val = nitrogen_price
-
-elif sensitivity_var == "Field Size":
-    x_range = np.linspace(10, 500, 50)
-    y_values = []
-    for acres in x_range:
-        test_cost_diff = ((haney_cost - traditional_cost) * total_samples_per_field / testing_frequency_years) / acres
-        savings = fertilizer_savings_per_acre + application_savings_per_acre + precision_value_per_acre + environmental_savings_per_acre
-        y_values.append(savings - test_cost_diff)
-    x_label = "Field Size (acres)"
-    current_val = acres_per_field
-
-elif sensitivity_var == "N Difference":
-    x_range = np.linspace(0, 80, 50)
-    y_values = []
-    for delta_n in x_range:
-        fert_save = delta_n * nitrogen_price
-        app_save = (delta_n / 100) * application_cost if delta_n > 10 else 0
-        prec_val = (delta_n * 0.2 * (n_response_efficiency/100) * yield_response_per_lb_n * corn_price)
-        env_save = delta_n * environmental_cost
-        y_values.append(fert_save + app_save + prec_val + env_save - (test_cost_per_acre_haney - test_cost_per_acre_traditional))
-    x_label = "N Difference: Haney - Traditional (lbs/acre)"
-    current_val = n_difference_mean
-
-elif sensitivity_var == "Haney Test Cost":
-    x_range = np.linspace(30, 100, 50)
-    y_values = []
-    for cost in x_range:
-        test_cost_diff = ((cost - traditional_cost) * total_samples_per_field / testing_frequency_years) / acres_per_field
-        savings = fertilizer_savings_per_acre + application_savings_per_acre + precision_value_per_acre + environmental_savings_per_acre
-        y_values.append(savings - test_cost_diff)
-    x_label = "Haney Test Cost ($/sample)"
-    current_val = haney_cost
-
-else:  # Testing Frequency
-    x_range = np.linspace(1, 5, 5)
-    y_values = []
-    for freq in x_range:
-        test_cost_diff = ((haney_cost - traditional_cost) * total_samples_per_field / freq) / acres_per_field
-        savings = fertilizer_savings_per_acre + application_savings_per_acre + precision_value_per_acre + environmental_savings_per_acre
-        y_values.append(savings - test_cost_diff)
-    x_label = "Testing Frequency (years)"
-    current_val = testing_frequency_years
+# Variable -> (model parameter, axis label, current value); sweeps are SENSITIVITY_RANGES
+sensitivity_sweeps = {
+    "Nitrogen Price": ('nitrogen_price', "Nitrogen Price ($/lb)", nitrogen_price),
+    "Field Size": ('acres_per_field', "Field Size (acres)", acres_per_field),
+    "N Difference": ('n_difference', "N Difference: Haney - Traditional (lbs/acre)", n_difference_mean),
+    "Haney Test Cost": ('haney_cost', "Haney Test Cost ($/sample)", haney_cost),
+    "Testing Frequency": ('testing_frequency_years', "Testing Frequency (years)", testing_frequency_years),
+}
+param, x_label, current_val = sensitivity_sweeps[sensitivity_var]
+x_range = SENSITIVITY_RANGES[param]
+y_values = sensitivity_curve(n_difference_mean, model_params, param)
 
 fig_sensitivity = go.Figure()
 
@@ -549,26 +492,18 @@ st.plotly_chart(fig_sensitivity, use_container_width=True)
 # Visualization 3: Multi-variable scenario matrix
 st.markdown("### 🎲 Scenario Matrix: Field Size × Nitrogen Price")
 
-field_sizes = np.array([20, 40, 80, 160, 320])
-n_prices = np.array([0.50, 0.65, 0.75, 0.90, 1.20])
-
-scenario_matrix = np.zeros((len(n_prices), len(field_sizes)))
+field_sizes = SCENARIO_FIELD_SIZES
+n_prices = SCENARIO_N_PRICES
 
-for i, n_price in enumerate(n_prices):
-    for j, field_size in enumerate(field_sizes):
-        test_cost_diff = ((haney_cost - traditional_cost) * total_samples_per_field / testing_frequency_years) / field_size
-        fert_save = n_difference_mean * n_price
-        app_save = (n_difference_mean / 100) * application_cost if n_difference_mean > 10 else 0
-        prec_val = (n_difference_mean * 0.2 * (n_response_efficiency/100) * yield_response_per_lb_n * corn_price)
-        env_save = n_difference_mean * environmental_cost
-        scenario_matrix[i, j] = fert_save + app_save + prec_val + env_save - test_cost_diff
+# Rows: nitrogen price, columns: field size
+net_benefit_matrix = scenario_matrix(n_difference_mean, model_params, n_prices, field_sizes)
 
 fig_heatmap = go.Figure(data=go.Heatmap(
-    z=scenario_matrix,
+    z=net_benefit_matrix,
     x=field_sizes,
     y=n_prices,
     colorscale='RdYlGn',
-    text=np.round(scenario_matrix, 2),
+    text=np.round(net_benefit_matrix, 2),
     texttemplate='$%{text}',
     textfont={"size":12},
     colorbar=dict(title="Net Benefit<br>($/acre)")
@@ -583,6 +518,135 @@ fig_heatmap.update_layout(
 
 st.plotly_chart(fig_heatmap, use_container_width=True)
 
+# Visualization 4: Monte Carlo simulation
+st.markdown("### 🎰 Monte Carlo ROI Simulation")
+st.markdown(
+    "Each trial is one field: its N difference is the mean of its samples drawn from the per-sample "
+    "Haney vs Traditional differences in the data, and prices and costs are drawn from the ranges below "
+    "(triangular, peaking at the current slider value)."
+)
+
+@st.cache_data
+def run_simulation(n_differences, distributions, trials, seed):
+    return roi_simulation(n_differences, distributions, trials=trials, seed=seed)
+
+sim_bounds = simulation_bounds(model_params)
+
+with st.expander("⚙️ Simulation Settings", expanded=False):
+    sim_col1, sim_col2 = st.columns(2)
+    with sim_col1:
+        sim_trials = st.select_slider("Trials", options=[100_000, 250_000, 500_000, 1_000_000], value=100_000)
+        sim_n_price = st.slider("Nitrogen Price Range ($/lb N)", 0.20, 2.00, sim_bounds['nitrogen_price'], 0.05)
+        sim_crop_price = st.slider("Crop Price Range ($/bu)", 2.0, 10.0, sim_bounds['crop_price'], 0.25)
+    with sim_col2:
+        sim_haney_cost = st.slider("Haney Test Cost Range ($/sample)", 20.0, 120.0, sim_bounds['haney_cost'], 5.0)
+        sim_application_cost = st.slider("Application Cost Range ($/acre)", 0.0, 40.0,
+                                         sim_bounds['application_cost'], 1.0)
+        sim_seed = st.number_input("Random Seed", min_value=0, value=42, step=1)
+
+# Triangular draws within each range, peaking at the current slider value
+sim_distributions = simulation_distributions(model_params, {
+    'nitrogen_price': sim_n_price,
+    'crop_price': sim_crop_price,
+    'haney_cost': sim_haney_cost,
+    'application_cost': sim_application_cost,
+})
+
+sim_trials_run, sim_positive, sim_never, sim_percentiles, sim_roi = run_simulation(
+    n_differences, sim_distributions, sim_trials, int(sim_seed))
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("P(Net Benefit > 0)", f"{sim_positive * 100:.1f}%", delta=f"{sim_trials_run:,} trials")
+with col2:
+    st.metric("Median ROI", f"{sim_percentiles.loc['roi_percent', 'P50']:.0f}%",
+              delta=f"P5-P95: {sim_percentiles.loc['roi_percent', 'P5']:.0f}% to "
+                    f"{sim_percentiles.loc['roi_percent', 'P95']:.0f}%", delta_color="off")
+with col3:
+    st.metric("Median Net Benefit", f"${sim_percentiles.loc['net_benefit_per_acre', 'P50']:.2f}/acre")
+with col4:
+    st.metric("Median Break-Even", f"{sim_percentiles.loc['breakeven_acres', 'P50']:.1f} acres",
+              delta=f"{sim_never * 100:.1f}% never break even", delta_color="off")
+
+fig_simulation = go.Figure(go.Histogram(x=sim_roi, nbinsx=60, histnorm='percent', marker_color='#2e7d32',
+                                        name='ROI'))
+fig_simulation.add_vline(x=0, line_dash="dash", line_color="red",
+                         annotation_text="Break-Even", annotation_position="top")
+fig_simulation.update_layout(
+    title="Distribution of Simulated First-Year ROI",
+    xaxis_title="ROI (%)",
+    yaxis_title="Share of Trials (%)",
+    height=450,
+    showlegend=False
+)
+
+st.plotly_chart(fig_simulation, use_container_width=True)
+
+st.dataframe(sim_percentiles.rename(index={
+    'roi_percent': 'ROI (%)',
+    'net_benefit_per_acre': 'Net Benefit ($/acre)',
+    'net_benefit_per_field': 'Net Benefit ($/field)',
+    'breakeven_acres': 'Break-Even Field Size (acres)',
+    'n_difference': 'Field N Difference (lbs/acre)',
+}).round(2), use_container_width=True)
+
+# Visualization 5: stored per-sample scores by group
+st.markdown("### 🗺️ Net Benefit by ZIP, Crop or Batch")
+st.markdown(
+    "Every sample is scored at ingest under named price/cost scenarios, taking its own "
+    "Haney - Traditional N difference; these scores use the scenario's parameters, not the sliders above."
+)
+
+SCORE_GROUPS = {"ZIP Code": 'zip5', "Crop": 'Crop 1', "Batch": '_source_batch'}
+
+@st.cache_data
+def load_group_keys(signature):
+    available = dataset_columns(DATA_FILE)
+    return load_dataset(DATA_FILE, columns=[col for col in SCORE_GROUPS.values() if col in available])
+
+@st.cache_data
+def load_grouped_scores(signature, scenario, group_col):
+    scores = load_scores(DATA_FILE)
+    keys = load_group_keys(signature)
+    if scores is None or group_col not in keys.columns or len(scores) != len(keys):
+        return None
+    return group_scores(scores, keys[group_col], scenario)
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    score_scenario = st.selectbox("Scenario", list(ECONOMIC_SCENARIOS),
+                                  format_func=lambda name: name.replace('_', ' ').title())
+with col2:
+    score_group = st.selectbox("Group By", list(SCORE_GROUPS))
+with col3:
+    min_group_samples = st.slider("Minimum Samples per Group", 1, 100, 10)
+
+try:
+    grouped_scores = load_grouped_scores(dataset_signature(DATA_FILE), score_scenario, SCORE_GROUPS[score_group])
+except Exception:
+    grouped_scores = None
+
+if grouped_scores is None:
+    st.info("Per-sample scores are not available yet. Run the pipeline (full_eda_pipeline.py) to build them.")
+else:
+    shown = grouped_scores[grouped_scores['samples'] >= min_group_samples]
+    top = shown.sort_values('mean_net_benefit_per_acre', ascending=False).head(20)
+    fig_groups = px.bar(
+        x=top.index.astype(str), y=top['mean_net_benefit_per_acre'],
+        labels={'x': score_group, 'y': 'Mean Net Benefit ($/acre)'},
+        title=f"Top {len(top)} by Mean Net Benefit per Acre ({score_group})",
+        color=top['positive_share'] * 100, color_continuous_scale='RdYlGn'
+    )
+    fig_groups.update_layout(height=450, coloraxis_colorbar=dict(title="% Positive"))
+    st.plotly_chart(fig_groups, use_container_width=True)
+    st.dataframe(shown.rename(columns={
+        'samples': 'Samples',
+        'mean_net_benefit_per_acre': 'Mean Net Benefit ($/acre)',
+        'median_net_benefit_per_acre': 'Median Net Benefit ($/acre)',
+        'positive_share': 'Share Positive',
+        'mean_roi_percent': 'Mean ROI (%)',
+    }).round(2), use_container_width=True)
+
 # ============================================================================
 # SECTION 7: RECOMMENDATIONS
 # ============================================================================
@@ -682,38 +746,81 @@ st.markdown("## 📥 Export Analysis")
 if st.button("Generate PDF Report"):
     st.info("PDF generation feature coming soon. Currently, use browser print to save as PDF.")
 
-# CSV export of scenarios
-export_scenarios = []
-for field_size in [20, 40, 80, 160, 320]:
-    for n_price in [0.50, 0.65, 0.75, 0.90, 1.20]:
-        test_cost_diff = ((haney_cost - traditional_cost) * total_samples_per_field / testing_frequency_years) / field_size
-        fert_save = n_difference_mean * n_price
-        app_save = (n_difference_mean / 100) * application_cost if n_difference_mean > 10 else 0
-        prec_val = (n_difference_mean * 0.2 * (n_response_efficiency/100) * yield_response_per_lb_n * corn_price)
-        env_save = n_difference_mean * environmental_cost
-        net = fert_save + app_save + prec_val + env_save - test_cost_diff
-
-        export_scenarios.append({
-            'Field_Size_Acres': field_size,
-            'N_Price_per_lb': n_price,
-            'Test_Cost_Difference_per_Acre': test_cost_diff,
-            'Fertilizer_Savings_per_Acre': fert_save,
-            'Application_Savings_per_Acre': app_save,
-            'Precision_Value_per_Acre': prec_val,
-            'Environmental_Savings_per_Acre': env_save,
-            'Net_Benefit_per_Acre': net,
-            'Total_Field_Benefit': net * field_size
-        })
-
-export_df = pd.DataFrame(export_scenarios)
-
-csv = export_df.to_csv(index=False)
-st.download_button(
-    label="📊 Download Scenario Analysis (CSV)",
-    data=csv,
-    file_name="haney_economic_scenarios.csv",
-    mime="text/csv"
-)
+# Scenario grid export: every combination of the values given per parameter
+st.markdown("### 🧮 Scenario Grid Export")
+st.markdown("Give each parameter a comma-separated list (`20, 40, 80`) or a range `start:stop:steps` "
+            "(`0.40:1.50:12`). Every combination is exported, streamed to disk in chunks.")
+
+# Cached on the ranges and format, so a rerun with the same grid reuses the
+# file instead of writing it again (at most a few downloadable grids are kept)
+@st.cache_data(max_entries=4)
+def grid_export_bytes(grid_ranges, fixed, file_format):
+    return scenario_grid_bytes(grid_ranges, fixed=fixed, file_format=file_format)
+
+def parse_values(text):
+    """Values from 'a, b, c' or 'start:stop:steps'."""
+    text = text.strip()
+    if ':' in text:
+        start, stop, steps = (part.strip() for part in text.split(':'))
+        return np.linspace(float(start), float(stop), int(steps))
+    return np.array([float(value) for value in text.split(',') if value.strip()])
+
+grid_inputs = {
+    'n_difference': ("N Difference (lbs/acre)", f"{n_difference_mean:.1f}"),
+    'nitrogen_price': ("Nitrogen Price ($/lb N)", "0.50, 0.65, 0.75, 0.90, 1.20"),
+    'acres_per_field': ("Field Size (acres)", "20, 40, 80, 160, 320"),
+    'haney_cost': ("Haney Test Cost ($/sample)", f"{haney_cost:g}"),
+    'traditional_cost': ("Traditional Test Cost ($/sample)", f"{traditional_cost:g}"),
+    'testing_frequency_years': ("Testing Frequency (years)", f"{testing_frequency_years:g}"),
+    'samples_per_field': ("Samples per Field", f"{samples_per_field:g}"),
+    'num_depths': ("Sampling Depths", f"{num_depths:g}"),
+    'application_cost': ("Application Cost ($/acre)", f"{application_cost:g}"),
+    'crop_price': ("Crop Price ($/bu)", f"{corn_price:g}"),
+    'n_response_efficiency': ("N Use Efficiency (%)", f"{n_response_efficiency:g}"),
+    'yield_response_per_lb_n': ("Yield Response (bu/acre per lb N)", f"{yield_response_per_lb_n:g}"),
+    'environmental_cost': ("Environmental Cost ($/lb N)", f"{environmental_cost:g}"),
+}
+
+grid_ranges = {}
+grid_errors = []
+with st.expander("⚙️ Scenario Grid Ranges", expanded=False):
+    grid_columns = st.columns(3)
+    for i, (param, (label, default)) in enumerate(grid_inputs.items()):
+        with grid_columns[i % 3]:
+            text = st.text_input(label, value=default, key=f"grid_{param}")
+        try:
+            grid_ranges[param] = parse_values(text)
+            if not len(grid_ranges[param]):
+                grid_errors.append(label)
+        except ValueError:
+            grid_errors.append(label)
+
+if grid_errors:
+    st.error(f"Could not read the values for: {', '.join(grid_errors)}")
+else:
+    grid_size = scenario_grid_size(grid_ranges)
+    export_format = st.radio("Format", ["CSV", "Parquet"], horizontal=True)
+    file_format = export_format.lower()
+    file_name = f"haney_economic_scenarios.{file_format}"
+    st.caption(f"{grid_size:,} scenarios × {len(grid_ranges)} parameters")
+
+    try:
+        if grid_size <= DOWNLOAD_LIMIT_ROWS:
+            export_bytes = grid_export_bytes(grid_ranges, model_params, file_format)
+            st.download_button(
+                label=f"📊 Download Scenario Analysis ({export_format})",
+                data=export_bytes,
+                file_name=file_name,
+                mime="text/csv" if file_format == 'csv' else "application/octet-stream"
+            )
+        elif st.button(f"💾 Write {grid_size:,} Scenarios to Disk"):
+            export_path = EXPORT_DIR / file_name
+            with st.spinner(f"Writing {grid_size:,} scenarios..."):
+                rows = write_scenario_grid(grid_ranges, export_path, fixed=model_params, file_format=file_format)
+            st.success(f"✓ {rows:,} scenarios written to: {export_path} "
+                       f"({export_path.stat().st_size / 1024**2:.1f} MB)")
+    except ImportError as e:
+        st.error(f"{e}. Choose CSV instead.")
 
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,184 @@
+"""
+Shared data pipeline for the soil health EDA scripts and dashboard.
+"""
+
+from .cache import (
+    StageCache,
+    code_version,
+    fingerprint,
+)
+from .correlation import (
+    CORRELATION_METHODS,
+    pairwise_correlation,
+    strongest_pairs,
+    strongest_pairs_by_group,
+)
+from .cube import (
+    CubeAccumulator,
+    build_cube,
+    cube_path_for,
+    dataset_signature,
+    dataset_version,
+    load_cube,
+    load_or_build_cube,
+    write_cube,
+)
+from .dedup import (
+    KEY_COLUMNS,
+    KEY_HASH_COL,
+    ROW_HASH_COL,
+    DuplicateIndex,
+    append_unique,
+    build_provenance,
+    build_row_index,
+    deduplicate,
+    hash_rows,
+    load_provenance,
+    load_row_index,
+    provenance_counts,
+    provenance_path_for,
+    row_index_path_for,
+    write_provenance,
+    write_row_index,
+)
+from .dtypes import (
+    DtypeAccumulator,
+    apply_dtypes,
+    dtype_map_path_for,
+    dtype_profile_path_for,
+    infer_dtypes,
+    load_dtype_map,
+    load_dtype_profiles,
+    merge_profiles,
+    optimize_dtypes,
+    save_dtype_map,
+    save_dtype_profiles,
+)
+from .economics import (
+    DEFAULT_PARAMETERS,
+    ECONOMIC_COMPONENTS,
+    ECONOMIC_SCENARIOS,
+    economic_model,
+    group_scores,
+    iter_scenario_grid,
+    load_scores,
+    scenario_grid_size,
+    score_column,
+    score_path_for,
+    score_samples,
+    simulate_roi,
+    simulation_percentiles,
+    write_scenario_grid,
+    write_scores,
+)
+from .geo import (
+    ZIP5_COL,
+    ZIP_CENTROIDS_PATH,
+    ZIP_CENTROID_SOURCES,
+    ZIP_INVALID_COL,
+    ZipGeocoder,
+    add_zip_columns,
+    build_zip_centroids,
+    load_zip_geocoder,
+    normalize_zips,
+)
+from .ingest import (
+    METADATA_COLS,
+    discover_csv_files,
+    iter_csv_frames,
+    load_csv_files,
+    load_errors_from_log,
+)
+from .manifest import (
+    MANIFEST_NAME,
+    build_manifest,
+    dataset_layout,
+    diff_manifest,
+    iter_parts,
+    load_manifest,
+    manifest_parts,
+    record_failures,
+    save_manifest,
+    typed_chunk,
+    update_combined_dataset,
+)
+from .pages import (
+    SCENARIO_FIELD_SIZES,
+    SCENARIO_N_PRICES,
+    SENSITIVITY_RANGES,
+    cover_crop_summary,
+    default_correlation_pair,
+    geocode_zip_counts,
+    health_factor_correlations,
+    load_n_columns,
+    n_comparison,
+    n_difference_summary,
+    pair_correlation,
+    roi_simulation,
+    savings_summary,
+    scenario_grid_bytes,
+    scenario_matrix,
+    sensitivity_curve,
+    simulation_bounds,
+    simulation_distributions,
+    valid_numeric_columns,
+    variable_summary,
+)
+from .render import (
+    FigureJob,
+    render_figures,
+)
+from .runner import (
+    Stage,
+    run_pipeline,
+)
+from .schema import (
+    CANONICAL_COLUMNS,
+    SCHEMA_COL,
+    canonical_name,
+    column_variants,
+    detect_schema,
+    resolve_column,
+    unify_columns,
+)
+from .sketch import (
+    SKETCH_GROUP_COLUMNS,
+    QuantileSketch,
+    SketchSet,
+    build_sketches,
+    load_sketches,
+    sketch_path_for,
+    write_sketches,
+)
+from .stats import (
+    StatsAccumulator,
+    count_outliers,
+    merge_accumulators,
+    numeric_columns,
+    summarize,
+)
+from .store import (
+    PYARROW_AVAILABLE,
+    arrow_schema,
+    column_null_counts,
+    dataset_columns,
+    dataset_numeric_columns,
+    has_store,
+    iter_dataset,
+    load_dataset,
+    part_files,
+    part_name,
+    read_store,
+    remove_table,
+    store_path_for,
+    write_part,
+    write_store,
+    write_table,
+)
+from .stream import (
+    ProfileAccumulator,
+    stream_combined_dataset,
+)
+from .synthetic import (
+    SyntheticLabData,
+)
@@ -0,0 +1,203 @@
+"""
+Content-addressed cache of stage results.
+
+A stage's cache key is the SHA-256 of everything that determines its
+results: the stage name, its code version, its parameters, the
+fingerprints of the in-memory artifacts it consumes, the content of the
+files it reads (sources) and the paths it writes. Results are stored
+under the hash of their content, in two parts:
+
+    objects/<sha256>    output files and pickled artifacts
+    stages/<key>.json   the entry that maps a key to those objects
+
+On a hit, output files that are missing or were modified are restored
+from their objects, and artifacts are only unpickled if a downstream
+stage actually has to run.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from .manifest import file_sha256
+
+CACHE_VERSION = 1
+GLOB_CHARS = '*?['
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(value):
+    """
+    Content hash of an artifact.
+
+    DataFrames hash their values, index, column names and dtypes, so two
+    frames with the same content have the same fingerprint regardless of
+    how they were built. Other values hash their pickle.
+    """
+    if isinstance(value, pd.DataFrame):
+        try:
+            rows = pd.util.hash_pandas_object(value, index=True).to_numpy()
+            return _digest(rows.tobytes(), list(value.columns), list(map(str, value.dtypes)))
+        except TypeError:
+            pass
+    return _digest(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _expand(paths):
+    """Files named by paths: files as is, directories recursively, globs expanded."""
+    files = []
+    for path in map(Path, paths):
+        if any(char in path.name for char in GLOB_CHARS):
+            files.extend(sorted(path.parent.glob(path.name)))
+        elif path.is_dir():
+            # os.walk, unlike rglob, follows symlinked batch directories
+            files.extend(sorted(Path(root) / name for root, _, names in os.walk(path, followlinks=True)
+                                for name in names))
+        elif path.exists():
+            files.append(path)
+    return files
+
+
+def code_version(*paths):
+    """Hash of the Python source under paths (files or package directories)."""
+    digest = hashlib.sha256()
+    for path in map(Path, paths):
+        sources = sorted(path.rglob('*.py')) if path.is_dir() else [path]
+        for source in sources:
+            digest.update(source.name.encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Stage results stored under cache_dir, addressed by content hash."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / 'objects'
+        self.stages_dir = self.cache_dir / 'stages'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.stages_dir.mkdir(parents=True, exist_ok=True)
+        self._hash_index_path = self.cache_dir / 'file_hashes.json'
+        self._hash_index = self._load_hash_index()
+
+    def _load_hash_index(self):
+        if not self._hash_index_path.exists():
+            return {}
+        with open(self._hash_index_path, 'r') as f:
+            return json.load(f)
+
+    def _save_hash_index(self):
+        tmp_path = self._hash_index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._hash_index, f)
+        tmp_path.replace(self._hash_index_path)
+
+    def file_hash(self, path):
+        """SHA-256 of a file, re-read only when its size or mtime changed."""
+        path = Path(path).resolve()
+        stat = path.stat()
+        known = self._hash_index.get(str(path))
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        sha256 = file_sha256(path)
+        self._hash_index[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                       'sha256': sha256}
+        return sha256
+
+    def stage_key(self, stage, input_fingerprints):
+        """Cache key of a stage given the fingerprints of its inputs."""
+        sources = {str(file): self.file_hash(file) for file in _expand(stage.sources)}
+        self._save_hash_index()
+        payload = {
+            'cache_version': CACHE_VERSION,
+            'stage': stage.name,
+            'version': stage.version,
+            'params': stage.params,
+            'inputs': {name: input_fingerprints[name] for name in stage.inputs},
+            'sources': sources,
+            'files': sorted(map(str, stage.files)),
+        }
+        return _digest(json.dumps(payload, sort_keys=True, default=str))
+
+    def _object_path(self, sha256):
+        return self.objects_dir / sha256[:2] / sha256
+
+    def _put_file(self, path):
+        sha256 = self.file_hash(path)
+        target = self._object_path(sha256)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, target)
+        return sha256
+
+    def lookup(self, key):
+        """The entry stored under key, or None if absent or incomplete."""
+        entry_path = self.stages_dir / f'{key}.json'
+        if not entry_path.exists():
+            return None
+        with open(entry_path, 'r') as f:
+            entry = json.load(f)
+        objects = list(entry['files'].values()) + list(entry['artifacts'].values())
+        if not all(self._object_path(sha256).exists() for sha256 in objects):
+            return None
+        return entry
+
+    def restore(self, entry):
+        """Put back output files that are missing or differ from the entry. Returns the count."""
+        restored = 0
+        for file, sha256 in entry['files'].items():
+            path = Path(file)
+            if path.exists() and self.file_hash(path) == sha256:
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(self._object_path(sha256), path)
+            restored += 1
+        self._save_hash_index()
+        return restored
+
+    def load_artifact(self, sha256):
+        """Unpickle a stored artifact."""
+        with open(self._object_path(sha256), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, key, stage, outputs, seconds):
+        """Record a stage's outputs under key. Returns the entry."""
+        artifacts = {}
+        for name, value in outputs.items():
+            sha256 = fingerprint(value)
+            target = self._object_path(sha256)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with open(target, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            artifacts[name] = sha256
+
+        files = {str(file.resolve()): self._put_file(file) for file in _expand(stage.files)}
+        self._save_hash_index()
+
+        entry = {
+            'stage': stage.name,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'seconds': seconds,
+            'artifacts': artifacts,
+            'files': files,
+        }
+        entry_path = self.stages_dir / f'{key}.json'
+        tmp_path = entry_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, indent=1)
+        tmp_path.replace(entry_path)
+        return entry
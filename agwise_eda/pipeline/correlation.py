@@ -0,0 +1,211 @@
+"""
+Pairwise-complete correlation over every numeric column at once.
+
+Missing values are handled the way DataFrame.corr() handles them: each
+pair of columns uses the rows where both are present. Instead of looping
+over pairs, the per-pair sums come from a few masked matrix products,
+
+    n   = M'M        rows where both i and j are present
+    Sx  = X'M        sum of column i over rows where j is present
+    Sxx = (X*X)'M    sum of squares of column i over the same rows
+    Sxy = X'X        cross products
+
+with X the column-centered values (zero where missing) and M the presence
+mask. The products add up across row chunks, so memory is bounded by the
+chunk size rather than the dataset. strongest_pairs() then picks the top
+pairs from the upper triangle with a bounded heap.
+
+Spearman has to rank each pair's shared rows on their own, so it cannot
+be summed in chunks. Columns with the same missingness pattern have the
+same shared rows with any other column, so they are ranked together and
+one rank pass per distinct row intersection serves every pair that has it.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from .stats import DEFAULT_CHUNK_SIZE, _numeric_matrix, numeric_columns
+
+CORRELATION_METHODS = ('pearson', 'spearman')
+VARIANCE_TOLERANCE = 1e-12
+
+
+def _masked_moments(values):
+    """Pair counts and sums for one chunk of centered values."""
+    mask = ~np.isnan(values)
+    x = np.where(mask, values, 0.0)
+    m = mask.astype('float64')
+    return m.T @ m, x.T @ m, (x * x).T @ m, x.T @ x
+
+
+def _pairwise_spearman(values, min_periods):
+    """Spearman correlation and pair counts, re-ranking each pair's shared rows."""
+    present = ~np.isnan(values)
+    k = values.shape[1]
+    patterns = {}
+    for j in range(k):
+        patterns.setdefault(np.packbits(present[:, j]).tobytes(), []).append(j)
+    groups = list(patterns.values())
+
+    corr = np.full((k, k), np.nan)
+    n = np.zeros((k, k))
+    for a, first in enumerate(groups):
+        # Later groups whose rows overlap this group's on the same subset
+        # are ranked in one pass
+        overlaps = {}
+        for second in groups[a:]:
+            rows = present[:, first[0]] & present[:, second[0]]
+            key = np.packbits(rows).tobytes()
+            overlaps.setdefault(key, (rows, []))[1].extend(second)
+
+        for rows, others in overlaps.values():
+            count = int(rows.sum())
+            n[np.ix_(first, others)] = count
+            n[np.ix_(others, first)] = count
+            if count < max(min_periods, 2):
+                continue
+            ranked = list(dict.fromkeys(first + others))
+            ranks = rankdata(values[np.ix_(rows, ranked)], axis=0) - (count + 1) / 2
+            ranks = dict(zip(ranked, ranks.T))
+            x = np.column_stack([ranks[j] for j in first])
+            y = np.column_stack([ranks[j] for j in others])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                block = (x.T @ y) / np.sqrt(np.outer((x * x).sum(axis=0), (y * y).sum(axis=0)))
+            corr[np.ix_(first, others)] = block
+            corr[np.ix_(others, first)] = block.T
+    return corr, n
+
+
+def _finish(corr, n, columns):
+    """Clip rounding error, set the diagonal and label the matrices."""
+    k = len(columns)
+    corr = np.clip(corr, -1.0, 1.0)
+    diagonal = np.diag_indices(k)
+    corr[diagonal] = np.where(np.isnan(corr[diagonal]), np.nan, 1.0)
+
+    return (pd.DataFrame(corr, index=columns, columns=columns),
+            pd.DataFrame(n.astype('int64'), index=columns, columns=columns))
+
+
+def pairwise_correlation(data, columns=None, method='pearson', min_periods=1,
+                         chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Correlation matrix with pairwise-complete observations.
+
+    Returns (corr, n): the correlation matrix and the number of rows each
+    pair was computed from. Pairs with fewer than min_periods rows (or no
+    variance) are NaN.
+
+    Spearman ranks each pair's shared rows on their own (average ranks
+    for ties), matching DataFrame.corr(method='spearman'). It needs every
+    row in memory, so chunk_size only applies to Pearson.
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"method must be one of {CORRELATION_METHODS}, got {method!r}")
+
+    columns = numeric_columns(data) if columns is None else list(columns)
+    k = len(columns)
+
+    if method == 'spearman':
+        corr, n = _pairwise_spearman(_numeric_matrix(data, columns), min_periods)
+        return _finish(corr, n, columns)
+
+    # Centering on the column means keeps the sums well conditioned
+    shift = None
+    n = np.zeros((k, k))
+    sx = np.zeros((k, k))
+    sxx = np.zeros((k, k))
+    sxy = np.zeros((k, k))
+    for start in range(0, len(data), chunk_size):
+        values = _numeric_matrix(data.iloc[start:start + chunk_size], columns)
+        if shift is None:
+            valid = ~np.isnan(values)
+            shift = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+        chunk_n, chunk_sx, chunk_sxx, chunk_sxy = _masked_moments(values - shift)
+        n += chunk_n
+        sx += chunk_sx
+        sxx += chunk_sxx
+        sxy += chunk_sxy
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        safe_n = np.maximum(n, 1)
+        cov = sxy - sx * sx.T / safe_n
+        var = sxx - sx ** 2 / safe_n
+        corr = cov / np.sqrt(var * var.T)
+
+    # A column that is constant over a pair's rows leaves only rounding
+    # error in its variance; treat it as zero like DataFrame.corr()
+    constant = var <= VARIANCE_TOLERANCE * sxx
+    corr[(n < max(min_periods, 2)) | constant | constant.T] = np.nan
+    return _finish(corr, n, columns)
+
+
+def strongest_pairs(corr, n=None, k=20, threshold=0.5, min_n=1, exclude_perfect=True):
+    """
+    The k strongest pairs (by |r|) from the upper triangle, strongest first.
+
+    The triangle is scanned one row at a time and only a bounded heap of k
+    candidates is kept, so the pair list is never materialized or sorted.
+    Pairs need |r| > threshold and, when the pair-count matrix n is given,
+    at least min_n shared rows. exclude_perfect drops |r| == 1 (duplicated
+    measurements).
+
+    Returns a frame with Variable_1, Variable_2, Correlation and N.
+    """
+    columns = list(corr.columns)
+    values = corr.to_numpy()
+    counts = n.to_numpy() if n is not None else None
+
+    heap = []
+    for i in range(len(columns) - 1):
+        row = values[i, i + 1:]
+        strength = np.abs(row)
+        keep = strength > threshold
+        if exclude_perfect:
+            keep &= strength < 1.0
+        if counts is not None:
+            keep &= counts[i, i + 1:] >= min_n
+        candidates = np.flatnonzero(keep)
+        if len(candidates) == 0:
+            continue
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-strength[candidates], k - 1)[:k]]
+        for offset in candidates:
+            item = (strength[offset], i, i + 1 + offset)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    pairs = sorted(heap, reverse=True)
+    return pd.DataFrame({
+        'Variable_1': [columns[i] for _, i, _ in pairs],
+        'Variable_2': [columns[j] for _, _, j in pairs],
+        'Correlation': [values[i, j] for _, i, j in pairs],
+        'N': [int(counts[i, j]) if counts is not None else np.nan for _, i, j in pairs],
+    })
+
+
+def strongest_pairs_by_group(data, group_col, columns=None, method='pearson', k=20,
+                             threshold=0.5, min_n=30):
+    """
+    strongest_pairs() within each group of group_col (e.g. batch or crop).
+
+    Groups with fewer than min_n rows are skipped. Returns one frame with a
+    leading group column.
+    """
+    columns = numeric_columns(data) if columns is None else list(columns)
+    tables = []
+    for group, group_data in data.groupby(group_col, observed=True):
+        if len(group_data) < min_n:
+            continue
+        corr, n = pairwise_correlation(group_data, columns, method=method)
+        pairs = strongest_pairs(corr, n, k=k, threshold=threshold, min_n=min_n)
+        pairs.insert(0, group_col, group)
+        tables.append(pairs)
+    if not tables:
+        return pd.DataFrame(columns=[group_col, 'Variable_1', 'Variable_2', 'Correlation', 'N'])
+    return pd.concat(tables, ignore_index=True)
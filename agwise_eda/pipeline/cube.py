@@ -0,0 +1,408 @@
+"""
+Precomputed aggregates for the dashboard pages.
+
+Every dashboard rerun used to recompute the same group-bys over the full
+dataset: duplicate counts, samples per batch, health-score categories,
+cover crop counts and summaries, ZIP counts. build_cube() computes them
+once into small tables, and write_cube() stores them next to the combined
+CSV as <stem>.cube/ (one CSV per table plus cube.json). The cube is keyed
+by the dataset version, the content hash of the data files it was built
+from, so a cube left over from an older dataset is never served.
+
+CubeAccumulator builds the same tables from chunks (streaming ingest),
+with sketch-based medians, quartiles, whiskers and histogram.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .dedup import DuplicateIndex, load_provenance, provenance_counts, provenance_path_for
+from .dtypes import dtype_map_path_for
+from .geo import ZIP5_COL, ZIP_INVALID_COL, normalize_zips
+from .manifest import file_sha256
+from .schema import unify_columns
+from .stats import StatsAccumulator
+from .store import has_store, load_dataset, part_files, store_path_for
+
+# Bumped whenever the tables below change so old cubes are rebuilt
+CUBE_VERSION = 3
+CUBE_SUFFIX = '.cube'
+CUBE_INDEX = 'cube.json'
+
+BATCH_COL = '_source_batch'
+HEALTH_COL = 'Soil Health Calculation'
+COVER_COL = 'Cover Crop Mix'
+KEY_METRICS = ['1:1 Soil pH', 'Organic Matter', 'CO2-C', 'Soil Health Calculation', 'H3A Nitrate']
+HEALTH_BINS = [0, 2, 5, 10, 150]
+HEALTH_LABELS = ['Poor (0-2)', 'Fair (2-5)', 'Good (5-10)', 'Excellent (10+)']
+HISTOGRAM_BINS = 50
+# Box plot whiskers reach the most extreme values within WHISKER_IQR * IQR of the quartiles
+WHISKER_IQR = 1.5
+SUMMARY_COLS = ['count', 'mean', 'median', 'std', 'min', 'max', 'q1', 'q3', 'lower_whisker', 'upper_whisker']
+
+# Key columns holding codes that must stay text when read back
+TEXT_KEYS = {'batch_counts': BATCH_COL, 'cover_counts': COVER_COL, 'cover_health': COVER_COL,
+             'zip_counts': 'zip'}
+
+
+def cube_path_for(csv_path):
+    """Cube directory that sits alongside a combined CSV."""
+    return Path(csv_path).with_suffix(CUBE_SUFFIX)
+
+
+def _data_files(csv_path):
+    """Files whose content defines the dataset: the store parts (or CSV), the dtype map and provenance."""
+    csv_path = Path(csv_path)
+    files = part_files(store_path_for(csv_path)) if has_store(csv_path) else [csv_path]
+    if dtype_map_path_for(csv_path).exists():
+        files.append(dtype_map_path_for(csv_path))
+    return files + part_files(provenance_path_for(csv_path))
+
+
+def dataset_signature(csv_path):
+    """
+    Cheap (name, size, mtime) signature of the data files.
+
+    Changes whenever the dataset is rewritten; used as a cache key by
+    callers that cannot afford to hash the files on every call.
+    """
+    return tuple((path.name, path.stat().st_size, path.stat().st_mtime_ns)
+                 for path in _data_files(csv_path))
+
+
+def dataset_version(csv_path):
+    """Content hash of the data files (and the cube layout) a cube is built from."""
+    digest = hashlib.sha256(f'cube-{CUBE_VERSION}'.encode())
+    for path in _data_files(csv_path):
+        digest.update(path.name.encode())
+        digest.update(file_sha256(path).encode())
+    return digest.hexdigest()
+
+
+def _whiskers(values, q1, q3):
+    """Tukey box plot whiskers: the most extreme values within WHISKER_IQR * IQR of the quartiles."""
+    iqr = q3 - q1
+    inside = values[(values >= q1 - WHISKER_IQR * iqr) & (values <= q3 + WHISKER_IQR * iqr)]
+    if len(inside) == 0:
+        return q1, q3
+    return inside.min(), inside.max()
+
+
+def _summary(values):
+    """count/mean/median/std/min/max, quartiles and box plot whiskers of one numeric series."""
+    values = pd.to_numeric(values, errors='coerce').dropna()
+    q1, q3 = values.quantile(0.25), values.quantile(0.75)
+    lower_whisker, upper_whisker = _whiskers(values, q1, q3)
+    return {
+        'count': len(values),
+        'mean': values.mean(),
+        'median': values.median(),
+        'std': values.std(),
+        'min': values.min(),
+        'max': values.max(),
+        'q1': q1,
+        'q3': q3,
+        'lower_whisker': lower_whisker,
+        'upper_whisker': upper_whisker,
+    }
+
+
+def _sketch_summary(accumulator, col):
+    """_summary() of one column of a StatsAccumulator, with quantiles and whiskers from its sketch."""
+    stats = accumulator.summary().loc[col]
+    sketch = accumulator.sketches[col]
+    lower_whisker, upper_whisker = _whiskers(sketch.means, stats['25%'], stats['75%'])
+    return {
+        'count': int(stats['count']),
+        'mean': stats['mean'],
+        'median': stats['50%'],
+        'std': stats['std'],
+        'min': stats['min'],
+        'max': stats['max'],
+        'q1': stats['25%'],
+        'q3': stats['75%'],
+        'lower_whisker': lower_whisker,
+        'upper_whisker': upper_whisker,
+    }
+
+
+def _count_table(counts, name):
+    """Counts as a two-column table, most frequent first (ties in key order)."""
+    counts = counts[counts > 0]
+    counts = counts.set_axis(counts.index.astype(str)).sort_index().sort_values(ascending=False, kind='stable')
+    return pd.DataFrame({name: counts.index, 'count': counts.to_numpy()})
+
+
+def _counts(values, name):
+    """Value counts of a column as a two-column table, most frequent first."""
+    return _count_table(values.dropna().value_counts(), name)
+
+
+def _zip5(data):
+    """5-digit ZIP of every row (normalized at ingest, or from the raw Zip column)."""
+    if ZIP5_COL in data.columns:
+        return data[ZIP5_COL]
+    if 'Zip' in data.columns:
+        return normalize_zips(data['Zip'])
+    return pd.Series([], dtype='string')
+
+
+def _empty_cube():
+    """Every cube table, empty."""
+    return {
+        'batch_counts': pd.DataFrame(columns=[BATCH_COL, 'count']),
+        'health_categories': pd.DataFrame(columns=['category', 'count']),
+        'health_histogram': pd.DataFrame(columns=['left', 'right', 'count']),
+        'cover_counts': pd.DataFrame(columns=[COVER_COL, 'count']),
+        'cover_health': pd.DataFrame(columns=[COVER_COL, *SUMMARY_COLS]),
+    }
+
+
+def build_cube(data, provenance=None):
+    """
+    Aggregate tables for the dashboard pages, computed from the full dataset.
+
+    Returns a dict of small frames: overview, batch_counts, zip_counts,
+    metric_summary, health_categories, health_histogram, cover_counts and
+    cover_health. Tables whose columns are missing are empty. For a
+    deduplicated dataset, pass its provenance table so row, duplicate and
+    batch counts describe every ingested row rather than the unique ones.
+    """
+    data = unify_columns(data)
+    if provenance is not None:
+        counts = provenance_counts(provenance)
+        n_rows, n_duplicates = counts['rows'], counts['duplicate_rows']
+    else:
+        # Same count as data.duplicated(): identical content in the same source file
+        n_rows = len(data)
+        n_duplicates = DuplicateIndex.from_frame(data, within_source=True).n_duplicates
+
+    zip5 = _zip5(data)
+    zip_invalid = int(data[ZIP_INVALID_COL].sum()) if ZIP_INVALID_COL in data.columns else 0
+
+    cube = {
+        'overview': pd.DataFrame([{
+            'rows': n_rows,
+            'columns': len(data.columns),
+            'duplicate_rows': n_duplicates,
+            'unique_rows': n_rows - n_duplicates,
+            'batches': (provenance['_source_batch'].nunique() if provenance is not None
+                        else data[BATCH_COL].nunique() if BATCH_COL in data.columns else 0),
+            'zip_samples': int(zip5.notna().sum()),
+            'zip_invalid': zip_invalid,
+        }]),
+        'zip_counts': _counts(zip5, 'zip'),
+        'metric_summary': pd.DataFrame(
+            [{'metric': col, **_summary(data[col])} for col in KEY_METRICS
+             if col in data.columns and data[col].notna().any()]
+        ),
+        **_empty_cube(),
+    }
+
+    if provenance is not None:
+        batch_counts = counts['batch_counts']
+        cube['batch_counts'] = pd.DataFrame({BATCH_COL: batch_counts.index.astype(str),
+                                             'count': batch_counts.to_numpy()})
+    elif BATCH_COL in data.columns:
+        batch_counts = data[BATCH_COL].value_counts().sort_index()
+        cube['batch_counts'] = pd.DataFrame({BATCH_COL: batch_counts.index.astype(str),
+                                             'count': batch_counts.to_numpy()})
+
+    if HEALTH_COL in data.columns:
+        health = pd.to_numeric(data[HEALTH_COL], errors='coerce').dropna()
+        categories = pd.cut(health, bins=HEALTH_BINS, labels=HEALTH_LABELS).value_counts().sort_index()
+        cube['health_categories'] = pd.DataFrame({'category': categories.index.astype(str),
+                                                  'count': categories.to_numpy()})
+        if len(health):
+            counts, edges = np.histogram(health, bins=HISTOGRAM_BINS)
+            cube['health_histogram'] = pd.DataFrame({'left': edges[:-1], 'right': edges[1:],
+                                                     'count': counts})
+
+    if COVER_COL in data.columns:
+        cube['cover_counts'] = _counts(data[COVER_COL], COVER_COL)
+        if HEALTH_COL in data.columns:
+            cover_health = pd.DataFrame({
+                COVER_COL: data[COVER_COL].astype('string'),
+                HEALTH_COL: pd.to_numeric(data[HEALTH_COL], errors='coerce'),
+            }).dropna()
+            rows = [{COVER_COL: mix, **_summary(values)}
+                    for mix, values in cover_health.groupby(COVER_COL, sort=True)[HEALTH_COL]]
+            if rows:
+                cube['cover_health'] = pd.DataFrame(rows)
+
+    return cube
+
+
+def _add_counts(counts, values):
+    """Running value counts plus the counts of values (as text)."""
+    values = values.dropna()
+    return counts.add(values.astype(str).value_counts(), fill_value=0).astype('int64')
+
+
+class CubeAccumulator:
+    """
+    build_cube() for a dataset seen chunk by chunk.
+
+    Counts are exact. Summaries come from StatsAccumulators, so medians,
+    quartiles and whiskers are QuantileSketch estimates (exact for small
+    groups), and the health histogram bins the sketch centroids. Duplicate
+    rows are counted from the row index, since a source file may span
+    several chunks.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+        self.batch_counts = pd.Series(dtype='int64')
+        self.zip_counts = pd.Series(dtype='int64')
+        self.zip_samples = 0
+        self.zip_invalid = 0
+        self.health_categories = pd.Series(0, index=HEALTH_LABELS, dtype='int64')
+        self.cover_counts = pd.Series(dtype='int64')
+        self.metrics = StatsAccumulator(columns=KEY_METRICS)
+        self.cover_health = {}
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the cube. Returns self."""
+        chunk = unify_columns(chunk)
+        self.rows += len(chunk)
+        self.columns.update(dict.fromkeys(chunk.columns))
+        if BATCH_COL in chunk.columns:
+            self.batch_counts = _add_counts(self.batch_counts, chunk[BATCH_COL])
+        zip5 = _zip5(chunk)
+        self.zip_counts = _add_counts(self.zip_counts, zip5)
+        self.zip_samples += int(zip5.notna().sum())
+        if ZIP_INVALID_COL in chunk.columns:
+            self.zip_invalid += int(chunk[ZIP_INVALID_COL].sum())
+        self.metrics.update(chunk)
+
+        if HEALTH_COL in chunk.columns:
+            health = pd.to_numeric(chunk[HEALTH_COL], errors='coerce').dropna()
+            categories = pd.cut(health, bins=HEALTH_BINS, labels=HEALTH_LABELS).value_counts()
+            self.health_categories += categories.reindex(HEALTH_LABELS, fill_value=0).to_numpy()
+
+        if COVER_COL in chunk.columns:
+            self.cover_counts = _add_counts(self.cover_counts, chunk[COVER_COL])
+            if HEALTH_COL in chunk.columns:
+                cover_health = pd.DataFrame({
+                    COVER_COL: chunk[COVER_COL].astype('string'),
+                    HEALTH_COL: pd.to_numeric(chunk[HEALTH_COL], errors='coerce'),
+                }).dropna()
+                for mix, values in cover_health.groupby(COVER_COL, sort=False)[[HEALTH_COL]]:
+                    accumulator = self.cover_health.setdefault(mix, StatsAccumulator(columns=[HEALTH_COL]))
+                    accumulator.update(values)
+        return self
+
+    def cube(self, row_index):
+        """The cube tables; row_index is the dataset's row index, for the duplicate count."""
+        n_duplicates = DuplicateIndex.from_row_index(row_index, within_source=True).n_duplicates
+        metric_counts = dict(zip(self.metrics.columns, self.metrics.count))
+        cube = {
+            'overview': pd.DataFrame([{
+                'rows': self.rows,
+                'columns': len(self.columns),
+                'duplicate_rows': n_duplicates,
+                'unique_rows': self.rows - n_duplicates,
+                'batches': len(self.batch_counts),
+                'zip_samples': self.zip_samples,
+                'zip_invalid': self.zip_invalid,
+            }]),
+            'zip_counts': _count_table(self.zip_counts, 'zip'),
+            'metric_summary': pd.DataFrame(
+                [{'metric': col, **_sketch_summary(self.metrics, col)} for col in KEY_METRICS
+                 if col in self.columns and metric_counts.get(col, 0) > 0]
+            ),
+            **_empty_cube(),
+        }
+
+        if len(self.batch_counts):
+            batch_counts = self.batch_counts.sort_index()
+            cube['batch_counts'] = pd.DataFrame({BATCH_COL: batch_counts.index,
+                                                 'count': batch_counts.to_numpy()})
+
+        if HEALTH_COL in self.columns:
+            cube['health_categories'] = pd.DataFrame({'category': HEALTH_LABELS,
+                                                      'count': self.health_categories.to_numpy()})
+            sketch = self.metrics.sketches[HEALTH_COL]
+            if len(sketch):
+                counts, edges = np.histogram(sketch.means, bins=HISTOGRAM_BINS, weights=sketch.weights,
+                                             range=(sketch.min, sketch.max))
+                cube['health_histogram'] = pd.DataFrame({'left': edges[:-1], 'right': edges[1:],
+                                                         'count': np.rint(counts).astype('int64')})
+
+        if COVER_COL in self.columns:
+            cube['cover_counts'] = _count_table(self.cover_counts, COVER_COL)
+            rows = [{COVER_COL: mix, **_sketch_summary(self.cover_health[mix], HEALTH_COL)}
+                    for mix in sorted(self.cover_health)]
+            if rows:
+                cube['cover_health'] = pd.DataFrame(rows)
+
+        return cube
+
+
+def write_cube(cube, csv_path, version=None):
+    """Store cube tables next to csv_path under the dataset version. Returns the cube directory."""
+    cube_dir = cube_path_for(csv_path)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    for name, table in cube.items():
+        table.to_csv(cube_dir / f'{name}.csv', index=False)
+
+    index = {
+        'cube_version': CUBE_VERSION,
+        'dataset_version': version or dataset_version(csv_path),
+        'tables': sorted(cube),
+    }
+    tmp_path = cube_dir / (CUBE_INDEX + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1)
+    tmp_path.replace(cube_dir / CUBE_INDEX)
+    return cube_dir
+
+
+def load_cube(csv_path, version=None):
+    """
+    Cube tables stored for csv_path, or None if there is no cube or it was
+    built from a different dataset version.
+    """
+    index_path = cube_path_for(csv_path) / CUBE_INDEX
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get('cube_version') != CUBE_VERSION:
+        return None
+    if index.get('dataset_version') != (version or dataset_version(csv_path)):
+        return None
+
+    cube = {}
+    for name in index['tables']:
+        path = index_path.parent / f'{name}.csv'
+        if not path.exists():
+            return None
+        key = TEXT_KEYS.get(name)
+        cube[name] = pd.read_csv(path, dtype={key: str} if key else None)
+    return cube
+
+
+def load_or_build_cube(csv_path, data=None, version=None):
+    """
+    Stored cube for csv_path, rebuilt (and stored again) when it is missing
+    or stale. data is the loaded dataset, read from csv_path if not given.
+    """
+    version = version or dataset_version(csv_path)
+    cube = load_cube(csv_path, version=version)
+    if cube is not None:
+        return cube
+
+    if data is None:
+        data = load_dataset(csv_path)
+    cube = build_cube(data, provenance=load_provenance(csv_path))
+    try:
+        write_cube(cube, csv_path, version=version)
+    except OSError:
+        pass  # read-only deployments still get the in-memory cube
+    return cube
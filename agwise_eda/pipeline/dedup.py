@@ -0,0 +1,289 @@
+"""
+Row-hash duplicate index for the combined soil dataset.
+
+The OneDrive batches overlap heavily, so duplicate counts, dedup and "which
+files contain this sample" come up in every report. Instead of comparing
+whole frames with DataFrame.duplicated(), ingest hashes every row once
+(64-bit, vectorized) and writes a row index next to the combined CSV:
+
+    _row_hash      hash of the measured columns (source metadata excluded)
+    _key_hash      hash of the Lab No / Date Recd / Date Rept key
+    _source_batch  where the row came from
+    _source_file
+
+The index is row-aligned with the dataset and kept out of the dataset
+itself, so the hashes never show up as numeric measurements.
+DuplicateIndex groups a hash column once; counts, first-occurrence masks
+and provenance lookups are then array operations.
+
+In dedup mode (update_combined_dataset(dedup=True)) the combined dataset
+holds each sample once and a provenance table records every place it was
+seen: one row per (_row_hash, _source_batch, _source_file) with the
+number of copies in that file. Row and batch counts of the full,
+duplicated dataset are sums over that table.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .ingest import METADATA_COLS
+from .store import PYARROW_AVAILABLE, write_table
+
+ROW_HASH_COL = '_row_hash'
+KEY_HASH_COL = '_key_hash'
+KEY_COLUMNS = ['Lab No', 'Date Recd', 'Date Rept']
+SOURCE_COLS = ['_source_batch', '_source_file']
+ROW_INDEX_SUFFIX = '.rowindex'
+PROVENANCE_SUFFIX = '.provenance'
+PROVENANCE_COLS = [ROW_HASH_COL, *SOURCE_COLS, 'copies']
+
+
+def row_index_path_for(csv_path):
+    """Row index path that sits alongside a combined CSV (Parquet, or CSV without pyarrow)."""
+    csv_path = Path(csv_path)
+    suffix = '.parquet' if PYARROW_AVAILABLE else '.csv'
+    return csv_path.with_name(csv_path.stem + ROW_INDEX_SUFFIX + suffix)
+
+
+def provenance_path_for(csv_path):
+    """Provenance table path that sits alongside a deduplicated combined CSV."""
+    csv_path = Path(csv_path)
+    suffix = '.parquet' if PYARROW_AVAILABLE else '.csv'
+    return csv_path.with_name(csv_path.stem + PROVENANCE_SUFFIX + suffix)
+
+
+def content_columns(data):
+    """Columns that describe the sample itself (everything but source metadata)."""
+    return [col for col in data.columns if col not in METADATA_COLS]
+
+
+def hash_rows(data, columns=None):
+    """64-bit hash of each row over columns (default: content columns), as a uint64 array."""
+    columns = content_columns(data) if columns is None else list(columns)
+    if not columns:
+        return np.zeros(len(data), dtype='uint64')
+    return pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+
+
+def build_row_index(data):
+    """Row-aligned hash and provenance table for a frame."""
+    key_columns = [col for col in KEY_COLUMNS if col in data.columns]
+    index = pd.DataFrame({
+        ROW_HASH_COL: hash_rows(data),
+        KEY_HASH_COL: hash_rows(data, key_columns),
+    })
+    for col in SOURCE_COLS:
+        if col in data.columns:
+            index[col] = data[col].to_numpy()
+    return index
+
+
+def _read_table(path):
+    if not path.exists():
+        return None
+    if PYARROW_AVAILABLE:
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={ROW_HASH_COL: 'uint64', KEY_HASH_COL: 'uint64',
+                                    '_source_batch': str, '_source_file': str})
+
+
+def write_row_index(index, csv_path, part=None):
+    """Write the row index (or, with part, one part of it) next to csv_path and return its path."""
+    return write_table(index, row_index_path_for(csv_path), part=part)
+
+
+def load_row_index(csv_path):
+    """Row index of the dataset at csv_path, or None if it has not been built."""
+    return _read_table(row_index_path_for(csv_path))
+
+
+def write_provenance(provenance, csv_path):
+    """Write the provenance table next to csv_path and return its path."""
+    return write_table(provenance[PROVENANCE_COLS], provenance_path_for(csv_path))
+
+
+def load_provenance(csv_path):
+    """Provenance table of a deduplicated dataset, or None if the dataset is not deduplicated."""
+    return _read_table(provenance_path_for(csv_path))
+
+
+def build_provenance(index):
+    """
+    Occurrences per sample from a row index (or any frame with _row_hash
+    and source columns): one row per (hash, batch, file) with its copies,
+    in first-seen order.
+    """
+    return (index.groupby([ROW_HASH_COL, *SOURCE_COLS], sort=False, observed=True)
+            .size().reset_index(name='copies'))
+
+
+def deduplicate(data, provenance=None, previous_hashes=None):
+    """
+    Collapse data to one row per sample. Returns (unique, provenance).
+
+    The first len(previous_hashes) rows of data are the unique rows kept
+    by an earlier run and previous_hashes are the hashes they had then;
+    their occurrences come from provenance, re-keyed to the hashes the rows
+    have now (re-inferred dtypes can change a hash). The remaining rows are
+    new and add their own source columns as occurrences. Samples without
+    any occurrence left (all their files were removed) are dropped, and
+    every kept row is attributed to the first file it was seen in.
+    """
+    hashes = hash_rows(data)
+    n_previous = 0 if previous_hashes is None else len(previous_hashes)
+
+    new_rows = pd.DataFrame({ROW_HASH_COL: hashes[n_previous:]})
+    for col in SOURCE_COLS:
+        new_rows[col] = data[col].to_numpy()[n_previous:]
+    occurrences = [build_provenance(new_rows)]
+
+    if provenance is not None and n_previous:
+        positions = pd.Index(previous_hashes).get_indexer(provenance[ROW_HASH_COL])
+        known = positions >= 0
+        occurrences.insert(0, provenance[known].assign(**{ROW_HASH_COL: hashes[positions[known]]}))
+
+    provenance = pd.concat(occurrences, ignore_index=True)
+    for col in SOURCE_COLS:
+        provenance[col] = provenance[col].astype(str)
+    provenance = (provenance.groupby([ROW_HASH_COL, *SOURCE_COLS], sort=False)['copies']
+                  .sum().reset_index())
+
+    seen = provenance.drop_duplicates(ROW_HASH_COL).set_index(ROW_HASH_COL)
+    keep = ~pd.Series(hashes).duplicated().to_numpy() & np.isin(hashes, seen.index.to_numpy())
+    unique = data[keep].reset_index(drop=True)
+    positions = seen.index.get_indexer(hashes[keep])
+    for col in SOURCE_COLS:
+        unique[col] = seen[col].to_numpy()[positions]
+    return unique, provenance
+
+
+def append_unique(new, provenance, known_hashes):
+    """
+    Rows of newly ingested files folded into a deduplicated dataset.
+    Returns (unique, provenance).
+
+    Every row of new becomes an occurrence in provenance; the first copy of
+    each sample whose hash is not in known_hashes (the stored rows) is
+    returned, attributed to its own file, which is the row deduplicate()
+    would keep for it.
+    """
+    hashes = hash_rows(new)
+    occurrences = pd.DataFrame({ROW_HASH_COL: hashes})
+    for col in SOURCE_COLS:
+        occurrences[col] = new[col].to_numpy()
+    occurrences = build_provenance(occurrences)
+    for col in SOURCE_COLS:
+        occurrences[col] = occurrences[col].astype(str)
+    provenance = pd.concat([provenance, occurrences], ignore_index=True)
+    keep = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, known_hashes)
+    return new[keep].reset_index(drop=True), provenance
+
+
+def provenance_counts(provenance):
+    """
+    Counts of the full (duplicated) dataset recovered from provenance:
+    rows, exact duplicate rows (same content in the same file, as
+    DataFrame.duplicated() counts them) and rows per batch.
+    """
+    rows = int(provenance['copies'].sum())
+    return {
+        'rows': rows,
+        'duplicate_rows': rows - len(provenance),
+        'batch_counts': provenance.groupby('_source_batch')['copies'].sum().sort_index(),
+    }
+
+
+class DuplicateIndex:
+    """
+    Rows grouped by hash.
+
+    Duplicates keep DataFrame.duplicated()'s convention: the first
+    occurrence of each group (in row order) is not a duplicate.
+    """
+
+    def __init__(self, hashes, sources=None):
+        self.hashes = np.asarray(hashes, dtype='uint64')
+        self.sources = sources.reset_index(drop=True) if sources is not None else None
+        self.uniques, self.first, self.group, self.counts = np.unique(
+            self.hashes, return_index=True, return_inverse=True, return_counts=True
+        )
+        # Row positions ordered by group, so each group is one slice
+        self._order = np.argsort(self.group, kind='stable')
+        self._starts = np.cumsum(self.counts) - self.counts
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def from_row_index(cls, index, column=ROW_HASH_COL, within_source=False):
+        """
+        Index over a row index column.
+
+        within_source=True also keys on the source batch and file, which
+        reproduces duplicated() over every column of the combined frame.
+        """
+        sources = index[[col for col in SOURCE_COLS if col in index.columns]]
+        hashes = index[column].to_numpy()
+        if within_source and len(sources.columns):
+            keyed = pd.concat([index[[column]], sources], axis=1)
+            hashes = pd.util.hash_pandas_object(keyed, index=False).to_numpy()
+        return cls(hashes, sources=sources if len(sources.columns) else None)
+
+    @classmethod
+    def from_frame(cls, data, column=ROW_HASH_COL, within_source=False):
+        """Index over a frame, hashing it on the spot."""
+        return cls.from_row_index(build_row_index(data), column=column, within_source=within_source)
+
+    @property
+    def n_unique(self):
+        return len(self.uniques)
+
+    @property
+    def n_duplicates(self):
+        return len(self.hashes) - len(self.uniques)
+
+    def duplicated(self):
+        """Boolean mask of rows that repeat an earlier row."""
+        mask = np.ones(len(self.hashes), dtype=bool)
+        mask[self.first] = False
+        return mask
+
+    def members(self, position):
+        """Row positions in the same group as the row at position."""
+        group = self.group[position]
+        start = self._starts[group]
+        return self._order[start:start + self.counts[group]]
+
+    def lookup(self, row_hash):
+        """Row positions whose hash is row_hash (empty if none)."""
+        group = np.searchsorted(self.uniques, np.uint64(row_hash))
+        if group == len(self.uniques) or self.uniques[group] != row_hash:
+            return np.array([], dtype='int64')
+        start = self._starts[group]
+        return self._order[start:start + self.counts[group]]
+
+    def sources_of(self, position):
+        """Distinct batches/files holding a copy of the row at position."""
+        if self.sources is None:
+            raise ValueError("Index was built without _source_batch/_source_file")
+        return self.sources.iloc[self.members(position)].drop_duplicates().reset_index(drop=True)
+
+    def groups(self):
+        """
+        One row per repeated group: hash, first row, copies and the number
+        of distinct source files holding it, most copies first.
+        """
+        repeated = self.counts > 1
+        table = pd.DataFrame({
+            'hash': self.uniques[repeated],
+            'first_row': self.first[repeated],
+            'copies': self.counts[repeated],
+        })
+        if self.sources is not None:
+            # Distinct (batch, file) pairs per group
+            locations = self.sources.assign(group=self.group).drop_duplicates()
+            n_files = locations.groupby('group').size()
+            table['files'] = n_files.reindex(np.flatnonzero(repeated)).to_numpy()
+        return table.sort_values('copies', ascending=False, ignore_index=True)
@@ -0,0 +1,434 @@
+"""
+Dtype inference and downcasting for the combined soil dataset.
+
+Raw lab exports arrive as mixed object columns (numbers written as text,
+dates as M/D/YYYY strings, a handful of repeated labels). The ingest stage
+infers one type per column, downcasts where that is lossless and persists
+the resulting dtype map next to the combined CSV, so every loader gets the
+same compact, analysis-ready frame without re-coercing columns.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DTYPE_MAP_SUFFIX = '.dtypes.json'
+DTYPE_MAP_VERSION = 1
+DTYPE_PROFILE_SUFFIX = '.dtype_profiles.json'
+DTYPE_PROFILE_VERSION = 1
+
+# Significant digits a float32 carries. Several lab exports were written
+# from single-precision values (6.9 shows up as 6.9000001), so digits past
+# this point are representation noise rather than measurement.
+FLOAT32_DIGITS = 7
+MAX_DECIMAL_PLACES = 12
+# Text columns become categorical when they have at most this many distinct
+# values per row (sparse columns included, since codes are cheaper than NA)
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# A column is numeric (or a date) when this share of its values parse; the
+# rest are stray header rows and markers such as '***' and become missing,
+# as they did when every consumer called pd.to_numeric(errors='coerce')
+MIN_PARSED_FRACTION = 0.95
+# Identifiers keep their text form even when most values look numeric
+IDENTIFIER_COLUMNS = ['Zip', 'Lab No']
+# Fixed-width codes that are categorical whatever their cardinality
+CATEGORY_COLUMNS = ['zip5']
+# Distinct values DtypeAccumulator remembers per text column; columns with
+# more become 'string' even if the row count would allow a category
+MAX_TRACKED_DISTINCT = 2**16
+# One timestamp format for every combined CSV. Left to itself, to_csv picks
+# a format per frame (dates only, seconds or nanoseconds) from the values it
+# is given, so a dataset written in chunks would not match one written whole.
+CSV_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+INTEGER_TYPES = ['int8', 'int16', 'int32', 'int64']
+
+
+def dtype_map_path_for(csv_path):
+    """Dtype map path that sits alongside a combined CSV."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + DTYPE_MAP_SUFFIX)
+
+
+def dtype_profile_path_for(csv_path):
+    """Path of the per-part DtypeAccumulators that sits alongside a combined CSV."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + DTYPE_PROFILE_SUFFIX)
+
+
+def _as_text(values):
+    """
+    Stringify non-null values so mixed object columns have one type.
+
+    Whole-number floats lose their '.0': a column parsed as numbers in one
+    raw file and as text in another would otherwise spell the same value
+    two ways ('0.0' and '0'), and identical samples would no longer match.
+    """
+    is_number = values.dtype == 'float64' or values.dtype.kind in 'iu'
+    codes, numbers = pd.factorize(values) if is_number else (None, [])
+    if len(numbers):
+        # Numbers repeat a lot, so each distinct value is stringified once
+        text = np.append(_as_text(pd.Series(numbers, dtype=object)).to_numpy(dtype=object), np.nan)
+        return pd.Series(text[codes], index=values.index, name=values.name)
+    text = values.astype(str)
+    if values.dtype == object:
+        is_float = values.map(lambda value: isinstance(value, float)).to_numpy(dtype=bool)
+    else:
+        is_float = np.full(len(values), values.dtype.kind == 'f')
+    if is_float.any():
+        numbers = values[is_float].to_numpy(dtype='float64')
+        whole = np.isfinite(numbers) & (np.abs(numbers) < 2**53)
+        whole[whole] = numbers[whole] % 1 == 0
+        text.iloc[np.flatnonzero(is_float)[whole]] = numbers[whole].astype('int64').astype(str)
+    missing = values.isna()
+    return text if len(values) and not missing.any() else values.where(missing, text)
+
+
+def _round_significant(values, digits):
+    """Round every value to a number of significant digits."""
+    magnitude = np.zeros_like(values)
+    np.floor(np.log10(np.abs(values), where=values != 0, out=magnitude), out=magnitude)
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+def _decimal_places(values):
+    """Fewest decimal places that represent every value, or None if too many."""
+    for places in range(MAX_DECIMAL_PLACES + 1):
+        scaled = values * 10.0 ** places
+        if np.allclose(scaled, np.round(scaled), rtol=1e-12, atol=1e-9):
+            return places
+    return None
+
+
+def _numeric_dtype(values, has_missing):
+    """
+    Smallest dtype that holds the non-null values of a numeric column.
+
+    Whole-number columns without gaps become the narrowest integer type.
+    Otherwise float32 is used when reading it back at the column's decimal
+    precision returns the same numbers; anything else stays float64.
+    """
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 'float32'
+
+    if not has_missing and len(finite) == len(values) and np.array_equal(finite, np.round(finite)):
+        low, high = finite.min(), finite.max()
+        for int_type in INTEGER_TYPES:
+            info = np.iinfo(int_type)
+            if info.min <= low and high <= info.max:
+                return int_type
+
+    if np.abs(finite).max() > np.finfo('float32').max:
+        return 'float64'
+    significant = _round_significant(finite, FLOAT32_DIGITS)
+    places = _decimal_places(significant)
+    if places is None:
+        return 'float64'
+    restored = finite.astype('float32').astype('float64')
+    if np.array_equal(np.round(restored, places), np.round(significant, places)):
+        return 'float32'
+    return 'float64'
+
+
+def _parses_as_dates(values):
+    """True if nearly every non-null value of a text column parses as a date."""
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    return parsed.notna().mean() >= MIN_PARSED_FRACTION
+
+
+def infer_column_dtype(series):
+    """Target dtype name for one column: numeric, datetime, category or string."""
+    if series.name in CATEGORY_COLUMNS:
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime64[ns]'
+
+    non_null = series.dropna()
+    if len(non_null) == 0:
+        return 'float32'
+
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+
+    if isinstance(non_null.dtype, pd.CategoricalDtype):
+        non_null = non_null.astype(object)
+
+    if series.name not in IDENTIFIER_COLUMNS:
+        numeric = pd.to_numeric(non_null, errors='coerce')
+        if numeric.notna().mean() >= MIN_PARSED_FRACTION:
+            parsed = numeric.dropna()
+            return _numeric_dtype(parsed.to_numpy(dtype='float64'),
+                                  has_missing=len(parsed) < len(series))
+
+    text = _as_text(non_null)
+    if 'date' in str(series.name).lower() and _parses_as_dates(text):
+        return 'datetime64[ns]'
+    if text.nunique() <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+        return 'category'
+    return 'string'
+
+
+def infer_dtypes(data):
+    """Infer a {column: dtype name} map for a frame."""
+    return {col: infer_column_dtype(data[col]) for col in data.columns}
+
+
+def _float32_places(values, places):
+    """Most decimal places (from places up) at which float32 still reads back every value."""
+    significant = _round_significant(values, FLOAT32_DIGITS)
+    restored = values.astype('float32').astype('float64')
+    while places <= MAX_DECIMAL_PLACES and np.array_equal(np.round(restored, places),
+                                                           np.round(significant, places)):
+        places += 1
+    return places - 1
+
+
+class DtypeAccumulator:
+    """
+    Column dtypes inferred chunk by chunk, as infer_dtypes() would infer
+    them from all chunks concatenated.
+
+    Per column it keeps counts (non-null, numeric-parsed, date-parsed),
+    the range, decimal places and float32 precision of the numeric values,
+    and the distinct text values (up to MAX_TRACKED_DISTINCT, past which
+    a column is text rather than a category), which give every chunk the
+    same categories.
+    Accumulators of separate chunks merge. Columns absent from a chunk
+    count as missing for its rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the accumulator. Returns self."""
+        part = DtypeAccumulator()
+        part.rows = len(chunk)
+        for col in chunk.columns:
+            part.columns[col] = self._profile(chunk[col])
+        return self.merge(part)
+
+    @staticmethod
+    def _profile(series):
+        profile = {'kind': None, 'non_null': 0, 'parsed': 0, 'finite': 0, 'whole': True,
+                   'low': np.inf, 'high': -np.inf, 'places': 0, 'float32_places': MAX_DECIMAL_PLACES,
+                   'dates': 0, 'distinct': set()}
+        if series.name in CATEGORY_COLUMNS:
+            profile['kind'] = 'category'
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            profile['kind'] = 'datetime64[ns]'
+        elif pd.api.types.is_bool_dtype(series):
+            profile['kind'] = 'bool'
+
+        non_null = series.dropna()
+        profile['non_null'] = len(non_null)
+        if profile['kind'] not in (None, 'category') or not len(non_null):
+            return profile
+        if isinstance(non_null.dtype, pd.CategoricalDtype):
+            non_null = non_null.astype(object)
+
+        if profile['kind'] is None and series.name not in IDENTIFIER_COLUMNS:
+            values = pd.to_numeric(non_null, errors='coerce').dropna().to_numpy(dtype='float64')
+            finite = values[np.isfinite(values)]
+            profile['parsed'] = len(values)
+            profile['finite'] = len(finite)
+            if len(finite):
+                profile['whole'] = bool(np.array_equal(finite, np.round(finite)))
+                profile['low'], profile['high'] = finite.min(), finite.max()
+                if np.abs(finite).max() > np.finfo('float32').max:
+                    profile['places'] = None
+                else:
+                    places = _decimal_places(_round_significant(finite, FLOAT32_DIGITS))
+                    profile['places'] = places
+                    if places is not None:
+                        profile['float32_places'] = _float32_places(finite, places)
+
+        text = _as_text(non_null)
+        if profile['kind'] is None and 'date' in str(series.name).lower():
+            profile['dates'] = int(pd.to_datetime(text, errors='coerce', format='mixed').notna().sum())
+        distinct = text.unique()
+        profile['distinct'] = set(distinct) if len(distinct) <= MAX_TRACKED_DISTINCT else None
+        return profile
+
+    def merge(self, other):
+        """Fold another accumulator into this one. Returns self."""
+        self.rows += other.rows
+        for col, theirs in other.columns.items():
+            ours = self.columns.get(col)
+            if ours is None:
+                # A copy, so later merges into this column leave other unchanged
+                distinct = None if theirs['distinct'] is None else set(theirs['distinct'])
+                self.columns[col] = {**theirs, 'distinct': distinct}
+                continue
+            ours['kind'] = ours['kind'] or theirs['kind']
+            for key in ['non_null', 'parsed', 'finite', 'dates']:
+                ours[key] += theirs[key]
+            ours['whole'] = ours['whole'] and theirs['whole']
+            ours['low'] = min(ours['low'], theirs['low'])
+            ours['high'] = max(ours['high'], theirs['high'])
+            if ours['places'] is None or theirs['places'] is None:
+                ours['places'] = None
+            else:
+                ours['places'] = max(ours['places'], theirs['places'])
+            ours['float32_places'] = min(ours['float32_places'], theirs['float32_places'])
+            if ours['distinct'] is None or theirs['distinct'] is None:
+                ours['distinct'] = None
+            else:
+                ours['distinct'] |= theirs['distinct']
+                if len(ours['distinct']) > MAX_TRACKED_DISTINCT:
+                    ours['distinct'] = None
+        return self
+
+    def _numeric_dtype(self, profile):
+        """_numeric_dtype() over every chunk's parsed values."""
+        if profile['finite'] == 0:
+            return 'float32'
+        if profile['parsed'] == self.rows and profile['finite'] == profile['parsed'] and profile['whole']:
+            for int_type in INTEGER_TYPES:
+                info = np.iinfo(int_type)
+                if info.min <= profile['low'] and profile['high'] <= info.max:
+                    return int_type
+        if profile['places'] is None or profile['places'] > profile['float32_places']:
+            return 'float64'
+        return 'float32'
+
+    def dtype(self, col):
+        """Dtype name for one column."""
+        profile = self.columns[col]
+        if profile['kind']:
+            return profile['kind']
+        if profile['non_null'] == 0:
+            return 'float32'
+        if col not in IDENTIFIER_COLUMNS and profile['parsed'] >= profile['non_null'] * MIN_PARSED_FRACTION:
+            return self._numeric_dtype(profile)
+        if 'date' in str(col).lower() and profile['dates'] >= profile['non_null'] * MIN_PARSED_FRACTION:
+            return 'datetime64[ns]'
+        if profile['distinct'] is not None and len(profile['distinct']) <= self.rows * CATEGORY_MAX_UNIQUE_RATIO:
+            return 'category'
+        return 'string'
+
+    def dtype_map(self):
+        """{column: dtype name} for every column seen, in first-seen order."""
+        return {col: self.dtype(col) for col in self.columns}
+
+    def categories(self):
+        """
+        {column: sorted distinct values} for the category columns, the
+        categories astype('category') gives the concatenated data. Columns
+        with more than MAX_TRACKED_DISTINCT values are left out.
+        """
+        return {col: sorted(profile['distinct']) for col, profile in self.columns.items()
+                if self.dtype(col) == 'category' and profile['distinct'] is not None}
+
+    def to_dict(self):
+        """JSON-ready copy of the accumulator (see from_dict())."""
+        columns = {}
+        for col, profile in self.columns.items():
+            columns[col] = {**profile, 'whole': bool(profile['whole']),
+                            'low': float(profile['low']), 'high': float(profile['high']),
+                            'distinct': None if profile['distinct'] is None else sorted(profile['distinct'])}
+        return {'rows': self.rows, 'columns': columns}
+
+    @classmethod
+    def from_dict(cls, payload):
+        """Accumulator from to_dict() output."""
+        accumulator = cls()
+        accumulator.rows = payload['rows']
+        for col, profile in payload['columns'].items():
+            distinct = profile['distinct']
+            accumulator.columns[col] = {**profile, 'distinct': None if distinct is None else set(distinct)}
+        return accumulator
+
+
+def merge_profiles(accumulators):
+    """One DtypeAccumulator over several, merged in order; the inputs are left unchanged."""
+    merged = DtypeAccumulator()
+    for accumulator in accumulators:
+        merged.merge(accumulator)
+    return merged
+
+
+def apply_dtypes(data, dtype_map, categories=None):
+    """
+    Cast columns to the dtypes in dtype_map, returning a new frame.
+
+    Columns missing from the map are left unchanged; values that do not
+    parse as the target type become missing. categories fixes the
+    categories of category columns ({column: values}), so chunks cast
+    separately share one dtype; otherwise each frame gets its own.
+    """
+    data = data.copy()
+    for col, dtype in dtype_map.items():
+        if col not in data.columns or str(data[col].dtype) == dtype:
+            continue
+        values = data[col]
+        if dtype == 'category':
+            data[col] = _as_text(values).astype('category')
+        elif dtype == 'string':
+            data[col] = _as_text(values).astype('string')
+        elif dtype.startswith('datetime'):
+            data[col] = pd.to_datetime(values, errors='coerce', format='mixed')
+        elif dtype == 'bool':
+            data[col] = values.astype('bool')
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if dtype in INTEGER_TYPES and numeric.isna().any():
+                dtype = 'float64'
+            data[col] = numeric.astype(dtype)
+    for col, values in (categories or {}).items():
+        if col in data.columns and dtype_map.get(col) == 'category':
+            data[col] = data[col].cat.set_categories(values)
+    return data
+
+
+def optimize_dtypes(data):
+    """Infer and apply compact dtypes. Returns (data, dtype_map)."""
+    dtype_map = infer_dtypes(data)
+    return apply_dtypes(data, dtype_map), dtype_map
+
+
+def save_dtype_map(dtype_map, path):
+    """Persist a dtype map as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'version': DTYPE_MAP_VERSION, 'dtypes': dtype_map}, f, indent=1)
+    return path
+
+
+def load_dtype_map(path):
+    """Load a persisted dtype map, or None if it is missing or outdated."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        payload = json.load(f)
+    if payload.get('version') != DTYPE_MAP_VERSION:
+        return None
+    return payload['dtypes']
+
+
+def save_dtype_profiles(profiles, path):
+    """Persist {part: DtypeAccumulator} as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {part: accumulator.to_dict() for part, accumulator in profiles.items()}
+    with open(path, 'w') as f:
+        json.dump({'version': DTYPE_PROFILE_VERSION, 'parts': payload}, f)
+    return path
+
+
+def load_dtype_profiles(path):
+    """Load persisted {part: DtypeAccumulator}, or None if missing or outdated."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        payload = json.load(f)
+    if payload.get('version') != DTYPE_PROFILE_VERSION:
+        return None
+    return {part: DtypeAccumulator.from_dict(profile) for part, profile in payload['parts'].items()}
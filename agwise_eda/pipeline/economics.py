@@ -0,0 +1,433 @@
+"""
+Economic model of Haney vs traditional soil testing.
+
+economic_model() is the one implementation of the per-acre equations shown
+on the Economic Analysis page. Every parameter may be a scalar or an array;
+arrays broadcast against each other with NumPy's rules, so a sensitivity
+sweep is one 1-D array, a scenario matrix is an (n, 1) array against a
+(1, m) array, and a 1000 x 1000 grid is a handful of array operations.
+Every result component comes back at the common broadcast shape.
+
+simulate_roi() is the Monte Carlo counterpart: each trial is one field
+whose ΔN is the mean of samples_per_field per-sample differences drawn from
+the data, with prices and costs drawn from user-given distributions.
+Trials run in chunks (in-process, or across spawned worker processes for
+batch use); each chunk is folded into QuantileSketches straight away, so
+memory stays flat at any trial count.
+
+score_samples() scores every sample of the dataset under the named
+ECONOMIC_SCENARIOS, taking its own Haney N - Traditional N as ΔN. Ingest
+writes the scores next to the combined CSV as <stem>.economics.parquet,
+row-aligned with the dataset, so ROI by ZIP, crop or batch is a group-by
+over stored columns.
+
+iter_scenario_grid() walks the full-factorial grid of any parameter ranges
+a chunk of rows at a time (chunk rows are decoded from flat grid indices),
+and write_scenario_grid() streams it to CSV or Parquet, so grids of
+millions of scenarios never sit in memory.
+"""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .sketch import DEFAULT_COMPRESSION, QuantileSketch
+from .store import COMPRESSION, PYARROW_AVAILABLE, write_table
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+# Slider defaults of the Economic Analysis page
+DEFAULT_PARAMETERS = {
+    'nitrogen_price': 0.75,
+    'haney_cost': 50.0,
+    'traditional_cost': 25.0,
+    'samples_per_field': 4,
+    'num_depths': 1,
+    'testing_frequency_years': 3,
+    'acres_per_field': 80,
+    'application_cost': 12.0,
+    'n_response_efficiency': 50,
+    'yield_response_per_lb_n': 1.0,
+    'crop_price': 5.50,
+    'environmental_cost': 0.10,
+}
+# lbs N/acre of one typical application pass
+TYPICAL_APPLICATION_RATE = 100
+# ΔN (lbs/acre) above which an application pass is saved
+APPLICATION_SAVINGS_THRESHOLD = 10
+# Conservative: 20% of the excess N was actually needed, 80% was waste
+NEEDED_N_SHARE = 0.2
+ECONOMIC_COMPONENTS = [
+    'test_cost_traditional_per_acre',
+    'test_cost_haney_per_acre',
+    'test_cost_difference_per_acre',
+    'additional_test_cost_per_field',
+    'fertilizer_savings_per_acre',
+    'application_savings_per_acre',
+    'precision_value_per_acre',
+    'environmental_savings_per_acre',
+    'total_savings_per_acre',
+    'net_benefit_per_acre',
+    'net_benefit_per_field',
+    'breakeven_acres',
+    'roi_percent',
+]
+
+
+def economic_model(n_difference, nitrogen_price=0.75, haney_cost=50.0, traditional_cost=25.0,
+                   samples_per_field=4, num_depths=1, testing_frequency_years=3, acres_per_field=80,
+                   application_cost=12.0, n_response_efficiency=50, yield_response_per_lb_n=1.0,
+                   crop_price=5.50, environmental_cost=0.10):
+    """
+    Annualized economics of Haney testing for ΔN = Haney N - Traditional N
+    (lbs/acre). Scalars and arrays broadcast together.
+
+    Returns a dict of ECONOMIC_COMPONENTS, each a float64 array of the
+    broadcast shape (0-d for all-scalar input). breakeven_acres is inf
+    where there are no fertilizer savings; roi_percent is 0 where Haney
+    testing costs no more.
+    """
+    params = [np.asarray(value, dtype='float64') for value in (
+        n_difference, nitrogen_price, haney_cost, traditional_cost, samples_per_field, num_depths,
+        testing_frequency_years, acres_per_field, application_cost, n_response_efficiency,
+        yield_response_per_lb_n, crop_price, environmental_cost)]
+    (n_difference, nitrogen_price, haney_cost, traditional_cost, samples_per_field, num_depths,
+     testing_frequency_years, acres_per_field, application_cost, n_response_efficiency,
+     yield_response_per_lb_n, crop_price, environmental_cost) = params
+    shape = np.broadcast_shapes(*(param.shape for param in params))
+
+    # Testing costs
+    samples = samples_per_field * num_depths
+    annual_traditional = traditional_cost * samples / testing_frequency_years
+    annual_haney = haney_cost * samples / testing_frequency_years
+    additional_test_cost = annual_haney - annual_traditional
+    test_cost_traditional = annual_traditional / acres_per_field
+    test_cost_haney = annual_haney / acres_per_field
+    test_cost_difference = test_cost_haney - test_cost_traditional
+
+    # Savings
+    fertilizer = n_difference * nitrogen_price
+    application = np.where(n_difference > APPLICATION_SAVINGS_THRESHOLD,
+                           n_difference / TYPICAL_APPLICATION_RATE * application_cost, 0.0)
+    precision = (n_difference * NEEDED_N_SHARE * (n_response_efficiency / 100)
+                 * yield_response_per_lb_n * crop_price)
+    environmental = np.abs(n_difference) * environmental_cost
+    total_savings = fertilizer + application + precision + environmental
+    net_per_acre = total_savings - test_cost_difference
+    net_per_field = net_per_acre * acres_per_field
+
+    fertilizer_b, additional_b = np.broadcast_arrays(fertilizer, additional_test_cost)
+    breakeven = np.full(np.broadcast_shapes(fertilizer.shape, additional_test_cost.shape), np.inf)
+    np.divide(additional_b, fertilizer_b, out=breakeven, where=fertilizer_b > 0)
+    net_b, additional_b = np.broadcast_arrays(net_per_field, additional_test_cost)
+    roi = np.zeros(np.broadcast_shapes(net_per_field.shape, additional_test_cost.shape))
+    np.divide(net_b * 100, additional_b, out=roi, where=additional_b > 0)
+
+    components = [test_cost_traditional, test_cost_haney, test_cost_difference, additional_test_cost,
+                  fertilizer, application, precision, environmental, total_savings, net_per_acre,
+                  net_per_field, breakeven, roi]
+    return {name: np.broadcast_to(value, shape) for name, value in zip(ECONOMIC_COMPONENTS, components)}
+
+
+# ============================================================================
+# MONTE CARLO
+# ============================================================================
+
+DEFAULT_TRIALS = 100_000
+CHUNK_TRIALS = 25_000
+# Parameter distributions: a number (fixed) or one of
+#   ('uniform', low, high), ('triangular', low, mode, high), ('normal', mean, sd)
+# Normal draws are clipped at 0 (prices and costs are never negative)
+DISTRIBUTIONS = ('uniform', 'triangular', 'normal')
+SIMULATION_METRICS = ['roi_percent', 'net_benefit_per_acre', 'net_benefit_per_field', 'breakeven_acres',
+                      'n_difference']
+SIMULATION_PERCENTILES = [0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95]
+
+
+def draw_parameter(rng, spec, size):
+    """size draws of one parameter from a distribution spec (see DISTRIBUTIONS)."""
+    if np.isscalar(spec):
+        return np.full(size, float(spec))
+    kind, *args = spec
+    if kind == 'uniform':
+        return rng.uniform(args[0], args[1], size)
+    if kind == 'triangular':
+        low, mode, high = args
+        return rng.triangular(low, mode, high, size) if high > low else np.full(size, float(mode))
+    if kind == 'normal':
+        return np.maximum(rng.normal(args[0], args[1], size), 0.0)
+    raise ValueError(f"Unknown distribution {kind!r}; expected a number or one of {DISTRIBUTIONS}")
+
+
+def _simulate_chunk(task):
+    """Run one chunk of trials and fold it into sketches."""
+    seed, trials, n_differences, distributions, compression = task
+    rng = np.random.default_rng(seed)
+    params = {name: draw_parameter(rng, spec, trials)
+              for name, spec in {**DEFAULT_PARAMETERS, **distributions}.items()}
+
+    # A field's ΔN is the mean over its samples of per-sample differences
+    samples = np.maximum(np.rint(params['samples_per_field']), 1)
+    draws = rng.choice(n_differences, size=(trials, int(samples.max())))
+    draws[np.arange(draws.shape[1]) >= samples[:, None]] = 0
+    n_difference = draws.sum(axis=1) / samples
+    params['samples_per_field'] = samples
+
+    result = economic_model(n_difference, **params)
+    breakeven = result['breakeven_acres']
+    metrics = {**result, 'n_difference': n_difference}
+    return {
+        'trials': trials,
+        'positive': int((result['net_benefit_per_acre'] > 0).sum()),
+        'never_breaks_even': int(np.isinf(breakeven).sum()),
+        'sketches': {name: QuantileSketch.from_values(metrics[name], compression)
+                     for name in SIMULATION_METRICS},
+    }
+
+
+def simulate_roi(n_differences, distributions=None, trials=DEFAULT_TRIALS, seed=0, workers=1,
+                 chunk_trials=CHUNK_TRIALS, compression=DEFAULT_COMPRESSION):
+    """
+    Monte Carlo ROI of Haney testing.
+
+    n_differences are per-sample Haney N - Traditional N values (lbs/acre);
+    distributions maps economic_model() parameter names to distribution
+    specs, the rest stay at DEFAULT_PARAMETERS. Results depend on the seed
+    only, not on the number of workers.
+
+    The default runs in-process, as the dashboard needs: forking inside the
+    threaded Streamlit server can deadlock. workers > 1 (None for every
+    CPU) runs the chunks in a pool of spawned processes, for scripts and
+    batch jobs; the calling script needs a __main__ guard.
+
+    Returns a dict: trials, positive_share (P(net benefit > 0)),
+    never_breaks_even_share (no fertilizer savings, so no break-even field
+    size) and sketches, a QuantileSketch per SIMULATION_METRICS name
+    (breakeven_acres over the trials that break even).
+    """
+    n_differences = np.asarray(n_differences, dtype='float64')
+    n_differences = n_differences[np.isfinite(n_differences)]
+    if not len(n_differences):
+        raise ValueError("No per-sample N differences to draw from")
+    distributions = distributions or {}
+    unknown = set(distributions) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown economic parameters: {sorted(unknown)}")
+
+    sizes = [min(chunk_trials, trials - start) for start in range(0, trials, chunk_trials)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(chunk_seed, size, n_differences, distributions, compression)
+             for chunk_seed, size in zip(seeds, sizes)]
+
+    total = {'trials': 0, 'positive': 0, 'never_breaks_even': 0,
+             'sketches': {name: QuantileSketch(compression) for name in SIMULATION_METRICS}}
+
+    def fold(part):
+        for key in ('trials', 'positive', 'never_breaks_even'):
+            total[key] += part[key]
+        for name, sketch in part['sketches'].items():
+            total['sketches'][name].merge(sketch)
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            fold(_simulate_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for part in pool.map(_simulate_chunk, tasks):
+                fold(part)
+
+    return {
+        'trials': total['trials'],
+        'positive_share': total['positive'] / max(total['trials'], 1),
+        'never_breaks_even_share': total['never_breaks_even'] / max(total['trials'], 1),
+        'sketches': total['sketches'],
+    }
+
+
+def simulation_percentiles(result, probs=SIMULATION_PERCENTILES):
+    """Percentiles of every simulated metric: one row per metric, one column per probability."""
+    return pd.DataFrame({name: sketch.quantile(probs) for name, sketch in result['sketches'].items()},
+                        index=[f'P{prob * 100:g}' for prob in probs]).T
+
+
+# ============================================================================
+# PER-SAMPLE SCORES
+# ============================================================================
+
+TRAD_COL = 'Traditional N'
+HANEY_COL = 'Haney Test N'
+# Named price/cost scenarios: overrides of DEFAULT_PARAMETERS
+ECONOMIC_SCENARIOS = {
+    'baseline': {},
+    'low_n_price': {'nitrogen_price': 0.50},
+    'high_n_price': {'nitrogen_price': 1.20},
+    'large_field': {'acres_per_field': 320},
+}
+SCORE_COMPONENTS = ['net_benefit_per_acre', 'net_benefit_per_field', 'roi_percent']
+N_DIFFERENCE_COL = 'econ_n_difference'
+SCORE_SUFFIX = '.economics'
+
+
+def score_column(scenario, component='net_benefit_per_acre'):
+    """Name of a stored score column."""
+    return f'econ_{scenario}_{component}'
+
+
+def score_samples(data, scenarios=None, trad_col=TRAD_COL, haney_col=HANEY_COL):
+    """
+    Row-aligned economic scores of every sample: N_DIFFERENCE_COL plus
+    SCORE_COMPONENTS per scenario (name -> parameter overrides, default
+    ECONOMIC_SCENARIOS). Samples missing either N value score NaN.
+    """
+    scenarios = ECONOMIC_SCENARIOS if scenarios is None else scenarios
+    if trad_col in data.columns and haney_col in data.columns:
+        trad, haney = (pd.to_numeric(data[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+                       for col in (trad_col, haney_col))
+        n_difference = haney - trad
+    else:
+        n_difference = np.full(len(data), np.nan)
+    missing = np.isnan(n_difference)
+
+    scores = {N_DIFFERENCE_COL: n_difference}
+    for scenario, overrides in scenarios.items():
+        result = economic_model(n_difference, **{**DEFAULT_PARAMETERS, **overrides})
+        for component in SCORE_COMPONENTS:
+            scores[score_column(scenario, component)] = np.where(missing, np.nan, result[component])
+    return pd.DataFrame(scores)
+
+
+def group_scores(scores, groups, scenario='baseline'):
+    """
+    Scores of one scenario summarized per group (a row-aligned Series such
+    as ZIP, crop or batch): samples, mean and median net benefit per acre,
+    share of samples with a positive net benefit and mean ROI.
+    """
+    net = scores[score_column(scenario)]
+    frame = pd.DataFrame({
+        'net': net.to_numpy(),
+        'positive': (net > 0).where(net.notna()).to_numpy(dtype='float64', na_value=np.nan),
+        'roi': scores[score_column(scenario, 'roi_percent')].to_numpy(),
+    })
+    grouped = frame.groupby(pd.Series(groups).to_numpy(), observed=True, dropna=True)
+    table = grouped.agg(
+        samples=('net', 'count'),
+        mean_net_benefit_per_acre=('net', 'mean'),
+        median_net_benefit_per_acre=('net', 'median'),
+        positive_share=('positive', 'mean'),
+        mean_roi_percent=('roi', 'mean'),
+    )
+    table.index.name = getattr(groups, 'name', None)
+    return table[table['samples'] > 0].sort_values('samples', ascending=False)
+
+
+def score_path_for(csv_path):
+    """Score table path that sits alongside a combined CSV (Parquet, or CSV without pyarrow)."""
+    csv_path = Path(csv_path)
+    suffix = '.parquet' if PYARROW_AVAILABLE else '.csv'
+    return csv_path.with_name(csv_path.stem + SCORE_SUFFIX + suffix)
+
+
+def write_scores(scores, csv_path, part=None):
+    """Write a score table (or, with part, one part of it) next to csv_path and return its path."""
+    return write_table(scores, score_path_for(csv_path), part=part)
+
+
+def load_scores(csv_path, columns=None):
+    """Score table of the dataset at csv_path (optionally some columns), or None if it has not been built."""
+    path = score_path_for(csv_path)
+    if not path.exists():
+        return None
+    if PYARROW_AVAILABLE:
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+# ============================================================================
+# SCENARIO GRIDS
+# ============================================================================
+
+GRID_CHUNK_ROWS = 250_000
+GRID_FORMATS = ('csv', 'parquet')
+
+
+def scenario_grid_size(ranges):
+    """Number of scenarios in the full-factorial grid of ranges."""
+    # Python ints, so a grid too large for int64 is still counted exactly
+    return math.prod(len(np.atleast_1d(values)) for values in ranges.values())
+
+
+def iter_scenario_grid(ranges, fixed=None, chunk_rows=GRID_CHUNK_ROWS):
+    """
+    Full-factorial scenario grid in chunks.
+
+    ranges maps economic_model() parameter names (n_difference included) to
+    the values to combine; fixed gives scalar values for other parameters
+    (the rest stay at DEFAULT_PARAMETERS). The last parameter in ranges
+    varies fastest. Yields DataFrames of up to chunk_rows scenarios: one
+    column per ranged parameter, then ECONOMIC_COMPONENTS.
+    """
+    params = {**DEFAULT_PARAMETERS, **(fixed or {})}
+    unknown = set(ranges) - set(params) - {'n_difference'}
+    if unknown:
+        raise ValueError(f"Unknown economic parameters: {sorted(unknown)}")
+    if 'n_difference' not in ranges and 'n_difference' not in params:
+        raise ValueError("n_difference must be given in ranges or fixed")
+
+    names = list(ranges)
+    values = [np.atleast_1d(np.asarray(ranges[name], dtype='float64')) for name in names]
+    shape = tuple(len(axis) for axis in values)
+    total = scenario_grid_size(ranges)
+    for start in range(0, total, chunk_rows):
+        positions = np.unravel_index(np.arange(start, min(start + chunk_rows, total)), shape)
+        chunk = {name: axis[position] for name, axis, position in zip(names, values, positions)}
+        result = economic_model(**{**params, **chunk})
+        yield pd.DataFrame({**chunk, **{name: np.asarray(value) for name, value in result.items()}})
+
+
+def write_scenario_grid(ranges, path, fixed=None, file_format='csv', chunk_rows=GRID_CHUNK_ROWS):
+    """
+    Stream the scenario grid of ranges to a CSV or Parquet file, one chunk
+    at a time. Returns the number of scenarios written.
+    """
+    if file_format not in GRID_FORMATS:
+        raise ValueError(f"Unknown format {file_format!r}; expected one of {GRID_FORMATS}")
+    if file_format == 'parquet' and not PYARROW_AVAILABLE:
+        raise ImportError("Parquet export needs pyarrow")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if file_format == 'csv' and not PYARROW_AVAILABLE:
+        rows = 0
+        with open(path, 'w', newline='') as f:
+            for chunk in iter_scenario_grid(ranges, fixed, chunk_rows):
+                chunk.to_csv(f, header=rows == 0, index=False)
+                rows += len(chunk)
+        return rows
+
+    # Arrow's writers are several times faster than to_csv on float columns
+    rows = 0
+    writer = None
+    try:
+        for chunk in iter_scenario_grid(ranges, fixed, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if file_format == 'csv':
+                    writer = pa_csv.CSVWriter(path, table.schema,
+                                              write_options=pa_csv.WriteOptions(quoting_style='none'))
+                else:
+                    writer = pq.ParquetWriter(path, table.schema, compression=COMPRESSION)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
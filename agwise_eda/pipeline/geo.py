@@ -0,0 +1,180 @@
+"""
+Offline ZIP code geocoding.
+
+ZIP centroids (lat/lng plus city, state and county) ship as a compact
+table, agwise_eda/data/reference/zip_centroids.csv.gz. ZipGeocoder loads
+it once into sorted arrays and maps any number of ZIP codes with a single
+np.searchsorted join, so the dashboard map covers every ZIP without a
+per-row database lookup. build_zip_centroids() regenerates the table from
+the dataset embedded in the zipcodes package or from the uszipcode
+database (see scripts/build_zip_centroids.py); without the table,
+load_zip_geocoder() falls back to uszipcode when it is installed.
+
+Ingest normalizes the raw Zip column once (add_zip_columns) into a
+categorical zip5 column plus a zip_invalid flag, which the dashboard and
+any geographic aggregation read directly.
+"""
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ZIP_CENTROIDS_PATH = Path(__file__).resolve().parent.parent / 'data' / 'reference' / 'zip_centroids.csv.gz'
+ZIP_CENTROID_COLUMNS = ['zip', 'lat', 'lng', 'city', 'state', 'county']
+ZIP_CENTROID_SOURCES = ('uszipcode', 'zipcodes')
+# ZIP or ZIP+4, possibly written as a float or with its leading zeros lost
+ZIP_PATTERN = r'^(\d{3,5})(?:-\d{4})?$'
+ZIP5_COL = 'zip5'
+ZIP_INVALID_COL = 'zip_invalid'
+
+
+def normalize_zips(values):
+    """
+    5-digit ZIP strings for raw ZIP values; anything else becomes missing.
+
+    Handles numeric exports (62471.0), dropped leading zeros (2134 ->
+    02134) and ZIP+4. Each distinct value is parsed once.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype='object').astype('string').str.strip()
+    text = text.str.replace(r'\.0+$', '', regex=True)
+    zip5 = text.str.extract(ZIP_PATTERN)[0].str.zfill(5).to_numpy(dtype=object, na_value=None)
+    zip5 = np.append(zip5, None)  # code -1 (missing) maps to the last slot
+    return pd.Series(zip5[codes], index=values.index, dtype='string')
+
+
+def add_zip_columns(data, zip_col='Zip'):
+    """
+    Add zip5 (5-digit ZIP, categorical) and zip_invalid (a ZIP was given
+    but is not a US ZIP) to a frame in place. Returns the frame.
+    """
+    if zip_col not in data.columns:
+        return data
+    zip5 = normalize_zips(data[zip_col])
+    data[ZIP5_COL] = pd.Categorical(zip5.to_numpy(dtype=object, na_value=np.nan))
+    data[ZIP_INVALID_COL] = (data[zip_col].notna() & zip5.isna()).to_numpy()
+    return data
+
+
+class ZipGeocoder:
+    """Vectorized ZIP -> centroid lookup over a sorted centroid table."""
+
+    def __init__(self, table):
+        table = table.copy()
+        table['zip'] = normalize_zips(table['zip'])
+        table = (table.dropna(subset=['zip', 'lat', 'lng'])
+                 .drop_duplicates('zip')
+                 .sort_values('zip', ignore_index=True))
+        self.zips = table['zip'].astype('int32').to_numpy()
+        self.lat = table['lat'].to_numpy(dtype='float64')
+        self.lng = table['lng'].to_numpy(dtype='float64')
+        self.labels = {col: table[col].astype('category') for col in ['city', 'state', 'county']
+                       if col in table.columns}
+
+    def __len__(self):
+        return len(self.zips)
+
+    @classmethod
+    def from_file(cls, path=ZIP_CENTROIDS_PATH):
+        """Load the bundled centroid table."""
+        return cls(pd.read_csv(path, dtype={'zip': str}))
+
+    def geocode(self, zips):
+        """
+        Centroids for raw ZIP values, one row per input value.
+
+        Returns a frame with zip (normalized), lat, lng, city, state and
+        county; rows whose ZIP is invalid or unknown have missing fields.
+        The join runs over the distinct values only.
+        """
+        codes, uniques = pd.factorize(pd.Series(zips))
+        zip5 = normalize_zips(pd.Series(uniques, dtype='object'))
+        keys = pd.to_numeric(zip5, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+        # Unknown, invalid and missing (code -1) ZIPs point at a trailing
+        # "not found" slot of every lookup array
+        missing = len(self.zips)
+        position = np.full(len(keys) + 1, missing)
+        if len(self.zips):
+            valid = ~np.isnan(keys)
+            nearest = np.searchsorted(self.zips, np.where(valid, keys, -1)).clip(max=missing - 1)
+            position[:-1] = np.where(valid & (self.zips[nearest] == keys), nearest, missing)
+        position = position[codes]
+
+        result = pd.DataFrame({
+            'zip': pd.array(np.append(zip5.to_numpy(dtype=object, na_value=None), None)[codes],
+                            dtype='string'),
+            'lat': np.append(self.lat, np.nan)[position],
+            'lng': np.append(self.lng, np.nan)[position],
+        })
+        for col, labels in self.labels.items():
+            label_codes = np.append(labels.cat.codes.to_numpy(), -1)[position]
+            result[col] = pd.Categorical.from_codes(label_codes, labels.cat.categories)
+        return result
+
+
+def load_zip_geocoder(path=ZIP_CENTROIDS_PATH):
+    """
+    ZipGeocoder over the bundled table.
+
+    Falls back to the uszipcode database when the table is missing and
+    uszipcode is installed; returns None when neither is available.
+    """
+    path = Path(path)
+    if path.exists():
+        return ZipGeocoder.from_file(path)
+    try:
+        return ZipGeocoder(_uszipcode_table())
+    except ImportError:
+        return None
+
+
+def _uszipcode_table(db_path=None):
+    """Centroid table from the uszipcode "simple" SQLite database."""
+    if db_path is None:
+        from uszipcode import SearchEngine
+        search = SearchEngine()  # downloads the database if it is missing
+        db_path = search.db_file_path
+        search.close()
+
+    with sqlite3.connect(str(db_path)) as connection:
+        return pd.read_sql_query(
+            "SELECT zipcode AS zip, lat, lng, major_city AS city, state, county "
+            "FROM simple_zipcode WHERE lat IS NOT NULL AND lng IS NOT NULL",
+            connection
+        )
+
+
+def _zipcodes_table():
+    """Centroid table from the dataset embedded in the zipcodes package."""
+    import zipcodes
+    table = pd.DataFrame(zipcodes.list_all())
+    table = table.rename(columns={'zip_code': 'zip', 'long': 'lng'})
+    table['lat'] = pd.to_numeric(table['lat'], errors='coerce')
+    table['lng'] = pd.to_numeric(table['lng'], errors='coerce')
+    return table.dropna(subset=['lat', 'lng'])
+
+
+def build_zip_centroids(output_path=ZIP_CENTROIDS_PATH, db_path=None, source='uszipcode'):
+    """
+    Write the centroid table from a ZIP database. Returns the table.
+
+    source is 'uszipcode' (its "simple" SQLite database; db_path defaults
+    to the one uszipcode downloads on first use, ~/.uszipcode/simple_db.sqlite)
+    or 'zipcodes' (the dataset embedded in the zipcodes package, no
+    download needed).
+    """
+    if source not in ZIP_CENTROID_SOURCES:
+        raise ValueError(f"source must be one of {ZIP_CENTROID_SOURCES}, got {source!r}")
+    table = _uszipcode_table(db_path) if source == 'uszipcode' else _zipcodes_table()
+    table['lat'] = table['lat'].round(4)
+    table['lng'] = table['lng'].round(4)
+    table = table.sort_values('zip', ignore_index=True)[ZIP_CENTROID_COLUMNS]
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_path, index=False, compression='gzip')
+    return table
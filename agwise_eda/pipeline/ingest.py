@@ -0,0 +1,152 @@
+"""
+Parallel ingestion of the raw "Processed File (N).csv" lab batches.
+
+Files are parsed across a process pool, mapped to the canonical column
+names (see schema.py), tagged with _source_file, _source_batch and
+_source_schema, and merged in fixed-size groups so that only a bounded
+number of per-file frames is alive at any time.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from .geo import add_zip_columns
+from .schema import SCHEMA_COL, detect_schema, unify_columns
+
+METADATA_COLS = ['_source_file', '_source_batch', SCHEMA_COL]
+
+# Number of per-file frames concatenated into one partial frame
+DEFAULT_MERGE_GROUP = 64
+
+
+def discover_csv_files(data_dir):
+    """Find all CSV files under data_dir and group them by batch folder."""
+    csv_files = sorted(Path(data_dir).glob('**/*.csv'))
+    batches = {}
+    for file in csv_files:
+        batches.setdefault(file.parent.name, []).append(file)
+    return csv_files, batches
+
+
+def _read_csv_task(task):
+    """Read one CSV file in a worker process, map it to canonical columns and time it."""
+    path, batch = task
+    start = time.perf_counter()
+    try:
+        df = pd.read_csv(path)
+        schema = detect_schema(df.columns)
+        df = unify_columns(df)
+        df[SCHEMA_COL] = schema
+        df['_source_file'] = path.name
+        df['_source_batch'] = batch
+        error = None
+    except Exception as e:
+        df = None
+        error = str(e)
+
+    record = {
+        'file': path.name,
+        'batch': batch,
+        'path': str(path),
+        'rows': 0 if df is None else len(df),
+        'seconds': time.perf_counter() - start,
+        'error': error
+    }
+    return df, record
+
+
+def pool_context():
+    """
+    Multiprocessing context for worker pools.
+
+    Fork is preferred where available so that top-level analysis scripts,
+    which have no __main__ guard, are not re-executed in each worker.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _run_tasks(tasks, workers):
+    """Yield (frame, record) pairs in task order, keeping a bounded window in flight."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _read_csv_task(task)
+        return
+
+    max_in_flight = workers * 4
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_read_csv_task, task))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_csv_frames(files, batch_of=None, workers=None, merge_group=DEFAULT_MERGE_GROUP,
+                    load_log=None):
+    """
+    Yield merged DataFrames covering up to merge_group files each.
+
+    batch_of maps a file Path to its batch label (defaults to the parent
+    folder name) and is evaluated in the calling process. When load_log is
+    a list, one record per file (rows, seconds, error) is appended to it.
+    """
+    batch_of = batch_of or (lambda path: path.parent.name)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(Path(file), batch_of(Path(file))) for file in files]
+
+    group = []
+    for df, record in _run_tasks(tasks, workers):
+        if load_log is not None:
+            load_log.append(record)
+        if df is None:
+            continue
+        group.append(df)
+        if len(group) >= merge_group:
+            yield pd.concat(group, ignore_index=True)
+            group = []
+
+    if group:
+        yield pd.concat(group, ignore_index=True)
+
+
+def load_csv_files(files, batch_of=None, workers=None, merge_group=DEFAULT_MERGE_GROUP,
+                   progress=True):
+    """
+    Load and combine CSV files in parallel.
+
+    ZIP codes are normalized into zip5 / zip_invalid (see geo.py) once the
+    files are combined. Returns (data, load_log) where load_log is a
+    DataFrame with one row per file: file, batch, path, rows, seconds, error.
+    """
+    files = list(files)
+    records = []
+    partials = []
+    for partial in iter_csv_frames(files, batch_of=batch_of, workers=workers,
+                                   merge_group=merge_group, load_log=records):
+        partials.append(partial)
+        if progress:
+            print(f"  Loaded {len(records)}/{len(files)} files...")
+
+    if partials:
+        data = add_zip_columns(pd.concat(partials, ignore_index=True))
+    else:
+        data = pd.DataFrame(columns=METADATA_COLS)
+
+    load_log = pd.DataFrame(records, columns=['file', 'batch', 'path', 'rows', 'seconds', 'error'])
+    return data, load_log
+
+
+def load_errors_from_log(load_log):
+    """Return the (file name, error) pairs for files that failed to load."""
+    failed = load_log[load_log['error'].notna()]
+    return list(zip(failed['file'], failed['error']))
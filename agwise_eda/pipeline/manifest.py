@@ -0,0 +1,437 @@
+"""
+File manifest for incremental ingestion.
+
+The manifest records, for every raw CSV, its path relative to the data
+directory, size, mtime, SHA-256 and the store part (see store.py) its rows
+were written to. On the next run only files that are new or whose content
+changed are parsed and written as new parts; the parts of changed or
+deleted files are dropped and their remaining files re-read. Files that
+fail to parse are recorded with their error and skipped until their
+content changes.
+
+Column dtypes come from a DtypeAccumulator per part, profiled on the raw
+rows, so the dtype map of the merged profiles is the one a full rebuild
+would infer, whatever order the files arrived in. Existing parts are
+only rewritten when that map changes, e.g. when a new file widens a
+column from int8 to int16 or turns a numeric column into text.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from .dedup import (ROW_HASH_COL, append_unique, build_row_index, deduplicate, load_provenance,
+                    load_row_index, provenance_path_for, row_index_path_for, write_provenance, write_row_index)
+from .dtypes import (CSV_DATE_FORMAT, DtypeAccumulator, apply_dtypes, dtype_map_path_for, dtype_profile_path_for,
+                     load_dtype_map, load_dtype_profiles, merge_profiles, save_dtype_map, save_dtype_profiles)
+from .economics import score_path_for, score_samples, write_scores
+from .geo import ZIP5_COL, ZIP_INVALID_COL, add_zip_columns
+from .ingest import DEFAULT_MERGE_GROUP, discover_csv_files, iter_csv_frames
+from .sketch import build_sketches, sketch_path_for, write_sketches
+from .store import (PYARROW_AVAILABLE, load_dataset, part_files, part_name, part_names, read_store, remove_parts,
+                    remove_table, store_path_for, write_store)
+
+MANIFEST_NAME = 'ingest_manifest.json'
+# Bumped whenever the ingest transform changes so stale stores are rebuilt
+MANIFEST_VERSION = 6
+LOAD_LOG_COLUMNS = ['file', 'batch', 'path', 'rows', 'seconds', 'error']
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Load a manifest, returning an empty one if it does not exist."""
+    path = Path(path)
+    if not path.exists():
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Write a manifest atomically."""
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    tmp_path.replace(path)
+
+
+def build_manifest(files, data_dir, batch_of, previous=None):
+    """
+    Fingerprint files relative to data_dir.
+
+    Files whose size and mtime match the previous manifest reuse the stored
+    hash, so unchanged files are never read. Unchanged files keep the part
+    and the parse error recorded for them.
+    """
+    data_dir = Path(data_dir)
+    previous_files = (previous or {}).get('files', {})
+    entries = {}
+    for file in files:
+        file = Path(file)
+        key = file.relative_to(data_dir).as_posix()
+        stat = file.stat()
+        old = previous_files.get(key)
+        if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = old['sha256']
+        else:
+            sha256 = file_sha256(file)
+        entries[key] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'file': file.name,
+            'batch': batch_of(file)
+        }
+        if old and old['sha256'] == sha256:
+            for field in ['part', 'error']:
+                if field in old:
+                    entries[key][field] = old[field]
+    return {'version': MANIFEST_VERSION, 'files': entries}
+
+
+def diff_manifest(previous, current):
+    """
+    Classify manifest keys as added, changed, removed or unchanged, and list
+    the unchanged files skipped because they failed to parse before.
+    """
+    old = previous.get('files', {})
+    new = current.get('files', {})
+    changes = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+    for key, entry in new.items():
+        if key not in old:
+            changes['added'].append(key)
+        elif old[key]['sha256'] != entry['sha256']:
+            changes['changed'].append(key)
+        else:
+            changes['unchanged'].append(key)
+    changes['removed'] = [key for key in old if key not in new]
+    changes['failed'] = [key for key in changes['unchanged'] if 'error' in new[key]]
+    return changes
+
+
+def record_failures(manifest, load_log, data_dir):
+    """Mark the manifest entries of files that failed to parse in load_log with their error."""
+    failed = load_log[load_log['error'].notna()]
+    for path, error in zip(failed['path'], failed['error']):
+        key = Path(path).relative_to(data_dir).as_posix()
+        if key in manifest['files']:
+            manifest['files'][key]['error'] = error
+    return manifest
+
+
+def manifest_parts(manifest):
+    """Names of the store parts holding the rows of the manifest's files, in read order."""
+    return sorted({entry['part'] for entry in manifest['files'].values() if 'part' in entry})
+
+
+def _part_number(name):
+    return int(name.split('-')[1].split('.')[0])
+
+
+def _source_keys(entries):
+    """(batch, file name) pairs identifying rows that came from these entries."""
+    return {(entry['batch'], entry['file']) for entry in entries}
+
+
+def _from_sources(data, keys):
+    """Boolean mask of the rows of data whose (batch, file) is in keys."""
+    return pd.Series(list(zip(data['_source_batch'], data['_source_file']))).isin(keys).to_numpy()
+
+
+def dataset_layout(inferred):
+    """
+    Column order and dtype map given by a DtypeAccumulator over the raw
+    parts. ZIP columns go last, where add_zip_columns() puts them on a
+    whole frame.
+    """
+    zip_columns = [ZIP5_COL, ZIP_INVALID_COL]
+    columns = [col for col in inferred.columns if col not in zip_columns]
+    columns += [col for col in zip_columns if col in inferred.columns]
+    return columns, {col: inferred.dtype(col) for col in columns}
+
+
+def typed_chunk(raw, columns, dtype_map, categories=None):
+    """A raw part (ZIP columns added) in the dataset's column order and dtypes."""
+    chunk = raw.reindex(columns=columns)
+    for col in columns:
+        if dtype_map[col] == 'bool' and col not in raw.columns:
+            chunk[col] = False
+    return apply_dtypes(chunk, dtype_map, categories)
+
+
+def iter_parts(files, data_dir, batch_of=None, workers=None, merge_group=DEFAULT_MERGE_GROUP, first_part=0,
+               load_log=None):
+    """
+    Yield (part name, manifest keys, raw frame) for groups of up to
+    merge_group files, numbered from first_part. Frames have the ZIP
+    columns added; files that fail to parse belong to no part. When
+    load_log is a list, one record per file is appended to it.
+    """
+    data_dir = Path(data_dir)
+    records = [] if load_log is None else load_log
+    number, seen = first_part, len(records)
+    for raw in iter_csv_frames(files, batch_of=batch_of, workers=workers, merge_group=merge_group,
+                               load_log=records):
+        keys = [Path(record['path']).relative_to(data_dir).as_posix() for record in records[seen:]
+                if record['error'] is None]
+        seen = len(records)
+        yield part_name(number), keys, add_zip_columns(raw)
+        number += 1
+
+
+def _tables(combined_path):
+    """Tables written part for part next to the combined CSV: store, row index, scores, sketches."""
+    tables = [row_index_path_for(combined_path), score_path_for(combined_path), sketch_path_for(combined_path)]
+    return [store_path_for(combined_path), *tables] if PYARROW_AVAILABLE else tables
+
+
+def _load_profiles(combined_path, manifest, dedup):
+    """
+    Per-part dtype profiles of the existing dataset, or None when it cannot
+    be updated in place: files are missing, or their parts do not match the
+    manifest (an earlier run stopped half way).
+    """
+    profiles = load_dtype_profiles(dtype_profile_path_for(combined_path))
+    parts = manifest_parts(manifest)
+    if (profiles is None or sorted(profiles) != parts or not Path(combined_path).exists()
+            or load_dtype_map(dtype_map_path_for(combined_path)) is None):
+        return None
+    tables = [part_names(path) for path in _tables(combined_path)]
+    if not PYARROW_AVAILABLE:
+        consistent = all(tables)
+    elif dedup:
+        # Deduplicated rows are not tied to files, so their parts are numbered on their own
+        consistent = provenance_path_for(combined_path).exists() and all(names == tables[0] for names in tables)
+    else:
+        consistent = all(names == parts for names in tables)
+    return profiles if consistent else None
+
+
+def _write_csv(combined_path, chunks, columns):
+    """Write the combined CSV from a sequence of frames, replacing the old file once complete."""
+    tmp_path = combined_path.with_name(combined_path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(tmp_path, mode='a', header=header, index=False, date_format=CSV_DATE_FORMAT)
+        header = False
+    if header:
+        pd.DataFrame(columns=columns).to_csv(tmp_path, index=False)
+    tmp_path.replace(combined_path)
+
+
+def _append_csv(combined_path, chunks):
+    for chunk in chunks:
+        chunk.to_csv(combined_path, mode='a', header=False, index=False, date_format=CSV_DATE_FORMAT)
+
+
+def _write_part(combined_path, name, chunk, dtype_map):
+    """Write one part of the store, row index, scores and sketches."""
+    write_store(chunk, store_path_for(combined_path), part=name, dtype_map=dtype_map)
+    write_row_index(build_row_index(chunk), combined_path, part=name)
+    write_scores(score_samples(chunk), combined_path, part=name)
+    write_sketches(build_sketches(chunk), combined_path, part=name)
+
+
+def _write_whole(combined_path, data, columns, dtype_map):
+    """Replace the combined CSV and every table next to it with data, written as one part."""
+    if PYARROW_AVAILABLE:
+        write_store(data, store_path_for(combined_path), dtype_map=dtype_map)
+    write_row_index(build_row_index(data), combined_path)
+    write_scores(score_samples(data), combined_path)
+    write_sketches(build_sketches(data), combined_path)
+    _write_csv(combined_path, [data], columns)
+
+
+def _concat(chunks, columns):
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _write_parts(combined_path, parts, columns, dtype_map, incremental, stale):
+    """
+    Default mode: every part goes to the store and the tables next to it
+    under its own name. Parts of changed and removed files are deleted
+    afterwards; the CSV gets the new rows appended, or is rewritten from
+    the store when rows had to go.
+    """
+    remove_table(provenance_path_for(combined_path))
+    chunks = [chunk for _, _, chunk in parts]
+    if not PYARROW_AVAILABLE:
+        _write_whole(combined_path, _concat(chunks, columns), columns, dtype_map)
+        return
+
+    if not incremental:
+        for path in _tables(combined_path):
+            remove_table(path)
+    for name, _, chunk in parts:
+        _write_part(combined_path, name, chunk, dtype_map)
+    for path in _tables(combined_path):
+        remove_parts(path, stale)
+
+    if not incremental:
+        _write_csv(combined_path, chunks, columns)
+    elif stale:
+        store_path = store_path_for(combined_path)
+        _write_csv(combined_path, (read_store(part) for part in part_files(store_path)), columns)
+    else:
+        _append_csv(combined_path, chunks)
+
+
+def _write_deduplicated(combined_path, parts, columns, dtype_map, categories, incremental, stale, changes,
+                        previous, current):
+    """
+    Dedup mode. New files only: samples not stored yet are appended as one
+    more part and the provenance table gains the new occurrences. Changed
+    or removed files: their occurrences are dropped, the rows of new and
+    changed files folded in and the deduplicated dataset rewritten whole,
+    as it is on a rebuild.
+    """
+    chunks = [chunk for _, _, chunk in parts]
+    if incremental and not stale:
+        hashes = load_row_index(combined_path)[ROW_HASH_COL].to_numpy()
+        unique, provenance = append_unique(_concat(chunks, columns), load_provenance(combined_path), hashes)
+        name = part_name(max(map(_part_number, part_names(store_path_for(combined_path))), default=-1) + 1)
+        _write_part(combined_path, name, unique, dtype_map)
+        _append_csv(combined_path, [unique])
+        write_provenance(provenance, combined_path)
+        return
+
+    provenance = previous_hashes = None
+    if incremental:
+        data = load_dataset(combined_path)
+        previous_hashes = load_row_index(combined_path)[ROW_HASH_COL].to_numpy()
+        provenance = load_provenance(combined_path)
+        stale_keys = _source_keys(previous['files'][key] for key in changes['changed'] + changes['removed'])
+        provenance = provenance[~_from_sources(provenance, stale_keys)]
+        # Unchanged files re-read for their part are already stored
+        new_keys = _source_keys(current['files'][key] for key in changes['added'] + changes['changed'])
+        chunks = [data] + [chunk[_from_sources(chunk, new_keys)] for chunk in chunks]
+    data, provenance = deduplicate(_concat(chunks, columns), provenance, previous_hashes)
+    data = apply_dtypes(data, dtype_map, categories)
+    _write_whole(combined_path, data, columns, dtype_map)
+    write_provenance(provenance, combined_path)
+
+
+def update_combined_dataset(data_dir, combined_path, manifest_path=None, batch_of=None, workers=None,
+                            merge_group=DEFAULT_MERGE_GROUP, full_rebuild=False, dedup=False):
+    """
+    Bring the combined dataset in line with the raw files under data_dir.
+
+    Only new or changed files are parsed, plus the unchanged files that
+    shared a part with a changed or removed one. Their rows are written as
+    new parts of the columnar store, row-hash index, quantile sketches and
+    economic scores, appended to the CSV, and the parts they replace are
+    deleted. Everything is rebuilt from the raw files only when the dtype
+    map of the merged per-part profiles differs from the stored one.
+
+    With dedup=True each sample is stored once and the provenance table
+    (see dedup.py) records every batch/file it occurs in; changed and
+    removed files then drop their provenance entries, and a sample goes
+    only once no file holds it any more. Switching modes rebuilds.
+
+    Returns (data, load_log, changes); load_log covers the files read in
+    this run only, and changes['failed'] lists the unchanged files skipped
+    because they failed to parse in an earlier run.
+    """
+    data_dir = Path(data_dir)
+    combined_path = Path(combined_path)
+    manifest_path = Path(manifest_path or combined_path.parent / MANIFEST_NAME)
+    batch_of = batch_of or (lambda path: path.parent.name)
+
+    csv_files, _ = discover_csv_files(data_dir)
+    previous = load_manifest(manifest_path)
+    profiles = None
+    if not full_rebuild and previous['files'] and previous.get('dedup', False) == dedup:
+        profiles = _load_profiles(combined_path, previous, dedup)
+    if profiles is None:
+        # No usable prior state: rebuild from every file
+        previous = {'version': MANIFEST_VERSION, 'files': {}}
+        profiles = {}
+
+    current = build_manifest(csv_files, data_dir, batch_of, previous)
+    current['dedup'] = dedup
+    changes = diff_manifest(previous, current)
+    stale = {previous['files'][key]['part'] for key in changes['changed'] + changes['removed']
+             if 'part' in previous['files'][key]}
+
+    if previous['files'] and not (changes['added'] or changes['changed'] or stale):
+        save_manifest(current, manifest_path)
+        return load_dataset(combined_path), pd.DataFrame(columns=LOAD_LOG_COLUMNS), changes
+
+    # Without pyarrow the tables are single CSVs, so every change rebuilds them
+    incremental = bool(previous['files']) and PYARROW_AVAILABLE
+    keys = changes['added'] + changes['changed']
+    if incremental:
+        # Unchanged files that shared a part with a changed or removed file
+        keys += [key for key in changes['unchanged'] if current['files'][key].get('part') in stale]
+        profiles = {name: profile for name, profile in profiles.items() if name not in stale}
+    else:
+        keys += [key for key in changes['unchanged'] if key not in changes['failed']]
+
+    while True:
+        for key in keys:
+            current['files'][key].pop('part', None)
+            current['files'][key].pop('error', None)
+        first_part = max(map(_part_number, manifest_parts(previous)), default=-1) + 1 if incremental else 0
+        records = []
+        parts = []
+        for name, part_keys, raw in iter_parts([data_dir / key for key in sorted(keys)], data_dir, batch_of,
+                                               workers, merge_group, first_part, records):
+            profiles[name] = DtypeAccumulator().update(raw)
+            for key in part_keys:
+                current['files'][key]['part'] = name
+            parts.append((name, part_keys, raw))
+        load_log = pd.DataFrame(records, columns=LOAD_LOG_COLUMNS)
+        # Files that failed to parse are not read again until their content changes
+        record_failures(current, load_log, data_dir)
+
+        # Types come from the raw rows of every part, so they do not depend
+        # on the order files arrived in
+        inferred = merge_profiles(profiles[name] for name in sorted(profiles))
+        columns, dtype_map = dataset_layout(inferred)
+        if not incremental:
+            break
+        stored_map = load_dtype_map(dtype_map_path_for(combined_path))
+        if stored_map == dtype_map:
+            columns = list(stored_map)
+            break
+        # A column has to change type (or the column set changed): the
+        # stored parts no longer fit, so every part is rebuilt from raw
+        incremental = False
+        profiles = {}
+        stale = set()
+        keys = [key for key in current['files'] if key not in changes['failed']]
+
+    dtype_map = {col: dtype_map[col] for col in columns}
+    categories = inferred.categories()
+    for i, (name, part_keys, raw) in enumerate(parts):
+        parts[i] = (name, part_keys, typed_chunk(raw, columns, dtype_map, categories))
+
+    combined_path.parent.mkdir(parents=True, exist_ok=True)
+    if dedup:
+        _write_deduplicated(combined_path, parts, columns, dtype_map, categories, incremental, stale, changes,
+                            previous, current)
+    else:
+        _write_parts(combined_path, parts, columns, dtype_map, incremental, stale)
+    save_dtype_profiles(profiles, dtype_profile_path_for(combined_path))
+    save_dtype_map(dtype_map, dtype_map_path_for(combined_path))
+    save_manifest(current, manifest_path)
+
+    return load_dataset(combined_path), load_log, changes
@@ -0,0 +1,235 @@
+"""
+Compute behind the dashboard pages, without Streamlit.
+
+The dashboard (app.py and pages/02_Economic_Analysis.py) draws what these
+functions return, and run_benchmarks.py times the same functions at the
+pages' default selections, so a benchmark measures what a page rerun
+costs rather than a copy of it. Caching (st.cache_data) stays in the
+pages; apart from load_n_columns() everything here takes the loaded
+dataset, cube or sketches.
+"""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cube import HEALTH_COL
+from .economics import HANEY_COL, TRAD_COL, economic_model, simulate_roi, simulation_percentiles, write_scenario_grid
+from .schema import resolve_column
+from .sketch import QuantileSketch
+from .store import dataset_columns, load_dataset
+
+# Columns need this many values to be offered in the explorers
+MIN_VALID_COUNT = 100
+# Scatter plots and regression lines use a sample of this many rows
+MAX_PLOT_POINTS = 2000
+PLOT_SEED = 42
+
+HEALTH_FACTORS = ['CO2-C', 'Organic Matter', '1:1 Soil pH', 'H3A ICAP Potassium', 'H3A ICAP Calcium']
+MIN_FACTOR_PAIRS = 50
+# Variables the correlation explorer opens on, when present
+DEFAULT_CORRELATION_PAIR = (HEALTH_COL, 'CO2-C')
+PERCENTILES = [0, 10, 25, 50, 75, 90, 100]
+
+# Literature values used when the data has no Traditional/Haney N pairs
+ESTIMATED_N = {'traditional_mean': 27.0, 'haney_mean': 60.0, 'difference_mean': 33.0,
+               'difference_median': 31.0}
+# Net benefit per acre is swept over these values, one parameter at a time
+SENSITIVITY_RANGES = {
+    'nitrogen_price': np.linspace(0.40, 1.50, 50),
+    'acres_per_field': np.linspace(10, 500, 50),
+    'n_difference': np.linspace(0, 80, 50),
+    'haney_cost': np.linspace(30, 100, 50),
+    'testing_frequency_years': np.linspace(1, 5, 5),
+}
+SCENARIO_FIELD_SIZES = np.array([20, 40, 80, 160, 320])
+SCENARIO_N_PRICES = np.array([0.50, 0.65, 0.75, 0.90, 1.20])
+# Monte Carlo ranges around each parameter's value: (below, above, slider min, slider max)
+SIMULATION_RANGES = {
+    'nitrogen_price': (0.25, 0.35, 0.20, 2.00),
+    'crop_price': (1.5, 1.5, 2.0, 10.0),
+    'haney_cost': (10.0, 15.0, 20.0, 120.0),
+    'application_cost': (4.0, 4.0, 0.0, 40.0),
+}
+SIMULATION_TRIALS = 100_000
+SIMULATION_SEED = 42
+# Quantiles that stand in for the trials in the ROI histogram
+ROI_HISTOGRAM_QUANTILES = np.linspace(0.001, 0.999, 1000)
+
+
+# ============================================================================
+# MAIN DASHBOARD
+# ============================================================================
+
+def geocode_zip_counts(zip_counts, geocoder):
+    """ZIP counts with lat, lng, city and state, dropping ZIPs the geocoder does not know."""
+    located = geocoder.geocode(zip_counts['zip'])
+    geo_data = pd.concat([zip_counts, located.drop(columns='zip')], axis=1)
+    geo_data = geo_data.dropna(subset=['lat', 'lng'])
+    geo_data[['city', 'state']] = geo_data[['city', 'state']].astype(object).fillna('Unknown')
+    return geo_data
+
+
+def health_factor_correlations(data, health_col=HEALTH_COL, factors=HEALTH_FACTORS):
+    """Correlation of each factor with the health score, strongest positive first."""
+    correlations = []
+    if health_col not in data.columns:
+        return pd.DataFrame(columns=['Factor', 'Correlation'])
+    for col in factors:
+        if col not in data.columns or data[col].notna().sum() <= MIN_VALID_COUNT:
+            continue
+        pair = data[[health_col, col]].dropna()
+        if len(pair) > MIN_FACTOR_PAIRS:
+            correlations.append({'Factor': col, 'Correlation': pair[health_col].corr(pair[col])})
+    return (pd.DataFrame(correlations, columns=['Factor', 'Correlation'])
+            .sort_values('Correlation', ascending=False))
+
+
+def cover_crop_summary(cover_health, cover_col='Cover Crop Mix'):
+    """Health score summary per cover crop mix, best mean first."""
+    return (cover_health.set_index(cover_col)
+            [['count', 'mean', 'median', 'std', 'min', 'max']]
+            .round(2).sort_values('mean', ascending=False))
+
+
+def n_comparison(data):
+    """Rows with both Traditional and Haney N, or None if either column is missing."""
+    if TRAD_COL not in data.columns or HANEY_COL not in data.columns:
+        return None
+    return data[[TRAD_COL, HANEY_COL]].dropna()
+
+
+def savings_summary(comparison, n_cost):
+    """Mean, median and total savings of the per-sample N difference at n_cost $/lb."""
+    savings = (comparison[HANEY_COL] - comparison[TRAD_COL]) * n_cost
+    return {'mean': savings.mean(), 'median': savings.median(), 'total': savings.sum()}
+
+
+def valid_numeric_columns(data, min_count=MIN_VALID_COUNT):
+    """Numeric columns with more than min_count values."""
+    return [col for col in data.select_dtypes(include=[np.number]).columns
+            if data[col].notna().sum() > min_count]
+
+
+def default_correlation_pair(columns, preferred=DEFAULT_CORRELATION_PAIR):
+    """Positions in columns of the two variables the correlation explorer opens on."""
+    return tuple(columns.index(col) if col in columns else fallback
+                 for col, fallback in zip(preferred, (0, 1)))
+
+
+def pair_correlation(data, var1, var2, max_points=MAX_PLOT_POINTS):
+    """
+    Pearson r of two columns over their shared rows, with the rows to plot
+    (a sample of up to max_points) and the regression line fitted to them.
+
+    Returns None when the columns share no rows.
+    """
+    pair = data[[var1, var2]].dropna()
+    if len(pair) == 0:
+        return None
+    plot_data = pair.sample(max_points, random_state=PLOT_SEED) if len(pair) > max_points else pair
+    return {'n': len(pair), 'r': pair[var1].corr(pair[var2]), 'plot_data': plot_data,
+            'fit': np.polyfit(plot_data[var1], plot_data[var2], 1)}
+
+
+def variable_summary(values, sketch=None, percentiles=PERCENTILES):
+    """
+    Count, mean, median, std, CV and percentiles of one column's values.
+
+    Median and percentiles come from the column's ingest-time sketch when
+    one is given, and from a sketch of the values otherwise.
+    """
+    values = values.dropna()
+    sketch = sketch or QuantileSketch.from_values(values)
+    mean, std = values.mean(), values.std()
+    return {'count': len(values), 'mean': mean, 'median': sketch.median(), 'std': std,
+            'cv': std / mean * 100 if mean != 0 else 0,
+            'percentiles': pd.Series(sketch.quantile([p / 100 for p in percentiles]), index=percentiles)}
+
+
+# ============================================================================
+# ECONOMIC ANALYSIS PAGE
+# ============================================================================
+
+def load_n_columns(csv_path):
+    """
+    Traditional and Haney N only, under their canonical names. Each
+    column's spelling is resolved once from the header, then just those
+    columns are read from the columnar store.
+    """
+    columns = dataset_columns(csv_path)
+    found = {canonical: resolve_column(columns, canonical) for canonical in (TRAD_COL, HANEY_COL)}
+    data = load_dataset(csv_path, columns=[col for col in found.values() if col])
+    return data.rename(columns={col: canonical for canonical, col in found.items() if col})
+
+
+def n_difference_summary(data):
+    """
+    Traditional and Haney N means, the mean and median of Haney - Traditional
+    and the per-sample differences. Falls back to ESTIMATED_N (and a single
+    difference) when the data has no pairs; 'samples' is then 0.
+    """
+    valid = n_comparison(data)
+    if valid is None or len(valid) == 0:
+        return {'samples': 0, **ESTIMATED_N, 'differences': np.array([ESTIMATED_N['difference_mean']])}
+    traditional_mean = valid[TRAD_COL].mean()
+    haney_mean = valid[HANEY_COL].mean()
+    return {
+        'samples': len(valid),
+        'traditional_mean': traditional_mean,
+        'haney_mean': haney_mean,
+        'difference_mean': haney_mean - traditional_mean,
+        'difference_median': valid[HANEY_COL].median() - valid[TRAD_COL].median(),
+        'differences': (valid[HANEY_COL] - valid[TRAD_COL]).to_numpy(dtype='float64'),
+    }
+
+
+def sensitivity_curve(n_difference, params, param, values=None):
+    """Net benefit per acre with param swept over values (default SENSITIVITY_RANGES)."""
+    values = SENSITIVITY_RANGES[param] if values is None else values
+    return economic_model(**{'n_difference': n_difference, **params, param: values})['net_benefit_per_acre']
+
+
+def scenario_matrix(n_difference, params, n_prices=SCENARIO_N_PRICES, field_sizes=SCENARIO_FIELD_SIZES):
+    """Net benefit per acre, one row per nitrogen price and one column per field size."""
+    return economic_model(n_difference, **{**params, 'nitrogen_price': n_prices[:, None],
+                                           'acres_per_field': field_sizes[None, :]})['net_benefit_per_acre']
+
+
+def simulation_bounds(params):
+    """Default Monte Carlo (low, high) range of each drawn parameter around its value."""
+    bounds = {}
+    for name, (below, above, lowest, highest) in SIMULATION_RANGES.items():
+        bounds[name] = (max(lowest, params[name] - below), min(highest, params[name] + above))
+    return bounds
+
+
+def simulation_distributions(params, bounds):
+    """params with each bounded parameter drawn from a triangular distribution peaking at its value."""
+    distributions = dict(params)
+    for name, (low, high) in bounds.items():
+        distributions[name] = ('triangular', low, min(max(params[name], low), high), high)
+    return distributions
+
+
+def roi_simulation(n_differences, distributions, trials=SIMULATION_TRIALS, seed=SIMULATION_SEED):
+    """
+    simulate_roi() reduced to what the page shows: trials run, share with
+    a positive net benefit, share that never breaks even, the metric
+    percentiles and ROI_HISTOGRAM_QUANTILES of the ROI.
+    """
+    # In-process: no worker pool inside the Streamlit server
+    result = simulate_roi(n_differences, distributions, trials=trials, seed=seed, workers=1)
+    roi_quantiles = result['sketches']['roi_percent'].quantile(ROI_HISTOGRAM_QUANTILES)
+    return (result['trials'], result['positive_share'], result['never_breaks_even_share'],
+            simulation_percentiles(result), roi_quantiles)
+
+
+def scenario_grid_bytes(ranges, fixed=None, file_format='csv'):
+    """The write_scenario_grid() file for ranges, as bytes for a download."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        export_path = Path(tmp_dir) / f'scenarios.{file_format}'
+        write_scenario_grid(ranges, export_path, fixed=fixed, file_format=file_format)
+        return export_path.read_bytes()
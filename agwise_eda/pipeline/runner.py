@@ -0,0 +1,262 @@
+"""
+Minimal DAG runner for the analysis stages.
+
+A Stage declares the in-memory artifacts it consumes (inputs) and produces
+(outputs), the files it reads (sources) and the files it writes.
+run_pipeline() executes a stage once the stages producing its inputs and
+sources are done. When several stages are ready at once they run
+concurrently in forked worker processes, which inherit the artifacts
+(e.g. the loaded dataset) without pickling them. Each stage is timed and
+the peak resident set size of the process that ran it recorded. Python
+heap tracing (tracemalloc) slows stages several times over, so it only
+runs when asked for with trace_memory=True.
+
+With a StageCache, a stage whose key (code version, parameters, input
+fingerprints, source content) matches a stored entry is not run: its
+files are restored if needed and its artifacts are loaded only when a
+stage that does run consumes them.
+"""
+
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from .cache import fingerprint
+from .ingest import pool_context
+
+RUN_LOG_COLUMNS = ['stage', 'status', 'seconds', 'peak_traced_mb', 'max_rss_mb', 'pid', 'key', 'error']
+
+# Artifacts and stages visible to forked workers
+_WORKER_STATE = {}
+
+
+class Stage:
+    """
+    A named unit of work with declared inputs, outputs and files.
+
+    sources are files or directories the stage reads from disk; files are
+    the paths it writes (glob patterns allowed). version identifies the
+    stage's code for caching, e.g. a code_version() hash.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), files=(), params=None,
+                 sources=(), version=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.files = tuple(files)
+        self.params = dict(params or {})
+        self.sources = tuple(sources)
+        self.version = version
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={list(self.inputs)}, outputs={list(self.outputs)})"
+
+
+def _max_rss_mb():
+    """Peak resident set size of this process in MB."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return max_rss / 1024**2 if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _execute(stage, artifacts, trace_memory=False):
+    """Run one stage, returning (outputs, run record)."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    outputs = {}
+    try:
+        inputs = {name: artifacts[name] for name in stage.inputs}
+        outputs = stage.func(**inputs, **stage.params) or {}
+        missing = [name for name in stage.outputs if name not in outputs]
+        if missing:
+            raise RuntimeError(f"stage did not produce {missing}")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        outputs = {}
+    seconds = time.perf_counter() - start
+    peak_traced_mb = None
+    if trace_memory:
+        peak_traced_mb = round(tracemalloc.get_traced_memory()[1] / 1024**2, 1)
+        tracemalloc.stop()
+
+    record = {
+        'stage': stage.name,
+        'status': 'failed' if error else 'ok',
+        'seconds': round(seconds, 3),
+        'peak_traced_mb': peak_traced_mb,
+        'max_rss_mb': round(_max_rss_mb(), 1),
+        'pid': os.getpid(),
+        'error': error
+    }
+    return {name: outputs[name] for name in stage.outputs if name in outputs}, record
+
+
+def _execute_in_worker(name):
+    """Worker entry point: look the stage and its inputs up in the forked state."""
+    return _execute(_WORKER_STATE['stages'][name], _WORKER_STATE['artifacts'],
+                    _WORKER_STATE['trace_memory'])
+
+
+def _validate(stages, artifacts):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("stage names must be unique")
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"{output!r} is produced by both {producers[output]!r} and {stage.name!r}")
+            producers[output] = stage.name
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in producers and name not in artifacts:
+                raise ValueError(f"stage {stage.name!r} needs {name!r}, which no stage produces")
+    return producers
+
+
+def _dependencies(stages, producers, artifacts):
+    """Stages each stage waits for: producers of its inputs and of its sources."""
+    written = {}
+    for stage in stages:
+        for file in stage.files:
+            written[Path(file).resolve()] = stage.name
+
+    dependencies = {}
+    for stage in stages:
+        upstream = {producers[name] for name in stage.inputs if name not in artifacts}
+        for source in map(lambda path: Path(path).resolve(), stage.sources):
+            upstream.update(name for file, name in written.items()
+                            if file == source or source in file.parents)
+        upstream.discard(stage.name)
+        dependencies[stage.name] = upstream
+    return dependencies
+
+
+def _run_ready(ready, artifacts, workers, trace_memory=False):
+    """Execute ready stages, forking workers when there are several."""
+    if len(ready) == 1 or workers <= 1:
+        return [_execute(stage, artifacts, trace_memory) for stage in ready]
+    _WORKER_STATE['stages'] = {stage.name: stage for stage in ready}
+    _WORKER_STATE['artifacts'] = artifacts
+    _WORKER_STATE['trace_memory'] = trace_memory
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ready)),
+                                 mp_context=pool_context()) as pool:
+            futures = [pool.submit(_execute_in_worker, stage.name) for stage in ready]
+            return [future.result() for future in futures]
+    finally:
+        _WORKER_STATE.clear()
+
+
+def run_pipeline(stages, workers=None, artifacts=None, progress=True, cache=None,
+                 trace_memory=False):
+    """
+    Run stages in dependency order.
+
+    Stages whose dependencies are all done run together, in parallel when
+    workers > 1. Stages downstream of a failed stage are skipped. With a
+    StageCache, stages whose key matches a stored entry are restored
+    instead of run (status 'cached').
+
+    max_rss_mb is the peak RSS of the process that ran the stage (the
+    parent for a stage run alone, so it includes earlier stages).
+    trace_memory=True also records peak_traced_mb from tracemalloc, at
+    a large cost in stage time; it is left empty otherwise.
+
+    Returns (artifacts, run_log) where run_log has one row per stage.
+    Artifacts of cached stages are only present if a stage that ran
+    needed them.
+    """
+    stages = list(stages)
+    artifacts = dict(artifacts or {})
+    producers = _validate(stages, artifacts)
+    dependencies = _dependencies(stages, producers, artifacts)
+    workers = workers or os.cpu_count() or 1
+    fingerprints = {name: fingerprint(value) for name, value in artifacts.items()} if cache else {}
+    stored = {}  # cached artifact name -> object hash, loaded on demand
+    records = []
+    done = set()
+    failed = set()
+    pending = list(stages)
+
+    while pending:
+        blocked = [stage for stage in pending if dependencies[stage.name] & failed]
+        for stage in blocked:
+            failed.add(stage.name)
+            records.append({'stage': stage.name, 'status': 'skipped', 'error': 'upstream stage failed'})
+            if progress:
+                print(f"  - {stage.name}: skipped (upstream stage failed)")
+        pending = [stage for stage in pending if stage not in blocked]
+
+        ready = [stage for stage in pending if dependencies[stage.name] <= done]
+        if not ready:
+            if pending:
+                raise ValueError(f"dependency cycle between {[stage.name for stage in pending]}")
+            break
+        pending = [stage for stage in pending if stage not in ready]
+
+        keys = {}
+        if cache is not None:
+            to_run = []
+            for stage in ready:
+                start = time.perf_counter()
+                keys[stage.name] = cache.stage_key(stage, fingerprints)
+                entry = cache.lookup(keys[stage.name])
+                if entry is None:
+                    to_run.append(stage)
+                    continue
+                restored = cache.restore(entry)
+                fingerprints.update(entry['artifacts'])
+                stored.update(entry['artifacts'])
+                done.add(stage.name)
+                records.append({'stage': stage.name, 'status': 'cached',
+                                'seconds': round(time.perf_counter() - start, 3),
+                                'key': keys[stage.name], 'error': None})
+                if progress:
+                    print(f"  ✓ {stage.name}: cached ({keys[stage.name][:12]}"
+                          + (f", {restored} files restored)" if restored else ")"))
+            ready = to_run
+            if not ready:
+                continue
+
+        # Stages that run need the real values of cached artifacts
+        for stage in ready:
+            for name in stage.inputs:
+                if name not in artifacts:
+                    artifacts[name] = cache.load_artifact(stored[name])
+
+        if progress:
+            print(f"\n▶ Running {', '.join(stage.name for stage in ready)}"
+                  + (f" ({min(workers, len(ready))} workers)" if len(ready) > 1 and workers > 1 else ""))
+
+        results = _run_ready(ready, artifacts, workers, trace_memory)
+
+        for stage, (outputs, record) in zip(ready, results):
+            if record['status'] == 'ok':
+                artifacts.update(outputs)
+                done.add(stage.name)
+                if cache is not None:
+                    entry = cache.store(keys[stage.name], stage, outputs, record['seconds'])
+                    fingerprints.update(entry['artifacts'])
+                    record['key'] = keys[stage.name]
+            else:
+                failed.add(stage.name)
+            records.append(record)
+            if progress:
+                mark = '✓' if record['status'] == 'ok' else '✗'
+                print(f"  {mark} {stage.name}: {record['seconds']:.2f}s, "
+                      f"peak RSS {record['max_rss_mb']:.0f} MB"
+                      + (f", {record['peak_traced_mb']:.1f} MB traced" if trace_memory else "")
+                      + (f" - {record['error']}" if record['error'] else ""))
+
+    return artifacts, pd.DataFrame(records, columns=RUN_LOG_COLUMNS)
@@ -0,0 +1,122 @@
+"""
+Canonical column registry for the two lab export conventions.
+
+The lab has shipped two header styles: a long form with units
+("Organic Matter, % LOI", "Traditional Test N, lbs/A", ...), referred to
+as v1, and a short form ("Organic Matter", "Traditional N", ...), v2.
+Both describe the same measurements. The short v2 names are canonical;
+every v1 spelling (including typos seen in the raw files) is listed as a
+synonym and renamed at ingest so the combined frame has one column per
+measurement.
+"""
+
+import pandas as pd
+
+SCHEMA_COL = '_source_schema'
+
+# canonical name -> synonyms found in the raw exports
+CANONICAL_COLUMNS = {
+    'Lab No': ['Lab ID'],
+    'Beginning Depth': ['Beginning Depth '],
+    '1:1 Soil pH': ['Soil pH 1:1', '1:1 pH'],
+    'WDRF Buffer': ['Wdrf Buffer', 'Woodruff Buffer pH'],
+    '1:1 Soluble Salt': ['1:1 Electrical Conductivity, mmho/cm'],
+    'Organic Matter': ['Organic Matter, % LOI'],
+    'CO2-C': ['Soil Respiration, ppm CO2-C'],
+    'H2O Total N': ['H2O Total N, ppm N'],
+    'H2O Organic N': ['H2O Org. N, ppm N'],
+    'H2O Total Organic C': ['H2O Total Org. C, ppm C'],
+    'H3A Nitrate': ['H3A Nitrate, ppm NO3-N'],
+    'H3A Ammonium': ['H3A Ammonium, ppm NH4-N'],
+    'H3A Inorganic Nitrogen': ['H3A Inorganic N, ppm N'],
+    'H3A Total Phosphorus': ['H3A Total Phosphorus, ppm P'],
+    'H3A Inorganic Phosphorus': ['H3A Inorganic Phosphorus, ppm PO4-P'],
+    'H3A Organic Phosphorus': ['H3A Organic Phosphorus, ppm P'],
+    'H3A ICAP Potassium': ['H3A Potassium, ppm K'],
+    'H3A ICAP Calcium': ['H3A Calcium, ppm Ca'],
+    'H3A ICAP Magnesium': ['H3A Magnesium, ppm Mg', 'H3A Magnessium, ppm Mg'],
+    'H3A ICAP Sodium': ['H3A Sodium, ppm Na'],
+    'H3A ICAP Sulfur': ['H3A Sulfur, ppm S'],
+    'H3A ICAP Zinc': ['H3A Zinc, ppm Zn'],
+    'H3A ICAP Iron': ['H3A Iron, ppm Fe'],
+    'H3A ICAP Manganese': ['H3A Manganese, ppm Mn'],
+    'H3A ICAP Copper': ['H3A Copper, ppm Cu'],
+    'H3A ICAP Aluminum': ['H3A Aluminum, ppm Al'],
+    '% MAC': ['Microbially Active C, %'],
+    'Organic C:N': ['H2O Org. C:Org. N ', 'H2O Org. C:Org. N'],
+    'Organic N:Inorganic N': ['H2O Org. N:H3A Inorg. N'],
+    'Organic N Release': ['Organic N Release, ppm N'],
+    'Organic N Reserve': ['Organic N Reserve, ppm N'],
+    'Organic P Release': ['Organic P Release, ppm P'],
+    'Organic P Reserve': ['Organic P Reserve, ppm P'],
+    'Soil Health Calculation': ['Soil Health Score'],
+    'Available N': ['Available N, lbs/A'],
+    'Available P': ['Available P, lbs/A'],
+    'Available K': ['Available K, lbs/A'],
+    'Nutrient Value': ['Nutrient Value, $'],
+    'Traditional N': ['Traditional Test N, lbs/A'],
+    'Haney Test N': ['Haney Test N, lbs/A'],
+    'Lbs N Difference': ['N Difference, lbs/A'],
+    'N savings': ['N Savings, $'],
+    'Cover Crop Mix': ['Cover crop mix', 'Cover Crop mix'],
+}
+
+SYNONYMS = {synonym: canonical
+            for canonical, synonyms in CANONICAL_COLUMNS.items()
+            for synonym in synonyms}
+
+
+def canonical_name(column):
+    """Canonical name for a raw column header."""
+    return SYNONYMS.get(column, column)
+
+
+def column_variants(canonical):
+    """All known spellings of a canonical column, canonical first."""
+    return [canonical] + CANONICAL_COLUMNS.get(canonical, [])
+
+
+def unify_columns(df):
+    """
+    Rename synonymous columns to their canonical names.
+
+    Single-file frames only carry one spelling and are simply renamed.
+    Frames that carry several spellings of the same measurement (e.g. an
+    older combined CSV) are coalesced: the first non-null value wins, with
+    the canonical column taking precedence. Returns a new frame.
+    """
+    groups = {}
+    for col in df.columns:
+        groups.setdefault(canonical_name(col), []).append(col)
+
+    if all(len(cols) == 1 for cols in groups.values()):
+        return df.rename(columns={cols[0]: canonical for canonical, cols in groups.items()})
+
+    unified = {}
+    for canonical, cols in groups.items():
+        cols = sorted(cols, key=lambda col: col != canonical)
+        merged = df[cols[0]]
+        for col in cols[1:]:
+            merged = merged.combine_first(df[col])
+        unified[canonical] = merged
+    return pd.DataFrame(unified, index=df.index)
+
+
+def detect_schema(columns):
+    """
+    'v1' for long-form headers, otherwise 'v2'.
+
+    Case and whitespace variants (e.g. "Cover crop mix") occur in both
+    conventions and are ignored.
+    """
+    for col in columns:
+        canonical = SYNONYMS.get(col)
+        if canonical and canonical.lower() != col.strip().lower():
+            return 'v1'
+    return 'v2'
+
+
+def resolve_column(columns, canonical):
+    """First spelling of a canonical column present in columns, or None."""
+    columns = set(columns)
+    return next((col for col in column_variants(canonical) if col in columns), None)
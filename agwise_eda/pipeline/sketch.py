@@ -0,0 +1,239 @@
+"""
+Mergeable quantile sketches for the numeric columns of the soil dataset.
+
+QuantileSketch is a merging t-digest: a column is summarized by sorted
+centroids (mean, weight) that are small near the tails and larger near the
+median, so any percentile comes back with a bounded rank error (about
+0.5% at the median, less towards the tails) from a few hundred numbers.
+Up to EXACT_LIMIT values are kept as they are, which makes small columns
+and groups exact. The smallest and largest values always stay their own
+centroids, so min and max are exact too. Sketches of separate chunks or
+batches merge into the sketch of their union.
+
+SketchSet holds one sketch per numeric column over the whole dataset and
+per group of a few grouping columns (source batch, cover crop mix). Ingest
+writes it next to the combined CSV as <stem>.sketches.parquet, one part per
+part of the store, so medians, percentiles and IQR fences per column or per
+group never need the rows; load_sketches() merges the parts.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .store import PYARROW_AVAILABLE, write_table
+
+# Centroid budget of a compressed sketch (the t-digest delta): roughly
+# DEFAULT_COMPRESSION / 2 centroids, rank error ~pi / DEFAULT_COMPRESSION
+# at the median in the worst case
+DEFAULT_COMPRESSION = 500
+# Values kept uncompressed; sketches of up to this many values are exact
+EXACT_LIMIT = 4 * DEFAULT_COMPRESSION
+SKETCH_SUFFIX = '.sketches'
+SKETCH_GROUP_COLUMNS = ['_source_batch', 'Cover Crop Mix']
+SKETCH_COLS = ['group_by', 'group', 'column', 'mean', 'weight']
+
+
+def _compress(means, weights, compression):
+    """Merge sorted centroids along the arcsine scale; the extremes stay single."""
+    total = weights.sum()
+    q = (np.cumsum(weights) - weights / 2) / total
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+    starts = np.flatnonzero(np.diff(k)) + 1
+    starts = np.unique(np.concatenate([[0, 1], starts, [len(means) - 1]]))
+    starts = starts[starts < len(means)]
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class QuantileSketch:
+    """
+    Mergeable t-digest of one numeric column.
+
+    NaN and infinite values are ignored. Quantiles interpolate linearly
+    between centroids, matching np.quantile's default method exactly while
+    the sketch holds at most EXACT_LIMIT values.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def __len__(self):
+        return len(self.means)
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        return cls(compression).update(values)
+
+    @classmethod
+    def from_centroids(cls, means, weights, compression=DEFAULT_COMPRESSION):
+        """Sketch over stored centroids (as written by SketchSet, possibly several sketches' worth)."""
+        return cls(compression)._add(np.asarray(means, dtype='float64'), np.asarray(weights, dtype='float64'))
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    @property
+    def min(self):
+        return self.means[0] if len(self.means) else np.nan
+
+    @property
+    def max(self):
+        return self.means[-1] if len(self.means) else np.nan
+
+    def update(self, values):
+        """Fold an array or Series of values into the sketch. Returns self."""
+        if not (isinstance(values, np.ndarray) and values.dtype == 'float64'):
+            values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        values = values[np.isfinite(values)]
+        return self._add(values, np.ones(len(values)))
+
+    def merge(self, other):
+        """Fold another sketch into this one. Returns self."""
+        return self._add(other.means, other.weights)
+
+    def _add(self, means, weights):
+        if not len(means):
+            return self
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        self.means, self.weights = means[order], weights[order]
+        if len(self.means) > max(EXACT_LIMIT, self.compression):
+            self.means, self.weights = _compress(self.means, self.weights, self.compression)
+        return self
+
+    def quantile(self, probs):
+        """Quantile(s) at probability or probabilities probs (NaN when empty)."""
+        probs = np.asarray(probs, dtype='float64')
+        if not len(self.means):
+            return np.full(probs.shape, np.nan) if probs.ndim else np.nan
+        # Centroid i covers ranks [before_i, before_i + weight_i - 1]; it sits
+        # at the middle of that range
+        before = np.cumsum(self.weights) - self.weights
+        ranks = before + (self.weights - 1) / 2
+        result = np.interp(probs * (self.weights.sum() - 1), ranks, self.means)
+        return result if probs.ndim else float(result)
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class SketchSet:
+    """
+    QuantileSketches per numeric column, for the whole dataset (group_by
+    None) and per value of each column in group_by.
+    """
+
+    def __init__(self, group_by=SKETCH_GROUP_COLUMNS, compression=DEFAULT_COMPRESSION):
+        self.group_by = list(group_by)
+        self.compression = compression
+        self.sketches = {}
+
+    def _sketch(self, key):
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.compression)
+        return self.sketches[key]
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into every sketch. Returns self."""
+        columns = chunk.select_dtypes(include=[np.number]).columns
+        # One float block for every column, sliced per group below
+        values = chunk[list(columns)].to_numpy(dtype='float64', na_value=np.nan)
+        for j, col in enumerate(columns):
+            self._sketch((None, None, col)).update(values[:, j])
+        for group_col in self.group_by:
+            if group_col not in chunk.columns:
+                continue
+            # Groups in order of appearance, missing labels left out (as groupby(sort=False) has them)
+            codes, groups = pd.factorize(chunk[group_col].astype('string'))
+            for code, group in enumerate(groups):
+                group_values = values[codes == code]
+                for j, col in enumerate(columns):
+                    self._sketch((group_col, group, col)).update(group_values[:, j])
+        return self
+
+    def merge(self, other):
+        """Fold another SketchSet into this one. Returns self."""
+        for key, sketch in other.sketches.items():
+            self._sketch(key).merge(sketch)
+        return self
+
+    @property
+    def columns(self):
+        return list(dict.fromkeys(col for group_by, _, col in self.sketches if group_by is None))
+
+    def get(self, column, group_by=None, group=None):
+        """Sketch of a column, over everything or over one group (None if absent)."""
+        return self.sketches.get((group_by, group, column))
+
+    def quantiles(self, column, probs, group_by=None, group=None):
+        """Quantiles of a column (NaN if it has no sketch)."""
+        sketch = self.get(column, group_by, group)
+        if sketch is None:
+            return np.full(len(probs), np.nan)
+        return sketch.quantile(probs)
+
+    def group_quantiles(self, group_by, column, probs=(0.25, 0.5, 0.75)):
+        """Quantiles of a column per group of group_by: one row per group, one column per probability."""
+        table = {group: sketch.quantile(probs) for (by, group, col), sketch in self.sketches.items()
+                 if by == group_by and col == column and len(sketch)}
+        return pd.DataFrame.from_dict(table, orient='index', columns=list(probs)).rename_axis(group_by)
+
+    def to_frame(self):
+        """All centroids as one long table (SKETCH_COLS)."""
+        keys = [key for key, sketch in self.sketches.items() if len(sketch)]
+        if not keys:
+            return pd.DataFrame(columns=SKETCH_COLS)
+        sizes = [len(self.sketches[key]) for key in keys]
+        labels = [[group_by or '', '' if group is None else group, col] for group_by, group, col in keys]
+        table = pd.DataFrame(np.repeat(np.array(labels, dtype=object), sizes, axis=0),
+                             columns=SKETCH_COLS[:3])
+        table['mean'] = np.concatenate([self.sketches[key].means for key in keys])
+        table['weight'] = np.concatenate([self.sketches[key].weights for key in keys])
+        return table
+
+    @classmethod
+    def from_frame(cls, table, compression=DEFAULT_COMPRESSION):
+        group_by = [by for by in pd.unique(table['group_by']) if by]
+        sketches = cls(group_by=group_by, compression=compression)
+        for (by, group, col), centroids in table.groupby(['group_by', 'group', 'column'], sort=False):
+            key = (by or None, group if by else None, col)
+            sketches.sketches[key] = QuantileSketch.from_centroids(
+                centroids['mean'].to_numpy(), centroids['weight'].to_numpy(), compression)
+        return sketches
+
+
+def build_sketches(data, group_by=SKETCH_GROUP_COLUMNS, compression=DEFAULT_COMPRESSION):
+    """SketchSet over a frame."""
+    return SketchSet(group_by=group_by, compression=compression).update(data)
+
+
+def sketch_path_for(csv_path):
+    """Sketch table path that sits alongside a combined CSV (Parquet, or CSV without pyarrow)."""
+    csv_path = Path(csv_path)
+    suffix = '.parquet' if PYARROW_AVAILABLE else '.csv'
+    return csv_path.with_name(csv_path.stem + SKETCH_SUFFIX + suffix)
+
+
+def write_sketches(sketches, csv_path, part=None):
+    """Write a SketchSet (or, with part, the sketches of one part) next to csv_path and return its path."""
+    return write_table(sketches.to_frame(), sketch_path_for(csv_path), part=part)
+
+
+def load_sketches(csv_path):
+    """SketchSet stored for the dataset at csv_path, or None if it has not been built."""
+    path = sketch_path_for(csv_path)
+    if not path.exists():
+        return None
+    if PYARROW_AVAILABLE:
+        table = pd.read_parquet(path)
+    else:
+        table = pd.read_csv(path, dtype={'group_by': str, 'group': str, 'column': str},
+                            keep_default_na=False)
+    return SketchSet.from_frame(table)
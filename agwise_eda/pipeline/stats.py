@@ -0,0 +1,192 @@
+"""
+Single-pass, mergeable summary statistics for numeric columns.
+
+StatsAccumulator consumes a dataset chunk by chunk and keeps, per column,
+the non-null count, mean, sum of squared deviations, min, max and a
+QuantileSketch for quantiles. Merging two accumulators is exact for the
+moments (Chan et al. pairwise update) and merges the sketches, so
+per-batch results combine into global statistics without re-reading any
+rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .sketch import DEFAULT_COMPRESSION, QuantileSketch
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def numeric_columns(data):
+    """Names of the numeric columns of a frame."""
+    return data.select_dtypes(include=[np.number]).columns.tolist()
+
+
+def _numeric_matrix(chunk, columns):
+    """Chunk columns as a float64 matrix; non-numeric values become NaN."""
+    values = np.empty((len(chunk), len(columns)), dtype='float64')
+    for j, col in enumerate(columns):
+        series = chunk[col]
+        if not pd.api.types.is_numeric_dtype(series):
+            series = pd.to_numeric(series, errors='coerce')
+        values[:, j] = series.to_numpy(dtype='float64', na_value=np.nan)
+    return values
+
+
+class StatsAccumulator:
+    """
+    Mergeable summary of numeric columns.
+
+    columns fixes the tracked columns; by default every numeric column seen
+    in an update is tracked. Rows without a column count as missing for it.
+    """
+
+    def __init__(self, columns=None, compression=DEFAULT_COMPRESSION):
+        self.fixed_columns = columns is not None
+        self.compression = compression
+        self.rows = 0
+        self.columns = []
+        self.count = np.zeros(0, dtype='int64')
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self.sketches = {}
+        self._add_columns(list(columns or []))
+
+    def _add_columns(self, columns):
+        """Start tracking columns not seen so far."""
+        new = [col for col in dict.fromkeys(columns) if col not in self.sketches]
+        if not new:
+            return
+        k = len(new)
+        self.columns = self.columns + new
+        self.count = np.concatenate([self.count, np.zeros(k, dtype='int64')])
+        self.mean = np.concatenate([self.mean, np.zeros(k)])
+        self.m2 = np.concatenate([self.m2, np.zeros(k)])
+        self.min = np.concatenate([self.min, np.full(k, np.inf)])
+        self.max = np.concatenate([self.max, np.full(k, -np.inf)])
+        for col in new:
+            self.sketches[col] = QuantileSketch(self.compression)
+
+    def _positions(self, columns):
+        index = {col: i for i, col in enumerate(self.columns)}
+        return np.array([index[col] for col in columns], dtype='int64')
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the summary. Returns self."""
+        if self.fixed_columns:
+            columns = [col for col in self.columns if col in chunk.columns]
+        else:
+            columns = numeric_columns(chunk)
+
+        values = _numeric_matrix(chunk, columns)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        safe_count = np.maximum(count, 1)
+        mean = np.where(valid, values, 0.0).sum(axis=0) / safe_count
+        deviations = np.where(valid, values - mean, 0.0)
+
+        part = StatsAccumulator(compression=self.compression)
+        part._add_columns(columns)
+        part.rows = len(chunk)
+        part.count = count.astype('int64')
+        part.mean = mean
+        part.m2 = (deviations ** 2).sum(axis=0)
+        part.min = np.where(valid, values, np.inf).min(axis=0, initial=np.inf)
+        part.max = np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf)
+        for j, col in enumerate(columns):
+            part.sketches[col].update(values[valid[:, j], j])
+        return self.merge(part)
+
+    def merge(self, other):
+        """Fold another accumulator into this one. Returns self."""
+        self._add_columns(other.columns)
+        pos = self._positions(other.columns)
+
+        n_a, n_b = self.count[pos], other.count
+        n = n_a + n_b
+        safe_n = np.maximum(n, 1)
+        delta = other.mean - self.mean[pos]
+        self.mean[pos] = self.mean[pos] + delta * n_b / safe_n
+        self.m2[pos] = self.m2[pos] + other.m2 + delta ** 2 * n_a * n_b / safe_n
+        self.min[pos] = np.minimum(self.min[pos], other.min)
+        self.max[pos] = np.maximum(self.max[pos], other.max)
+
+        for col in other.columns:
+            self.sketches[col].merge(other.sketches[col])
+        self.count[pos] = n
+        self.rows += other.rows
+        return self
+
+    def quantiles(self, probs=DEFAULT_QUANTILES):
+        """Quantiles per column (rows) and probability (columns)."""
+        table = {}
+        for col in self.columns:
+            table[col] = self.sketches[col].quantile(probs)
+        return pd.DataFrame.from_dict(table, orient='index', columns=list(probs))
+
+    def summary(self, probs=DEFAULT_QUANTILES):
+        """
+        describe()-style table for every tracked column, plus missingness
+        and the coefficient of variation.
+        """
+        count = self.count.astype('float64')
+        has_values = count > 0
+        variance = np.where(count > 1, self.m2 / np.maximum(count - 1, 1), np.nan)
+        table = pd.DataFrame({
+            'count': count,
+            'mean': np.where(has_values, self.mean, np.nan),
+            'std': np.sqrt(variance),
+            'min': np.where(has_values, self.min, np.nan),
+        }, index=self.columns)
+
+        quantiles = self.quantiles(probs)
+        for p in probs:
+            table[f'{p * 100:g}%'] = quantiles[p]
+        table['max'] = np.where(has_values, self.max, np.nan)
+        table['missing_count'] = self.rows - self.count
+        table['missing_pct'] = (table['missing_count'] / max(self.rows, 1) * 100).round(2)
+        table['cv'] = (table['std'] / table['mean'] * 100).round(2)
+        return table
+
+    def outlier_bounds(self, factor=1.5):
+        """Tukey fences (Q1 - factor*IQR, Q3 + factor*IQR) per column."""
+        quantiles = self.quantiles((0.25, 0.5, 0.75))
+        iqr = quantiles[0.75] - quantiles[0.25]
+        return pd.DataFrame({
+            'Q1': quantiles[0.25],
+            'Median': quantiles[0.5],
+            'Q3': quantiles[0.75],
+            'Lower_Bound': quantiles[0.25] - factor * iqr,
+            'Upper_Bound': quantiles[0.75] + factor * iqr,
+        })
+
+
+def merge_accumulators(accumulators):
+    """Combine several accumulators into a new one."""
+    accumulators = list(accumulators)
+    compression = accumulators[0].compression if accumulators else DEFAULT_COMPRESSION
+    merged = StatsAccumulator(compression=compression)
+    for accumulator in accumulators:
+        merged.merge(accumulator)
+    return merged
+
+
+def summarize(data, columns=None, chunk_size=DEFAULT_CHUNK_SIZE, compression=DEFAULT_COMPRESSION):
+    """Accumulate statistics over a frame in row chunks."""
+    accumulator = StatsAccumulator(columns, compression=compression)
+    for start in range(0, max(len(data), 1), chunk_size):
+        accumulator.update(data.iloc[start:start + chunk_size])
+    return accumulator
+
+
+def count_outliers(data, bounds):
+    """Values outside each column's bounds, counted in one vectorized pass."""
+    columns = [col for col in bounds.index if col in data.columns]
+    values = _numeric_matrix(data, columns)
+    lower = bounds.loc[columns, 'Lower_Bound'].to_numpy()
+    upper = bounds.loc[columns, 'Upper_Bound'].to_numpy()
+    outside = (values < lower) | (values > upper)
+    return pd.Series(outside.sum(axis=0), index=columns)
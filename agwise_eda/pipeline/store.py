@@ -0,0 +1,311 @@
+"""
+Columnar storage for the combined soil dataset.
+
+The ingestion stage writes combined_soil_data_FULL.parquet next to the
+CSV. Readers go through load_dataset(), which prefers the Parquet store and
+only materializes the columns it is asked for; the CSV remains the
+fallback when pyarrow is not installed or the store has not been built.
+Either way the frame comes back with the dtypes chosen at ingest.
+
+The store, like the row index, sketches and scores written next to it, is
+a directory of part files (part-00000.parquet, ...) read in name order.
+Ingest adds a part per group of new raw files and rewrites only the parts
+whose files changed, so an update costs the delta, not the dataset. All
+parts share one schema, derived from the dtype map; categories are put in
+sorted order on read, as they would be for the whole dataset cast at once.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from .dtypes import (CATEGORY_COLUMNS, IDENTIFIER_COLUMNS, apply_dtypes, dtype_map_path_for, infer_dtypes,
+                     load_dtype_map)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+STORE_SUFFIX = '.parquet'
+COMPRESSION = 'zstd'
+ROW_GROUP_SIZE = 50_000
+PART_GLOB = 'part-*.parquet'
+
+
+def store_path_for(csv_path):
+    """Parquet store path that sits alongside a combined CSV."""
+    return Path(csv_path).with_suffix(STORE_SUFFIX)
+
+
+def _prepare_for_parquet(data):
+    """
+    Give every object column a single physical type.
+
+    Columns whose values all parse as numbers become float64, everything
+    else becomes a nullable string column.
+    """
+    prepared = data.copy()
+    for col in prepared.columns[prepared.dtypes == object]:
+        values = prepared[col]
+        non_null = values.notna()
+        numeric = pd.to_numeric(values, errors='coerce')
+        if numeric[non_null].notna().all():
+            prepared[col] = numeric
+        else:
+            prepared[col] = values.where(~non_null, values.astype(str)).astype('string')
+    return prepared
+
+
+def part_name(number):
+    """File name of the part with this number."""
+    return f'part-{number:05d}.parquet'
+
+
+def part_files(path):
+    """Part files of a Parquet table in read order (a single-file table is its own part)."""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        return sorted(path.glob(PART_GLOB))
+    return []
+
+
+def part_names(path):
+    """Names of the parts a Parquet table is made of."""
+    return [part.name for part in part_files(path)]
+
+
+def remove_table(path):
+    """Delete a table, whether a single file or a directory of parts."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def remove_parts(path, names):
+    """Delete the named parts of a Parquet table."""
+    for name in names:
+        (Path(path) / name).unlink(missing_ok=True)
+
+
+def write_part(table, path, name, schema=None):
+    """
+    Write (or replace) one part of a Parquet table and return its path.
+
+    The part is written under a hidden name and then renamed, so readers
+    never see half a part.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Writing Parquet parts requires pyarrow: pip install pyarrow")
+
+    path = Path(path)
+    if path.is_file():
+        path.unlink()
+    path.mkdir(parents=True, exist_ok=True)
+    tmp_path = path / f'.{name}.tmp'
+    arrow_table = pa.Table.from_pandas(table, schema=schema, preserve_index=False)
+    pq.write_table(arrow_table, tmp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    tmp_path.replace(path / name)
+    return path / name
+
+
+def write_table(table, path, part=None):
+    """
+    Write a table that sits next to the combined CSV: as one part of a
+    Parquet table, or the whole table when part is None. Without pyarrow
+    the table is a single CSV.
+    """
+    path = Path(path)
+    if not PYARROW_AVAILABLE:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table.to_csv(path, index=False)
+        return path
+    if part is None:
+        remove_table(path)
+        part = part_name(0)
+    write_part(table, path, part)
+    return path
+
+
+def arrow_schema(data, dtype_map, columns=None):
+    """
+    One Arrow schema for every part of the dataset, derived from the dtype
+    map; data (a frame cast with it) supplies the pandas metadata that
+    restores extension dtypes such as string on read.
+    """
+    columns = list(data.columns) if columns is None else columns
+    fields = []
+    for col in columns:
+        dtype = dtype_map[col]
+        if dtype == 'category':
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif dtype == 'string':
+            arrow_type = pa.string()
+        elif dtype.startswith('datetime'):
+            arrow_type = pa.timestamp('ns')
+        else:
+            arrow_type = pa.from_numpy_dtype(dtype)
+        fields.append(pa.field(col, arrow_type))
+    metadata = pa.Schema.from_pandas(data[columns], preserve_index=False).metadata
+    return pa.schema(fields).with_metadata(metadata)
+
+
+def write_store(data, path, part=None, dtype_map=None):
+    """
+    Write the dataset (or, with part, one part of it) to the Parquet store
+    and return the store path. With dtype_map every part gets the same
+    schema; without it object columns are given a single physical type.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Writing the columnar store requires pyarrow: pip install pyarrow")
+
+    path = Path(path)
+    if part is None:
+        remove_table(path)
+        part = part_name(0)
+    if dtype_map is None:
+        write_part(_prepare_for_parquet(data), path, part)
+    else:
+        write_part(data, path, part, schema=arrow_schema(data, dtype_map))
+    return path
+
+
+def _sort_categories(data):
+    """Categories of every category column in sorted order, unused ones dropped."""
+    for col in data.columns[data.dtypes == 'category']:
+        values = data[col].cat.remove_unused_categories()
+        data[col] = values.cat.reorder_categories(sorted(values.cat.categories))
+    return data
+
+
+def read_store(path, columns=None):
+    """Read a Parquet store, restricted to the given columns when provided."""
+    return _sort_categories(pd.read_parquet(path, columns=columns))
+
+
+def store_schema(path):
+    """Arrow schema of a Parquet store, read from the footer of its first part."""
+    return pq.read_schema(part_files(path)[0])
+
+
+def store_columns(path):
+    """Column names of a Parquet store, read from the footer only."""
+    return store_schema(path).names
+
+
+def column_null_counts(path):
+    """
+    Per-column null counts of a Parquet store.
+
+    Uses row-group statistics from the footers; columns without statistics
+    are read to count their nulls.
+    """
+    names = store_columns(path)
+    counts = pd.Series(0, index=names, dtype='int64')
+    for part in part_files(path):
+        parquet_file = pq.ParquetFile(part)
+        metadata = parquet_file.metadata
+        for j, name in enumerate(names):
+            total = 0
+            for i in range(metadata.num_row_groups):
+                stats = metadata.row_group(i).column(j).statistics
+                if stats is None or not stats.has_null_count:
+                    total = None
+                    break
+                total += stats.null_count
+            if total is None:
+                total = parquet_file.read(columns=[name]).column(0).null_count
+            counts[name] += total
+    return counts
+
+
+def store_row_count(path):
+    """Number of rows in a Parquet store, read from the footers only."""
+    return sum(pq.ParquetFile(part).metadata.num_rows for part in part_files(path))
+
+
+def has_store(csv_path):
+    """True if a readable Parquet store exists for the given CSV."""
+    return PYARROW_AVAILABLE and bool(part_files(store_path_for(csv_path)))
+
+
+def dataset_columns(csv_path):
+    """Column names of the dataset without loading any rows."""
+    if has_store(csv_path):
+        return store_columns(store_path_for(csv_path))
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+
+def dataset_numeric_columns(csv_path):
+    """Numeric column names of the dataset, from the store schema or dtype map."""
+    if has_store(csv_path):
+        schema = store_schema(store_path_for(csv_path))
+        return [field.name for field in schema
+                if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)]
+    dtype_map = load_dtype_map(dtype_map_path_for(csv_path))
+    if dtype_map is None:
+        dtype_map = infer_dtypes(pd.read_csv(csv_path, low_memory=False))
+    return [col for col, dtype in dtype_map.items() if dtype.startswith(('int', 'float'))]
+
+
+def _text_columns(dtype_map):
+    """Columns read as text from the CSV so codes such as ZIP 02134 keep their leading zeros."""
+    if dtype_map is not None:
+        return [col for col, dtype in dtype_map.items() if dtype in ('category', 'string')]
+    return IDENTIFIER_COLUMNS + CATEGORY_COLUMNS
+
+
+def iter_dataset(csv_path, columns=None, chunk_size=ROW_GROUP_SIZE):
+    """
+    Yield the combined dataset in chunks of up to chunk_size rows.
+
+    Same columns and dtypes as load_dataset(), but only one chunk is in
+    memory at a time: Parquet record batches when the store exists,
+    otherwise CSV chunks cast with the dtype map.
+    """
+    if columns is not None:
+        available = set(dataset_columns(csv_path))
+        columns = [col for col in dict.fromkeys(columns) if col in available]
+
+    if has_store(csv_path):
+        for part in part_files(store_path_for(csv_path)):
+            parquet_file = pq.ParquetFile(part)
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas()
+        return
+
+    dtype_map = load_dtype_map(dtype_map_path_for(csv_path))
+    reader = pd.read_csv(csv_path, usecols=columns, chunksize=chunk_size, low_memory=False,
+                         dtype={col: str for col in _text_columns(dtype_map)})
+    for chunk in reader:
+        yield apply_dtypes(chunk, dtype_map if dtype_map is not None else infer_dtypes(chunk))
+
+
+def load_dataset(csv_path, columns=None):
+    """
+    Load the combined dataset, preferring the columnar store.
+
+    Columns that do not exist in the dataset are ignored, so callers can
+    pass every naming variant they know about. CSV reads are cast with the
+    persisted dtype map (inferred on the fly if it is missing).
+    """
+    if columns is not None:
+        available = set(dataset_columns(csv_path))
+        columns = [col for col in dict.fromkeys(columns) if col in available]
+
+    if has_store(csv_path):
+        return read_store(store_path_for(csv_path), columns=columns)
+
+    dtype_map = load_dtype_map(dtype_map_path_for(csv_path))
+    data = pd.read_csv(csv_path, usecols=columns, low_memory=False,
+                       dtype={col: str for col in _text_columns(dtype_map)})
+    if dtype_map is None:
+        dtype_map = infer_dtypes(data)
+    return apply_dtypes(data, dtype_map)
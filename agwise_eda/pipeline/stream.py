@@ -0,0 +1,247 @@
+"""
+Streaming ingestion and profiling for datasets larger than memory.
+
+stream_combined_dataset() is the chunked counterpart of
+update_combined_dataset(). It reads the raw files twice, a group of files
+at a time:
+
+1. a DtypeAccumulator per chunk profiles the raw rows; merged, they give
+   one dtype map, the one infer_dtypes() would give the concatenated data,
+   and the categories of each category column, so every chunk is written
+   with the same types;
+2. each chunk is cast to that map, appended to the combined CSV, written
+   as one part of the Parquet store, the row-hash index, the economic
+   scores and the quantile sketches, and handed to the caller.
+   Timestamps are written with CSV_DATE_FORMAT, so the files match those
+   update_combined_dataset() writes for the same raw files, and the
+   per-chunk profiles and parts are recorded as it records them.
+
+Only one chunk of rows is alive at a time. ProfileAccumulator folds the
+chunks into everything the data quality report needs (row and batch
+counts, per-column missingness and dtypes, per-batch StatsAccumulators);
+profiles of separate chunks merge, so peak memory depends on the chunk
+size, not on the number of rows.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from .dedup import build_row_index, provenance_path_for, row_index_path_for
+from .dtypes import (CSV_DATE_FORMAT, DtypeAccumulator, dtype_map_path_for, dtype_profile_path_for, merge_profiles,
+                     save_dtype_map, save_dtype_profiles)
+from .economics import score_path_for, score_samples
+from .ingest import DEFAULT_MERGE_GROUP, discover_csv_files
+from .manifest import (LOAD_LOG_COLUMNS, MANIFEST_NAME, MANIFEST_VERSION, build_manifest, dataset_layout,
+                       diff_manifest, iter_parts, load_manifest, record_failures, save_manifest, typed_chunk)
+from .sketch import DEFAULT_COMPRESSION, SketchSet, build_sketches, sketch_path_for, write_sketches
+from .stats import StatsAccumulator, merge_accumulators
+from .store import PYARROW_AVAILABLE, arrow_schema, has_store, iter_dataset, remove_table, store_path_for, write_part
+
+BATCH_COL = '_source_batch'
+
+
+class ProfileAccumulator:
+    """
+    Mergeable profile of a dataset seen chunk by chunk.
+
+    Tracks rows, rows per batch, non-null counts and dtypes of every
+    column, and one StatsAccumulator of the numeric columns per batch.
+    Columns absent from a chunk count as missing for its rows.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.rows = 0
+        self.chunks = 0
+        self.max_chunk_rows = 0
+        self.max_chunk_mb = 0.0
+        self.non_null = pd.Series(dtype='int64')
+        self.dtypes = {}
+        self.batch_rows = pd.Series(dtype='int64')
+        self.batch_stats = {}
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the profile. Returns self."""
+        part = ProfileAccumulator(compression=self.compression)
+        part.rows = len(chunk)
+        part.chunks = 1
+        part.max_chunk_rows = len(chunk)
+        part.max_chunk_mb = chunk.memory_usage(deep=True).sum() / 1024**2
+        part.non_null = chunk.notna().sum().astype('int64')
+        part.dtypes = chunk.dtypes.astype(str).to_dict()
+        if BATCH_COL in chunk.columns:
+            for batch, batch_data in chunk.groupby(BATCH_COL, observed=True):
+                part.batch_stats[batch] = StatsAccumulator(compression=self.compression).update(batch_data)
+            part.batch_rows = pd.Series({batch: acc.rows for batch, acc in part.batch_stats.items()},
+                                        dtype='int64')
+        else:
+            part.batch_stats[None] = StatsAccumulator(compression=self.compression).update(chunk)
+        return self.merge(part)
+
+    def merge(self, other):
+        """Fold another profile into this one. Returns self."""
+        self.rows += other.rows
+        self.chunks += other.chunks
+        self.max_chunk_rows = max(self.max_chunk_rows, other.max_chunk_rows)
+        self.max_chunk_mb = max(self.max_chunk_mb, other.max_chunk_mb)
+        self.non_null = self.non_null.add(other.non_null, fill_value=0).astype('int64')
+        self.non_null = self.non_null.reindex(list(dict.fromkeys([*self.dtypes, *other.dtypes])))
+        for col, dtype in other.dtypes.items():
+            self.dtypes.setdefault(col, dtype)
+        self.batch_rows = self.batch_rows.add(other.batch_rows, fill_value=0).astype('int64')
+        for batch, accumulator in other.batch_stats.items():
+            if batch in self.batch_stats:
+                self.batch_stats[batch].merge(accumulator)
+            else:
+                self.batch_stats[batch] = accumulator
+        return self
+
+    @property
+    def columns(self):
+        return list(self.dtypes)
+
+    @property
+    def stats(self):
+        """StatsAccumulator over every batch."""
+        return merge_accumulators(self.batch_stats.values())
+
+    def missing_counts(self):
+        """Missing values per column."""
+        return self.rows - self.non_null.reindex(self.columns, fill_value=0)
+
+    def missing_report(self):
+        """Columns with missing values, most missing first."""
+        missing = self.missing_counts()
+        report = pd.DataFrame({
+            'Column': self.columns,
+            'Missing_Count': missing.to_numpy(),
+            'Missing_Percentage': (missing / max(self.rows, 1) * 100).round(2).to_numpy(),
+            'Data_Type': [self.dtypes[col] for col in self.columns],
+        }, index=self.columns)
+        return report[report['Missing_Count'] > 0].sort_values('Missing_Percentage', ascending=False)
+
+    def batch_counts(self):
+        """Rows per batch."""
+        return self.batch_rows.sort_index().rename_axis(BATCH_COL)
+
+
+def _tmp_path(path):
+    return path.with_name(path.name + '.tmp')
+
+
+def _write_chunks(csv_files, data_dir, combined_path, manifest, manifest_path, profiles, columns, dtype_map,
+                  categories, batch_of, workers, merge_group):
+    """
+    Second pass: cast, write and yield every chunk, then publish the files.
+
+    Each chunk becomes one part of the store, row index, scores and
+    sketches as soon as it is cast (appended rows without pyarrow), so
+    nothing but the current chunk is held in memory.
+    """
+    store_path = store_path_for(combined_path)
+    row_index_path = row_index_path_for(combined_path)
+    score_path = score_path_for(combined_path)
+    sketch_path = sketch_path_for(combined_path)
+    tables = [row_index_path, score_path]
+    if PYARROW_AVAILABLE:
+        tables = [store_path, *tables, sketch_path]
+    for path in [combined_path, *tables]:
+        remove_table(_tmp_path(path))
+    schema = None
+    sketches = SketchSet()
+    written = False
+    for name, _, raw in iter_parts(csv_files, data_dir, batch_of=batch_of, workers=workers,
+                                   merge_group=merge_group):
+        chunk = typed_chunk(raw, columns, dtype_map, categories)
+        chunk.to_csv(_tmp_path(combined_path), mode='a', header=not written, index=False,
+                     date_format=CSV_DATE_FORMAT)
+        if PYARROW_AVAILABLE:
+            schema = schema or arrow_schema(chunk, dtype_map)
+            write_part(chunk, _tmp_path(store_path), name, schema=schema)
+            write_part(build_row_index(chunk), _tmp_path(row_index_path), name)
+            write_part(score_samples(chunk), _tmp_path(score_path), name)
+            write_part(build_sketches(chunk).to_frame(), _tmp_path(sketch_path), name)
+        else:
+            build_row_index(chunk).to_csv(_tmp_path(row_index_path), mode='a', header=not written, index=False)
+            score_samples(chunk).to_csv(_tmp_path(score_path), mode='a', header=not written, index=False)
+            sketches.update(chunk)
+        written = True
+        yield chunk
+
+    if not written:
+        pd.DataFrame(columns=columns).to_csv(_tmp_path(combined_path), index=False)
+    _tmp_path(combined_path).replace(combined_path)
+    save_dtype_map(dtype_map, dtype_map_path_for(combined_path))
+    for path in tables:
+        remove_table(path)
+        if _tmp_path(path).exists():
+            _tmp_path(path).replace(path)
+    if not PYARROW_AVAILABLE:
+        write_sketches(sketches, combined_path)
+    remove_table(provenance_path_for(combined_path))
+    save_dtype_profiles(profiles, dtype_profile_path_for(combined_path))
+    save_manifest(manifest, manifest_path)
+
+
+def stream_combined_dataset(data_dir, combined_path, manifest_path=None, batch_of=None, workers=None,
+                            merge_group=DEFAULT_MERGE_GROUP, full_rebuild=False):
+    """
+    Chunked update_combined_dataset() (without dedup).
+
+    When no raw file changed, chunks are read back from the existing
+    dataset. Otherwise the dtype pass runs here and the dataset is
+    rewritten while the chunks are consumed; the new files replace the old
+    ones (and the manifest is saved) only once the last chunk has been
+    yielded. Changes rebuild the whole dataset in one streaming pass rather
+    than patching it, since patching needs the existing rows in memory.
+
+    Returns (chunks, load_log, changes); chunks is an iterator of typed
+    DataFrames of up to merge_group files each.
+    """
+    data_dir = Path(data_dir)
+    combined_path = Path(combined_path)
+    manifest_path = Path(manifest_path or combined_path.parent / MANIFEST_NAME)
+    batch_of = batch_of or (lambda path: path.parent.name)
+
+    csv_files, _ = discover_csv_files(data_dir)
+    previous = load_manifest(manifest_path)
+    up_to_date = (not full_rebuild and previous['files'] and not previous.get('dedup', False)
+                  and (has_store(combined_path) or combined_path.exists())
+                  and row_index_path_for(combined_path).exists() and sketch_path_for(combined_path).exists()
+                  and score_path_for(combined_path).exists())
+    if not up_to_date:
+        previous = {'version': MANIFEST_VERSION, 'files': {}}
+
+    current = build_manifest(csv_files, data_dir, batch_of, previous)
+    current['dedup'] = False
+    changes = diff_manifest(previous, current)
+    load_log = pd.DataFrame(columns=LOAD_LOG_COLUMNS)
+
+    if up_to_date and not (changes['added'] or changes['changed'] or changes['removed']):
+        save_manifest(current, manifest_path)
+        return iter_dataset(combined_path), load_log, changes
+
+    # First pass: one dtype map, column order and set of categories for every chunk
+    records = []
+    profiles = {}
+    for entry in current['files'].values():
+        entry.pop('part', None)
+    for name, keys, raw in iter_parts(csv_files, data_dir, batch_of=batch_of, workers=workers,
+                                      merge_group=merge_group, load_log=records):
+        profiles[name] = DtypeAccumulator().update(raw)
+        for key in keys:
+            current['files'][key]['part'] = name
+    load_log = pd.DataFrame(records, columns=load_log.columns)
+    inferred = merge_profiles(profiles.values())
+    columns, dtype_map = dataset_layout(inferred)
+    categories = inferred.categories()
+
+    # Files that failed to parse are not read again until their content changes
+    record_failures(current, load_log, data_dir)
+    readable = [data_dir / key for key, entry in current['files'].items() if 'error' not in entry]
+
+    combined_path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = _write_chunks(readable, data_dir, combined_path, current, manifest_path, profiles, columns,
+                           dtype_map, categories, batch_of, workers, merge_group)
+    return chunks, load_log, changes
@@ -0,0 +1,283 @@
+"""
+Synthetic Haney lab exports for scale testing.
+
+SyntheticLabData learns what the raw "Processed File (N).csv" exports look
+like and writes any number of new ones, so ingestion, statistics and the
+dashboard can be load-tested far beyond the real data volume:
+
+- file templates: the exact header (v1 or v2 spelling, column order) of
+  every real file, so the schema mix is preserved, plus the distribution
+  of rows per file and the share of empty exports;
+- per-file columns (ZIP, dates, crop, cover crop mix, ...) that hold one
+  value per file are copied together from a real file, so they stay
+  consistent with each other;
+- numeric columns: a QuantileSketch of the marginal, the decimal places
+  values are written with and the stray text markers ('***', ...) that
+  appear in them; a Gaussian copula over normal scores keeps the
+  correlations between measurements;
+- other text columns: value frequencies;
+- missingness: whole-row presence patterns per template, sampled as
+  observed, so blocks of columns go missing together;
+- Lab No: sequential and unique, continuing after the real numbers.
+
+Files are generated a block at a time and each template's rows are
+rendered with one to_csv call, so memory stays flat and millions of rows
+take minutes.
+"""
+
+import csv
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from .correlation import pairwise_correlation
+from .dtypes import MIN_PARSED_FRACTION
+from .ingest import discover_csv_files
+from .schema import canonical_name, unify_columns
+from .sketch import QuantileSketch
+
+ID_COL = 'Lab No'
+# A column is per-file when at least this share of the files with two or
+# more values for it hold a single distinct value
+FILE_LEVEL_SHARE = 0.9
+MIN_FILE_LEVEL_FILES = 5
+# Decimal places written per numeric column: what covers this share of values
+DECIMALS_QUANTILE = 0.99
+MAX_DECIMALS = 6
+BLOCK_ROWS = 50_000
+FILES_PER_BATCH = 300
+FILE_NAME = 'Processed File ({}).csv'
+
+
+def _decimals(text):
+    """Decimal places of numbers written as text."""
+    fraction = text.str.extract(r'\.(\d+)$')[0]
+    return fraction.fillna('').str.len()
+
+
+def _nearest_correlation(corr):
+    """Closest positive definite correlation matrix (eigenvalues clipped)."""
+    values, vectors = np.linalg.eigh((corr + corr.T) / 2)
+    fixed = vectors @ np.diag(np.clip(values, 1e-6, None)) @ vectors.T
+    scale = np.sqrt(np.diag(fixed))
+    return fixed / np.outer(scale, scale)
+
+
+class SyntheticLabData:
+    """Model of the raw lab exports, fitted with fit() and sampled with write()."""
+
+    def __init__(self, files, row_counts, empty_share, kinds, numeric, categories, patterns,
+                 correlation, next_lab_no):
+        self.files = files
+        self.row_counts = np.asarray(row_counts)
+        self.empty_share = empty_share
+        self.kinds = kinds
+        self.numeric = numeric
+        self.categories = categories
+        self.patterns = patterns
+        self.numeric_columns = list(numeric)
+        self._cholesky = np.linalg.cholesky(correlation) if len(numeric) else None
+        self.next_lab_no = next_lab_no
+
+    @property
+    def source_rows(self):
+        return int(self.row_counts.sum())
+
+    @classmethod
+    def fit(cls, data_dir):
+        """Learn the model from every CSV file under data_dir."""
+        csv_files, _ = discover_csv_files(data_dir)
+        frames = []
+        empty = 0
+        for path in csv_files:
+            try:
+                frame = pd.read_csv(path, dtype=str)
+            except pd.errors.EmptyDataError:
+                frame = None
+            if frame is None or len(frame) == 0:
+                empty += 1
+                continue
+            frames.append(frame)
+        if not frames:
+            raise ValueError(f"No non-empty CSV files under {data_dir}")
+
+        canonical = [unify_columns(frame) for frame in frames]
+        combined = pd.concat(canonical, ignore_index=True)
+
+        # Columns that hold one value per file
+        per_file = combined.groupby(np.repeat(np.arange(len(canonical)), [len(f) for f in canonical]))
+        distinct, present = per_file.nunique(), per_file.count()
+        file_level = set()
+        for col in combined.columns:
+            filled = present[col] > 1
+            if (col != ID_COL and filled.sum() >= MIN_FILE_LEVEL_FILES
+                    and (distinct.loc[filled, col] == 1).mean() >= FILE_LEVEL_SHARE):
+                file_level.add(col)
+
+        kinds, numeric, categories = {}, {}, {}
+        scores = {}
+        for col in combined.columns:
+            values = combined[col].dropna()
+            parsed = pd.to_numeric(values, errors='coerce')
+            if col == ID_COL:
+                kinds[col] = 'id'
+            elif col in file_level:
+                kinds[col] = 'file'
+            elif len(values) and parsed.notna().mean() >= MIN_PARSED_FRACTION:
+                kinds[col] = 'numeric'
+                tokens = values[parsed.isna()].value_counts(normalize=True)
+                numbers = parsed.dropna()
+                numeric[col] = {
+                    'sketch': QuantileSketch.from_values(numbers.to_numpy(dtype='float64')),
+                    'decimals': min(int(_decimals(values[parsed.notna()]).quantile(DECIMALS_QUANTILE)),
+                                    MAX_DECIMALS),
+                    'token_share': 1 - parsed.notna().mean(),
+                    'tokens': (tokens.index.to_numpy(), tokens.to_numpy()),
+                }
+                ranks = numbers.rank(method='average')
+                scores[col] = pd.Series(ndtri(ranks / (len(numbers) + 1)), index=numbers.index)
+            else:
+                kinds[col] = 'category'
+                counts = values.value_counts(normalize=True)
+                categories[col] = (counts.index.to_numpy(), counts.to_numpy())
+
+        if scores:
+            normal_scores = pd.DataFrame(scores).reindex(combined.index)
+            corr, _ = pairwise_correlation(normal_scores, list(numeric))
+            correlation = _nearest_correlation(np.nan_to_num(corr.to_numpy()) + np.diag(
+                1 - np.nan_to_num(np.diag(corr.to_numpy()))))
+        else:
+            correlation = np.eye(0)
+
+        ids = pd.to_numeric(combined.get(ID_COL, pd.Series(dtype=str)), errors='coerce')
+        next_lab_no = int(ids.max()) + 1 if ids.notna().any() else 1
+
+        # Per real file: header and per-file values; per header: presence patterns
+        files, row_counts = [], []
+        presence = {}
+        for frame, unified in zip(frames, canonical):
+            header = tuple(frame.columns)
+            file_values = {}
+            for col in unified.columns:
+                if kinds[col] == 'file':
+                    present = unified[col].dropna()
+                    file_values[col] = present.iloc[0] if len(present) else None
+            files.append({'header': header, 'values': file_values})
+            row_counts.append(len(frame))
+            row_cols = [raw for raw in header if kinds[canonical_name(raw)] in ('numeric', 'category')]
+            presence.setdefault(header, []).append(frame[row_cols].notna().to_numpy())
+
+        patterns = {}
+        for header, masks in presence.items():
+            unique, counts = np.unique(np.concatenate(masks), axis=0, return_counts=True)
+            patterns[header] = (unique, counts / counts.sum())
+
+        return cls(files, row_counts, empty / len(csv_files), kinds, numeric, categories, patterns,
+                   correlation, next_lab_no)
+
+    def _numeric_values(self, rng, n):
+        """n rows of every numeric column, correlated through the copula."""
+        z = rng.standard_normal((n, len(self.numeric_columns))) @ self._cholesky.T
+        u = ndtr(z)
+        values = {}
+        for j, col in enumerate(self.numeric_columns):
+            model = self.numeric[col]
+            column = np.round(model['sketch'].quantile(u[:, j]), model['decimals'])
+            if model['decimals'] == 0:
+                column = column.astype('int64')
+            if model['token_share'] > 0:
+                column = column.astype(object)
+                dirty = rng.random(n) < model['token_share']
+                tokens, weights = model['tokens']
+                column[dirty] = rng.choice(tokens, size=int(dirty.sum()), p=weights)
+            values[col] = column
+        return values
+
+    def _render(self, rng, header, sources, counts):
+        """CSV lines (no header) for files sharing one header."""
+        n = int(counts.sum())
+        numeric = self._numeric_values(rng, n) if self.numeric_columns else {}
+        block = {}
+        for raw in header:
+            col = canonical_name(raw)
+            kind = self.kinds[col]
+            if kind == 'id':
+                block[raw] = np.arange(self.next_lab_no, self.next_lab_no + n)
+                self.next_lab_no += n
+            elif kind == 'file':
+                block[raw] = np.repeat(np.array([self.files[i]['values'].get(col) for i in sources],
+                                                dtype=object), counts)
+            elif kind == 'numeric':
+                block[raw] = numeric[col]
+            else:
+                values, weights = self.categories[col]
+                block[raw] = rng.choice(values, size=n, p=weights) if len(values) else np.full(n, None)
+        frame = pd.DataFrame(block, columns=list(header))
+
+        # Whole-row presence patterns of this header
+        unique, weights = self.patterns[header]
+        present = unique[rng.choice(len(unique), size=n, p=weights)]
+        row_cols = [raw for raw in header if self.kinds[canonical_name(raw)] in ('numeric', 'category')]
+        for j, raw in enumerate(row_cols):
+            frame[raw] = frame[raw].astype(object).where(present[:, j], None)
+
+        text = frame.to_csv(index=False, header=False, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        return text.split('\n')[:-1]
+
+    def write(self, output_dir, rows, files_per_batch=FILES_PER_BATCH, seed=0, block_rows=BLOCK_ROWS):
+        """
+        Write at least `rows` rows of synthetic exports under output_dir,
+        files_per_batch files per batch folder (synthetic_001, ...).
+
+        Returns a log with one row per file: file, batch, rows.
+        """
+        rng = np.random.default_rng(seed)
+        output_dir = Path(output_dir)
+        log = []
+        written = 0
+        file_number = 0
+
+        def path_for(number):
+            batch = f'synthetic_{(number - 1) // files_per_batch + 1:03d}'
+            (output_dir / batch).mkdir(parents=True, exist_ok=True)
+            return batch, output_dir / batch / FILE_NAME.format(number)
+
+        while written < rows:
+            # Plan a block of files: the real file each imitates and its rows
+            plan = []
+            planned = 0
+            while written + planned < rows and planned < block_rows:
+                file_number += 1
+                if rng.random() < self.empty_share:
+                    batch, path = path_for(file_number)
+                    path.touch()
+                    log.append({'file': path.name, 'batch': batch, 'rows': 0})
+                    continue
+                count = int(rng.choice(self.row_counts))
+                plan.append((file_number, int(rng.integers(len(self.files))), count))
+                planned += count
+
+            groups = {}
+            for entry in plan:
+                groups.setdefault(self.files[entry[1]]['header'], []).append(entry)
+            header_line = io.StringIO()
+            for header, members in groups.items():
+                counts = np.array([count for _, _, count in members])
+                lines = self._render(rng, header, [source for _, source, _ in members], counts)
+                header_line.seek(0)
+                header_line.truncate()
+                csv.writer(header_line, quoting=csv.QUOTE_ALL, lineterminator='\n').writerow(header)
+                start = 0
+                for number, _, count in members:
+                    batch, path = path_for(number)
+                    with open(path, 'w') as f:
+                        f.write(header_line.getvalue())
+                        f.write('\n'.join(lines[start:start + count]) + '\n')
+                    start += count
+                    log.append({'file': path.name, 'batch': batch, 'rows': count})
+            written += planned
+
+        return pd.DataFrame(log, columns=['file', 'batch', 'rows'])
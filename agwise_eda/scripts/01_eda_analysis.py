@@ -3,15 +3,23 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import load_csv_files, load_errors_from_log
+
+# Base directory for the combined dataset and outputs; run_all_analyses.py
+# sets it (and passes the loaded dataset) when running this as a stage
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+
 # Set style for visualizations
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 8)
 
 # Load all CSV files from ALL batches
-data_base = Path('/Users/deyus-ex-machina/agwise/data')
+data_base = BASE_DIR / 'data'
 batch_dirs = [
     data_base / 'OneDrive_1_10-5-2025',
     data_base / 'OneDrive_2_10-6-2025',
@@ -34,36 +42,26 @@ if loose_csvs:
 print(f"\nTotal CSV files found: {len(all_csv_files)}")
 print("=" * 80)
 
-# Load all data into a single dataframe
-dfs = []
-batch_tracker = []
-for i, file in enumerate(all_csv_files):
-    try:
-        df = pd.read_csv(file)
-
-        # Track which batch this came from
-        if 'OneDrive_1' in str(file):
-            batch = 'Batch_1'
-        elif 'OneDrive_2' in str(file):
-            batch = 'Batch_2'
-        elif 'OneDrive_4' in str(file):
-            batch = 'Batch_4'
-        else:
-            batch = 'Batch_3'
-
-        df['_source_batch'] = batch
-        df['_source_file'] = file.name
-
-        dfs.append(df)
-        if i == 0:
-            print(f"Sample file: {file.name}")
-            print(f"Columns: {len(df.columns)}")
-            print(f"Rows per file: {len(df)}")
-    except Exception as e:
-        print(f"Error reading {file.name}: {e}")
-
-# Combine all dataframes
-data = pd.concat(dfs, ignore_index=True)
+def batch_label(file):
+    """Track which batch a file came from."""
+    if 'OneDrive_1' in str(file):
+        return 'Batch_1'
+    elif 'OneDrive_2' in str(file):
+        return 'Batch_2'
+    elif 'OneDrive_4' in str(file):
+        return 'Batch_4'
+    return 'Batch_3'
+
+# Load all data into a single dataframe (parallel, merged in bounded groups)
+data, load_log = load_csv_files(all_csv_files, batch_of=batch_label, progress=False)
+for fname, error in load_errors_from_log(load_log):
+    print(f"Error reading {fname}: {error}")
+
+if len(load_log) > 0:
+    first = load_log.iloc[0]
+    print(f"Sample file: {first['file']}")
+    print(f"Rows per file: {first['rows']}")
+print(f"Read time: {load_log['seconds'].sum():.2f}s across {len(load_log)} files")
 print(f"\n{'='*80}")
 print(f"COMBINED DATASET OVERVIEW")
 print(f"{'='*80}")
@@ -74,7 +72,7 @@ for i, col in enumerate(data.columns, 1):
     print(f"{i}. {col}")
 
 # Save combined dataset
-data.to_csv('/Users/deyus-ex-machina/agwise/combined_soil_data.csv', index=False)
+data.to_csv(BASE_DIR / 'combined_soil_data.csv', index=False)
 print(f"\n✓ Combined dataset saved to: combined_soil_data.csv")
 
 # Data shape and basic info
@@ -110,7 +108,7 @@ print(f"\nTop 20 columns with most missing values:")
 print(missing.head(20).to_string(index=False))
 
 # Save full missing values report
-missing.to_csv('/Users/deyus-ex-machina/agwise/missing_values_report.csv', index=False)
+missing.to_csv(BASE_DIR / 'missing_values_report.csv', index=False)
 print(f"\n✓ Full missing values report saved to: missing_values_report.csv")
 
 # Check for duplicates
@@ -120,22 +118,22 @@ print(f"DUPLICATE ANALYSIS")
 print(f"{'='*80}")
 print(f"Duplicate rows: {duplicates} ({(duplicates/len(data)*100):.2f}%)")
 
-# Descriptive statistics for key numeric columns
+# Descriptive statistics for key numeric columns (canonical names)
 print(f"\n{'='*80}")
 print(f"DESCRIPTIVE STATISTICS - KEY SOIL HEALTH METRICS")
 print(f"{'='*80}")
 
 key_metrics = [
-    'Soil pH 1:1',
-    '1:1 Electrical Conductivity, mmho/cm',
-    'Organic Matter, % LOI',
-    'Soil Respiration, ppm CO2-C',
-    'H3A Nitrate, ppm NO3-N',
-    'H3A Total Phosphorus, ppm P',
-    'H3A Potassium, ppm K',
-    'H3A Calcium, ppm Ca',
-    'H3A Magnesium, ppm Mg',
-    'Soil Health Score'
+    '1:1 Soil pH',
+    '1:1 Soluble Salt',
+    'Organic Matter',
+    'CO2-C',
+    'H3A Nitrate',
+    'H3A Total Phosphorus',
+    'H3A ICAP Potassium',
+    'H3A ICAP Calcium',
+    'H3A ICAP Magnesium',
+    'Soil Health Calculation'
 ]
 
 # Filter to metrics that exist in dataset
@@ -149,7 +147,7 @@ if key_metrics:
     print(desc_stats.round(2))
 
     # Save descriptive statistics
-    desc_stats.to_csv('/Users/deyus-ex-machina/agwise/descriptive_statistics.csv')
+    desc_stats.to_csv(BASE_DIR / 'descriptive_statistics.csv')
     print(f"\n✓ Descriptive statistics saved to: descriptive_statistics.csv")
 
 # Categorical variables analysis
@@ -180,7 +178,7 @@ for col in key_categorical[:3]:  # Top 3 categorical variables
     print(data[col].value_counts().head(10))
 
 # Save categorical summary
-cat_summary_df.to_csv('/Users/deyus-ex-machina/agwise/categorical_summary.csv', index=False)
+cat_summary_df.to_csv(BASE_DIR / 'categorical_summary.csv', index=False)
 print(f"\n✓ Categorical summary saved to: categorical_summary.csv")
 
 print(f"\n{'='*80}")
@@ -3,15 +3,25 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import FigureJob, render_figures, unify_columns
+
+# Base directory for the combined dataset and outputs; run_all_analyses.py
+# sets it (and passes the loaded dataset) when running this as a stage
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+
 # Set style
 sns.set_style("whitegrid")
 sns.set_palette("husl")
 
-# Load the combined dataset
-data = pd.read_csv('/Users/deyus-ex-machina/agwise/combined_soil_data.csv')
+# Load the combined dataset (unless the pipeline runner passed it in)
+if 'data' not in globals():
+    data = unify_columns(pd.read_csv(BASE_DIR / 'combined_soil_data.csv'))
 
 print(f"{'='*80}")
 print(f"ADVANCED DATA QUALITY ASSESSMENT")
@@ -41,30 +51,14 @@ if key_cols:
 # Identify primary numeric columns for analysis
 numeric_cols = data_clean.select_dtypes(include=[np.number]).columns.tolist()
 
-# Focus on key soil health metrics that have data
-key_metrics_v1 = [
-    'Soil pH 1:1', '1:1 Electrical Conductivity, mmho/cm',
-    'Organic Matter, % LOI', 'Soil Respiration, ppm CO2-C',
-    'H3A Nitrate, ppm NO3-N', 'H3A Total Phosphorus, ppm P',
-    'H3A Potassium, ppm K', 'H3A Calcium, ppm Ca',
-    'Soil Health Score'
-]
-
-key_metrics_v2 = [
+# Focus on key soil health metrics that have data (canonical names)
+key_metrics = [
     '1:1 Soil pH', '1:1 Soluble Salt', 'Organic Matter',
     'CO2-C', 'H3A Nitrate', 'H3A Total Phosphorus',
     'H3A ICAP Potassium', 'H3A ICAP Calcium',
     'Soil Health Calculation'
 ]
-
-# Determine which version of columns exists
-available_metrics = []
-for col in key_metrics_v1:
-    if col in data.columns:
-        available_metrics.append(col)
-for col in key_metrics_v2:
-    if col in data.columns and col not in available_metrics:
-        available_metrics.append(col)
+available_metrics = [col for col in key_metrics if col in data.columns]
 
 print(f"\n{'='*80}")
 print(f"OUTLIER DETECTION")
@@ -96,7 +90,7 @@ for col in available_metrics[:10]:  # Top 10 metrics
 
 outlier_df = pd.DataFrame(outlier_summary)
 print(outlier_df.to_string(index=False))
-outlier_df.to_csv('/Users/deyus-ex-machina/agwise/outlier_analysis.csv', index=False)
+outlier_df.to_csv(BASE_DIR / 'outlier_analysis.csv', index=False)
 print(f"\n✓ Outlier analysis saved to: outlier_analysis.csv")
 
 # Create visualizations
@@ -104,65 +98,76 @@ print(f"\n{'='*80}")
 print(f"GENERATING VISUALIZATIONS")
 print(f"{'='*80}")
 
+
 # 1. Distribution plots for key metrics
-fig, axes = plt.subplots(3, 3, figsize=(20, 16))
-fig.suptitle('Distribution of Key Soil Health Metrics', fontsize=16, y=0.995)
-
-for idx, col in enumerate(available_metrics[:9]):
-    row = idx // 3
-    col_idx = idx % 3
-    ax = axes[row, col_idx]
-
-    values = pd.to_numeric(data[col], errors='coerce').dropna()
-    if len(values) > 0:
-        ax.hist(values, bins=50, edgecolor='black', alpha=0.7)
-        ax.set_xlabel(col, fontsize=10)
-        ax.set_ylabel('Frequency', fontsize=10)
-        ax.set_title(f'{col}\nMean: {values.mean():.2f}, Median: {values.median():.2f}',
-                     fontsize=9)
-        ax.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('/Users/deyus-ex-machina/agwise/distributions.png', dpi=300, bbox_inches='tight')
-print("✓ Distribution plots saved to: distributions.png")
-plt.close()
+def draw_distributions(data):
+    fig, axes = plt.subplots(3, 3, figsize=(20, 16))
+    fig.suptitle('Distribution of Key Soil Health Metrics', fontsize=16, y=0.995)
+
+    for idx, col in enumerate(data.columns):
+        row = idx // 3
+        col_idx = idx % 3
+        ax = axes[row, col_idx]
+
+        values = pd.to_numeric(data[col], errors='coerce').dropna()
+        if len(values) > 0:
+            ax.hist(values, bins=50, edgecolor='black', alpha=0.7)
+            ax.set_xlabel(col, fontsize=10)
+            ax.set_ylabel('Frequency', fontsize=10)
+            ax.set_title(f'{col}\nMean: {values.mean():.2f}, Median: {values.median():.2f}',
+                         fontsize=9)
+            ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
 
 # 2. Box plots for outlier visualization
-fig, axes = plt.subplots(3, 3, figsize=(20, 16))
-fig.suptitle('Box Plots - Outlier Detection for Key Soil Metrics', fontsize=16, y=0.995)
-
-for idx, col in enumerate(available_metrics[:9]):
-    row = idx // 3
-    col_idx = idx % 3
-    ax = axes[row, col_idx]
-
-    values = pd.to_numeric(data[col], errors='coerce').dropna()
-    if len(values) > 0:
-        ax.boxplot(values, vert=True)
-        ax.set_ylabel(col, fontsize=10)
-        ax.set_title(f'{col}', fontsize=10)
-        ax.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('/Users/deyus-ex-machina/agwise/boxplots.png', dpi=300, bbox_inches='tight')
-print("✓ Box plots saved to: boxplots.png")
-plt.close()
+def draw_boxplots(data):
+    fig, axes = plt.subplots(3, 3, figsize=(20, 16))
+    fig.suptitle('Box Plots - Outlier Detection for Key Soil Metrics', fontsize=16, y=0.995)
+
+    for idx, col in enumerate(data.columns):
+        row = idx // 3
+        col_idx = idx % 3
+        ax = axes[row, col_idx]
+
+        values = pd.to_numeric(data[col], errors='coerce').dropna()
+        if len(values) > 0:
+            ax.boxplot(values, vert=True)
+            ax.set_ylabel(col, fontsize=10)
+            ax.set_title(f'{col}', fontsize=10)
+            ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
 
 # 3. Missing values heatmap
+def draw_missing_pattern(data):
+    missing_matrix = data.iloc[:200].isnull().astype(int)
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    sns.heatmap(missing_matrix, cmap='RdYlGn_r', cbar_kws={'label': 'Missing'},
+                yticklabels=False, ax=ax)
+    ax.set_title('Missing Values Pattern (First 200 Samples, Top 30 Columns)', fontsize=14)
+    ax.set_xlabel('Columns', fontsize=12)
+    ax.set_ylabel('Samples', fontsize=12)
+    plt.xticks(rotation=45, ha='right', fontsize=8)
+    plt.tight_layout()
+    return fig
+
+
 missing_cols = data.columns[data.isnull().any()].tolist()[:30]  # Top 30 columns with missing
-missing_matrix = data[missing_cols].isnull().astype(int)
-
-fig, ax = plt.subplots(figsize=(14, 10))
-sns.heatmap(missing_matrix.iloc[:200], cmap='RdYlGn_r', cbar_kws={'label': 'Missing'},
-            yticklabels=False, ax=ax)
-ax.set_title('Missing Values Pattern (First 200 Samples, Top 30 Columns)', fontsize=14)
-ax.set_xlabel('Columns', fontsize=12)
-ax.set_ylabel('Samples', fontsize=12)
-plt.xticks(rotation=45, ha='right', fontsize=8)
-plt.tight_layout()
-plt.savefig('/Users/deyus-ex-machina/agwise/missing_pattern.png', dpi=300, bbox_inches='tight')
-print("✓ Missing values pattern saved to: missing_pattern.png")
-plt.close()
+
+# Independent figures render in a process pool, each with only its columns
+render_figures(data, [
+    FigureJob('distributions', draw_distributions, BASE_DIR / 'distributions.png',
+              columns=available_metrics[:9]),
+    FigureJob('boxplots', draw_boxplots, BASE_DIR / 'boxplots.png', columns=available_metrics[:9]),
+    FigureJob('missing_pattern', draw_missing_pattern, BASE_DIR / 'missing_pattern.png',
+              columns=missing_cols),
+])
 
 print(f"\n{'='*80}")
 print(f"DATA QUALITY ASSESSMENT COMPLETE")
@@ -3,28 +3,28 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import pearsonr
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-# Load data
-data = pd.read_csv('/Users/deyus-ex-machina/agwise/combined_soil_data.csv')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import numeric_columns, pairwise_correlation, strongest_pairs, unify_columns
+
+# Base directory for the combined dataset and outputs; run_all_analyses.py
+# sets it (and passes the loaded dataset) when running this as a stage
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+
+# Load data (unless the pipeline runner passed it in)
+if 'data' not in globals():
+    data = unify_columns(pd.read_csv(BASE_DIR / 'combined_soil_data.csv'))
 
 print(f"{'='*80}")
 print(f"CORRELATION AND RELATIONSHIP ANALYSIS")
 print(f"{'='*80}")
 
-# Select key numeric columns for correlation analysis
-key_cols_v1 = [
-    'Soil pH 1:1', '1:1 Electrical Conductivity, mmho/cm',
-    'Organic Matter, % LOI', 'Soil Respiration, ppm CO2-C',
-    'H3A Nitrate, ppm NO3-N', 'H3A Ammonium, ppm NH4-N',
-    'H3A Total Phosphorus, ppm P', 'H3A Potassium, ppm K',
-    'H3A Calcium, ppm Ca', 'H3A Magnesium, ppm Mg',
-    'Soil Health Score', 'Available N, lbs/A',
-    'Available P, lbs/A', 'Available K, lbs/A'
-]
-
-key_cols_v2 = [
+# Select key numeric columns for correlation analysis (canonical names)
+key_cols = [
     '1:1 Soil pH', '1:1 Soluble Salt', 'Organic Matter',
     'CO2-C', 'H3A Nitrate', 'H3A Ammonium',
     'H3A Total Phosphorus', 'H3A ICAP Potassium',
@@ -33,13 +33,9 @@ key_cols_v2 = [
     'Available P', 'Available K'
 ]
 
-# Identify available columns
-available_cols = []
-for col in key_cols_v1 + key_cols_v2:
-    if col in data.columns and col not in available_cols:
-        # Only include if has sufficient data
-        if data[col].notna().sum() > 50:
-            available_cols.append(col)
+# Identify available columns with sufficient data
+available_cols = [col for col in key_cols
+                  if col in data.columns and data[col].notna().sum() > 50]
 
 print(f"\nAnalyzing correlations for {len(available_cols)} key variables")
 print("Variables included:")
@@ -47,14 +43,15 @@ for i, col in enumerate(available_cols, 1):
     non_null = data[col].notna().sum()
     print(f"{i}. {col} (n={non_null})")
 
-# Create correlation matrix (convert to numeric to handle mixed types)
-correlation_data = data[available_cols].copy()
-for col in correlation_data.columns:
-    correlation_data[col] = pd.to_numeric(correlation_data[col], errors='coerce')
-corr_matrix = correlation_data.corr()
+# Pairwise-complete correlations for every numeric column (non-numeric
+# values are treated as missing), plus the rows behind each pair
+numeric_cols = list(dict.fromkeys(available_cols + numeric_columns(data)))
+corr_all, pair_n = pairwise_correlation(data, numeric_cols)
+corr_matrix = corr_all.loc[available_cols, available_cols]
+print(f"\nPairwise-complete correlations computed for all {len(numeric_cols)} numeric columns")
 
 # Save correlation matrix
-corr_matrix.to_csv('/Users/deyus-ex-machina/agwise/correlation_matrix.csv')
+corr_matrix.to_csv(BASE_DIR / 'correlation_matrix.csv')
 print(f"\n✓ Correlation matrix saved to: correlation_matrix.csv")
 
 # Find strongest correlations
@@ -62,23 +59,16 @@ print(f"\n{'='*80}")
 print(f"STRONGEST CORRELATIONS (|r| > 0.5)")
 print(f"{'='*80}")
 
-# Get upper triangle of correlation matrix
-mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-corr_pairs = corr_matrix.where(~mask).stack().sort_values(ascending=False)
-
-# Filter for strong correlations
-strong_corr = corr_pairs[(abs(corr_pairs) > 0.5) & (abs(corr_pairs) < 1.0)]
+# Strongest pairs from the upper triangle of the full correlation matrix
+# (pairs with >50 shared rows), kept in a bounded heap
+strong_corr_df = strongest_pairs(corr_all, pair_n, k=50, threshold=0.5, min_n=51)
+strong_corr = strong_corr_df.set_index(['Variable_1', 'Variable_2'])['Correlation']
 print(f"\nFound {len(strong_corr)} strong correlations:")
 for idx, (pair, value) in enumerate(strong_corr.head(20).items(), 1):
     print(f"{idx}. {pair[0][:40]:40s} <-> {pair[1][:40]:40s}: {value:6.3f}")
 
 # Save strong correlations
-strong_corr_df = pd.DataFrame({
-    'Variable_1': [pair[0] for pair in strong_corr.index],
-    'Variable_2': [pair[1] for pair in strong_corr.index],
-    'Correlation': strong_corr.values
-})
-strong_corr_df.to_csv('/Users/deyus-ex-machina/agwise/strong_correlations.csv', index=False)
+strong_corr_df.to_csv(BASE_DIR / 'strong_correlations.csv', index=False)
 print(f"\n✓ Strong correlations saved to: strong_correlations.csv")
 
 # Visualizations
@@ -95,7 +85,7 @@ ax.set_title('Correlation Matrix - Key Soil Health Metrics', fontsize=14, pad=20
 plt.xticks(rotation=45, ha='right', fontsize=9)
 plt.yticks(rotation=0, fontsize=9)
 plt.tight_layout()
-plt.savefig('/Users/deyus-ex-machina/agwise/correlation_heatmap.png', dpi=300, bbox_inches='tight')
+plt.savefig(BASE_DIR / 'correlation_heatmap.png', dpi=300, bbox_inches='tight')
 print("✓ Correlation heatmap saved to: correlation_heatmap.png")
 plt.close()
 
@@ -128,7 +118,7 @@ if len(strong_corr) >= 6:
             ax.plot(plot_data[var1], p(plot_data[var1]), "r--", alpha=0.8, linewidth=2)
 
     plt.tight_layout()
-    plt.savefig('/Users/deyus-ex-machina/agwise/scatter_correlations.png', dpi=300, bbox_inches='tight')
+    plt.savefig(BASE_DIR / 'scatter_correlations.png', dpi=300, bbox_inches='tight')
     print("✓ Scatter plots saved to: scatter_correlations.png")
     plt.close()
 
@@ -137,11 +127,11 @@ print(f"SOIL HEALTH SCORE ANALYSIS")
 print(f"{'='*80}")
 
 # Analyze what drives Soil Health Score
-health_score_col = 'Soil Health Score' if 'Soil Health Score' in data.columns else 'Soil Health Calculation'
+health_score_col = 'Soil Health Calculation'
 
-if health_score_col in data.columns:
+if health_score_col in corr_matrix.columns:
     # Get correlations with soil health score
-    health_correlations = correlation_data.corr()[health_score_col].sort_values(ascending=False)
+    health_correlations = corr_matrix[health_score_col].sort_values(ascending=False)
     print(f"\nFactors most correlated with {health_score_col}:")
     for var, corr in health_correlations.items():
         if var != health_score_col:
@@ -152,7 +142,7 @@ if health_score_col in data.columns:
         'Variable': health_correlations.index,
         'Correlation_with_Soil_Health': health_correlations.values
     })
-    health_corr_df.to_csv('/Users/deyus-ex-machina/agwise/soil_health_correlations.csv', index=False)
+    health_corr_df.to_csv(BASE_DIR / 'soil_health_correlations.csv', index=False)
     print(f"\n✓ Soil health correlations saved to: soil_health_correlations.csv")
 
     # Visualize top factors
@@ -176,7 +166,7 @@ if health_score_col in data.columns:
             ax.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    plt.savefig('/Users/deyus-ex-machina/agwise/soil_health_factors.png', dpi=300, bbox_inches='tight')
+    plt.savefig(BASE_DIR / 'soil_health_factors.png', dpi=300, bbox_inches='tight')
     print("✓ Soil health factors plot saved to: soil_health_factors.png")
     plt.close()
 
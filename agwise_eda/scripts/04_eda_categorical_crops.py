@@ -2,11 +2,21 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-# Load data
-data = pd.read_csv('/Users/deyus-ex-machina/agwise/combined_soil_data.csv')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import unify_columns
+
+# Base directory for the combined dataset and outputs; run_all_analyses.py
+# sets it (and passes the loaded dataset) when running this as a stage
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+
+# Load data (unless the pipeline runner passed it in)
+if 'data' not in globals():
+    data = unify_columns(pd.read_csv(BASE_DIR / 'combined_soil_data.csv'))
 
 print(f"{'='*80}")
 print(f"CATEGORICAL ANALYSIS - CROPS AND COVER CROPS")
@@ -29,7 +39,7 @@ for col in crop_cols:
     crop_summary[col] = value_counts
 
 # Cover Crop Mix Analysis
-cover_crop_cols = ['Cover Crop Mix', 'Cover crop mix']
+cover_crop_cols = ['Cover Crop Mix']
 cover_crop_cols = [col for col in cover_crop_cols if col in data.columns]
 
 print(f"\n{'='*80}")
@@ -80,7 +90,7 @@ if 'Crop 1' in data.columns:
             print(rec_df.to_string(index=False))
 
             # Save recommendations summary
-            rec_df.to_csv('/Users/deyus-ex-machina/agwise/crop_nutrient_recommendations.csv', index=False)
+            rec_df.to_csv(BASE_DIR / 'crop_nutrient_recommendations.csv', index=False)
             print(f"\n✓ Crop nutrient recommendations saved to: crop_nutrient_recommendations.csv")
 
 # Soil health by cover crop mix
@@ -88,7 +98,7 @@ print(f"\n{'='*80}")
 print(f"SOIL HEALTH BY COVER CROP MIX")
 print(f"{'='*80}")
 
-health_col = 'Soil Health Score' if 'Soil Health Score' in data.columns else 'Soil Health Calculation'
+health_col = 'Soil Health Calculation'
 
 for cover_col in cover_crop_cols:
     if cover_col in data.columns and health_col in data.columns:
@@ -104,7 +114,7 @@ for cover_col in cover_crop_cols:
             print(health_by_cover.round(2))
 
             # Save
-            health_by_cover.to_csv('/Users/deyus-ex-machina/agwise/soil_health_by_cover_crop.csv')
+            health_by_cover.to_csv(BASE_DIR / 'soil_health_by_cover_crop.csv')
             print(f"\n✓ Soil health by cover crop saved to: soil_health_by_cover_crop.csv")
 
 # pH levels by past crop
@@ -112,7 +122,7 @@ print(f"\n{'='*80}")
 print(f"SOIL pH BY PAST CROP")
 print(f"{'='*80}")
 
-ph_col = 'Soil pH 1:1' if 'Soil pH 1:1' in data.columns else '1:1 Soil pH'
+ph_col = '1:1 Soil pH'
 
 if 'Past Crop' in data.columns and ph_col in data.columns:
     ph_by_crop = data[['Past Crop', ph_col]].dropna()
@@ -124,7 +134,7 @@ if 'Past Crop' in data.columns and ph_col in data.columns:
 
         print(ph_summary.round(2))
 
-        ph_summary.to_csv('/Users/deyus-ex-machina/agwise/ph_by_past_crop.csv')
+        ph_summary.to_csv(BASE_DIR / 'ph_by_past_crop.csv')
         print(f"\n✓ pH by past crop saved to: ph_by_past_crop.csv")
 
 # Visualizations
@@ -142,7 +152,7 @@ if 'Crop 1' in data.columns:
     ax.set_title('Top 15 Recommended Crops (Crop 1)', fontsize=14)
     ax.grid(axis='x', alpha=0.3)
     plt.tight_layout()
-    plt.savefig('/Users/deyus-ex-machina/agwise/crop_distribution.png', dpi=300, bbox_inches='tight')
+    plt.savefig(BASE_DIR / 'crop_distribution.png', dpi=300, bbox_inches='tight')
     print("✓ Crop distribution plot saved to: crop_distribution.png")
     plt.close()
 
@@ -160,7 +170,7 @@ if cover_crop_cols:
             plt.xticks(rotation=45, ha='right')
             plt.tight_layout()
             filename = col.lower().replace(' ', '_')
-            plt.savefig(f'/Users/deyus-ex-machina/agwise/{filename}_distribution.png',
+            plt.savefig(BASE_DIR / f'{filename}_distribution.png',
                        dpi=300, bbox_inches='tight')
             print(f"✓ {col} distribution plot saved")
             plt.close()
@@ -180,7 +190,7 @@ if cover_crop_cols and health_col in data.columns:
                 plt.suptitle('')  # Remove default title
                 plt.xticks(rotation=45, ha='right')
                 plt.tight_layout()
-                plt.savefig('/Users/deyus-ex-machina/agwise/soil_health_by_cover_boxplot.png',
+                plt.savefig(BASE_DIR / 'soil_health_by_cover_boxplot.png',
                            dpi=300, bbox_inches='tight')
                 print("✓ Soil health by cover crop boxplot saved")
                 plt.close()
@@ -206,7 +216,7 @@ if 'Crop 1' in data.columns and nutrient_cols:
 
         plt.suptitle('Nutrient Recommendations by Top 5 Crops', fontsize=16)
         plt.tight_layout()
-        plt.savefig('/Users/deyus-ex-machina/agwise/nutrient_recs_by_crop.png',
+        plt.savefig(BASE_DIR / 'nutrient_recs_by_crop.png',
                    dpi=300, bbox_inches='tight')
         print("✓ Nutrient recommendations by crop plot saved")
         plt.close()
@@ -3,18 +3,28 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-# Load data
-data = pd.read_csv('/Users/deyus-ex-machina/agwise/combined_soil_data.csv')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import unify_columns
+
+# Base directory for the combined dataset and outputs; run_all_analyses.py
+# sets it (and passes the loaded dataset) when running this as a stage
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+
+# Load data (unless the pipeline runner passed it in)
+if 'data' not in globals():
+    data = unify_columns(pd.read_csv(BASE_DIR / 'combined_soil_data.csv'))
 
 print(f"{'='*80}")
 print(f"ADVANCED SOIL HEALTH AND NUTRIENT INSIGHTS")
 print(f"{'='*80}")
 
 # Soil Health Score Analysis
-health_col = 'Soil Health Score' if 'Soil Health Score' in data.columns else 'Soil Health Calculation'
+health_col = 'Soil Health Calculation'
 
 if health_col in data.columns:
     health_data = data[health_col].dropna()
@@ -41,9 +51,9 @@ print(f"NUTRIENT AVAILABILITY PATTERNS")
 print(f"{'='*80}")
 
 nutrient_cols = {
-    'Nitrogen': ['Available N', 'Available N, lbs/A', 'H3A Nitrate', 'H3A Nitrate, ppm NO3-N'],
-    'Phosphorus': ['Available P', 'Available P, lbs/A', 'H3A Total Phosphorus', 'H3A Total Phosphorus, ppm P'],
-    'Potassium': ['Available K', 'Available K, lbs/A', 'H3A ICAP Potassium', 'H3A Potassium, ppm K']
+    'Nitrogen': ['Available N', 'H3A Nitrate'],
+    'Phosphorus': ['Available P', 'H3A Total Phosphorus'],
+    'Potassium': ['Available K', 'H3A ICAP Potassium']
 }
 
 nutrient_summary = []
@@ -71,7 +81,7 @@ print(f"\n{'='*80}")
 print(f"ORGANIC MATTER ANALYSIS")
 print(f"{'='*80}")
 
-om_cols = ['Organic Matter', 'Organic Matter, % LOI']
+om_cols = ['Organic Matter']
 for col in om_cols:
     if col in data.columns and data[col].notna().sum() > 50:
         om_data = data[col].dropna()
@@ -96,7 +106,7 @@ print(f"\n{'='*80}")
 print(f"SOIL pH ANALYSIS")
 print(f"{'='*80}")
 
-ph_cols = ['Soil pH 1:1', '1:1 Soil pH']
+ph_cols = ['1:1 Soil pH']
 for col in ph_cols:
     if col in data.columns and data[col].notna().sum() > 50:
         ph_data = data[col].dropna()
@@ -119,24 +129,15 @@ print(f"N-P-K BALANCE ANALYSIS")
 print(f"{'='*80}")
 
 # Find available N, P, K columns
-n_col = None
-p_col = None
-k_col = None
+def column_with_data(col, min_count=50):
+    """Return col if it exists with enough non-null values, else None."""
+    if col in data.columns and data[col].notna().sum() > min_count:
+        return col
+    return None
 
-for col in ['Available N', 'Available N, lbs/A']:
-    if col in data.columns and data[col].notna().sum() > 50:
-        n_col = col
-        break
-
-for col in ['Available P', 'Available P, lbs/A']:
-    if col in data.columns and data[col].notna().sum() > 50:
-        p_col = col
-        break
-
-for col in ['Available K', 'Available K, lbs/A']:
-    if col in data.columns and data[col].notna().sum() > 50:
-        k_col = col
-        break
+n_col = column_with_data('Available N')
+p_col = column_with_data('Available P')
+k_col = column_with_data('Available K')
 
 if n_col and p_col and k_col:
     npk_data = data[[n_col, p_col, k_col]].dropna()
@@ -157,15 +158,10 @@ print(f"\n{'='*80}")
 print(f"TRADITIONAL VS HANEY TEST N RECOMMENDATIONS")
 print(f"{'='*80}")
 
-trad_cols = ['Traditional N', 'Traditional Test N, lbs/A']
-haney_cols = ['Haney Test N', 'Haney Test N, lbs/A']
-diff_cols = ['Lbs N Difference', 'N Difference, lbs/A']
-savings_cols = ['N savings', 'N Savings, $']
-
-trad_col = next((col for col in trad_cols if col in data.columns and data[col].notna().sum() > 50), None)
-haney_col = next((col for col in haney_cols if col in data.columns and data[col].notna().sum() > 50), None)
-diff_col = next((col for col in diff_cols if col in data.columns and data[col].notna().sum() > 50), None)
-savings_col = next((col for col in savings_cols if col in data.columns and data[col].notna().sum() > 50), None)
+trad_col = column_with_data('Traditional N')
+haney_col = column_with_data('Haney Test N')
+diff_col = column_with_data('Lbs N Difference')
+savings_col = column_with_data('N savings')
 
 if trad_col and haney_col:
     comparison_data = data[[trad_col, haney_col]].dropna()
@@ -209,7 +205,7 @@ if health_col in data.columns:
     ax.legend()
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('/Users/deyus-ex-machina/agwise/soil_health_distribution.png', dpi=300, bbox_inches='tight')
+    plt.savefig(BASE_DIR / 'soil_health_distribution.png', dpi=300, bbox_inches='tight')
     print("✓ Soil health distribution plot saved")
     plt.close()
 
@@ -224,7 +220,7 @@ if n_col and p_col and k_col:
         ax.grid(True, alpha=0.3)
         plt.xticks(rotation=0)
         plt.tight_layout()
-        plt.savefig('/Users/deyus-ex-machina/agwise/npk_comparison.png', dpi=300, bbox_inches='tight')
+        plt.savefig(BASE_DIR / 'npk_comparison.png', dpi=300, bbox_inches='tight')
         print("✓ N-P-K comparison plot saved")
         plt.close()
 
@@ -251,12 +247,12 @@ if trad_col and haney_col:
         ax2.grid(True, alpha=0.3)
 
         plt.tight_layout()
-        plt.savefig('/Users/deyus-ex-machina/agwise/traditional_vs_haney.png', dpi=300, bbox_inches='tight')
+        plt.savefig(BASE_DIR / 'traditional_vs_haney.png', dpi=300, bbox_inches='tight')
         print("✓ Traditional vs Haney comparison plot saved")
         plt.close()
 
 # 4. Organic Matter vs Soil Health
-om_col = 'Organic Matter, % LOI' if 'Organic Matter, % LOI' in data.columns else 'Organic Matter'
+om_col = 'Organic Matter'
 if om_col in data.columns and health_col in data.columns:
     om_health = data[[om_col, health_col]].dropna()
     if len(om_health) > 0:
@@ -274,7 +270,7 @@ if om_col in data.columns and health_col in data.columns:
                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
 
         plt.tight_layout()
-        plt.savefig('/Users/deyus-ex-machina/agwise/om_vs_health.png', dpi=300, bbox_inches='tight')
+        plt.savefig(BASE_DIR / 'om_vs_health.png', dpi=300, bbox_inches='tight')
         print("✓ Organic matter vs soil health plot saved")
         plt.close()
 
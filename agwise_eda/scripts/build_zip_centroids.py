@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Build the bundled ZIP centroid table used by the dashboard map.
+
+Writes data/reference/zip_centroids.csv.gz with zip, lat, lng, city,
+state and county from one of two sources:
+
+    zipcodes   the dataset embedded in the zipcodes package (MIT,
+               https://github.com/seanpianka/zipcodes), no download needed.
+               The committed table was built this way, with zipcodes 3.0.0.
+    uszipcode  the uszipcode "simple" database (downloaded by uszipcode on
+               first use, or given with --db).
+
+Only needed when the table should be refreshed; the dashboard itself
+geocodes offline.
+
+Usage:
+    python build_zip_centroids.py [--source zipcodes|uszipcode] [--db PATH] [--output PATH]
+
+Author: Claude Code
+Date: October 6, 2025
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import ZIP_CENTROID_SOURCES, ZIP_CENTROIDS_PATH, build_zip_centroids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--source', choices=ZIP_CENTROID_SOURCES, default='zipcodes',
+                        help='ZIP database to read (default: zipcodes)')
+    parser.add_argument('--db', type=Path, default=None,
+                        help='uszipcode simple_db.sqlite (default: download via uszipcode)')
+    parser.add_argument('--output', type=Path, default=ZIP_CENTROIDS_PATH,
+                        help='centroid table to write')
+    args = parser.parse_args()
+
+    table = build_zip_centroids(args.output, db_path=args.db, source=args.source)
+    print(f"✓ {len(table):,} ZIP centroids "
+          f"({table['state'].nunique()} states) saved to: {args.output}")
+    print(f"  File size: {args.output.stat().st_size / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Haney lab exports for scale testing.
+
+Fits a SyntheticLabData model to the raw exports under --source (header
+versions, rows per file, per-file ZIP/date/crop values, numeric
+distributions and correlations, missingness) and writes new
+"Processed File (N).csv" files under --output, in batch folders of
+--files-per-batch files. Point BASE_DIR at the parent of --output to run
+the pipeline, the benchmarks or the dashboard on them.
+
+Usage:
+    python generate_synthetic_data.py --output DIR (--rows N | --scale N)
+                                      [--source DIR] [--files-per-batch N] [--seed N]
+
+Author: Claude Code
+Date: October 6, 2025
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import SyntheticLabData
+from pipeline.synthetic import FILES_PER_BATCH
+
+DEFAULT_SOURCE = Path(__file__).resolve().parents[2] / 'data' / 'OneDrive_1_10-5-2025'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--source', type=Path, default=DEFAULT_SOURCE,
+                        help='raw exports to learn from')
+    parser.add_argument('--output', type=Path, required=True,
+                        help='directory to write the synthetic batches to')
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument('--rows', type=int, help='rows to generate')
+    size.add_argument('--scale', type=float, help='rows to generate, as a multiple of the source rows')
+    parser.add_argument('--files-per-batch', type=int, default=FILES_PER_BATCH,
+                        help='files per batch folder')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    start = time.time()
+    model = SyntheticLabData.fit(args.source)
+    numeric = sum(kind == 'numeric' for kind in model.kinds.values())
+    print(f"✓ Model fitted on {model.source_rows:,} rows from {len(model.files)} files "
+          f"({len(model.patterns)} header versions, {numeric} numeric columns) "
+          f"in {time.time() - start:.1f}s")
+
+    rows = args.rows if args.rows is not None else int(args.scale * model.source_rows)
+    start = time.time()
+    log = model.write(args.output, rows, files_per_batch=args.files_per_batch, seed=args.seed)
+    elapsed = time.time() - start
+    print(f"✓ {log['rows'].sum():,} rows in {len(log):,} files ({log['batch'].nunique()} batches) "
+          f"written to: {args.output}")
+    print(f"  {elapsed:.1f}s ({log['rows'].sum() / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,102 +1,132 @@
 #!/usr/bin/env python3
 """
-Master script to run all EDA analyses in sequence.
+Master script to run all EDA analyses as a stage pipeline.
 
 This script orchestrates the complete analysis pipeline:
-1. Data loading and basic statistics
-2. Visualizations and data quality assessment
-3. Correlation analysis
-4. Categorical and crop analysis
-5. Advanced soil health insights
+1. load           - data loading and basic statistics (01), produces the dataset
+2. visualizations - visualizations and data quality assessment (02)
+3. correlations   - correlation analysis (03)
+4. categorical    - categorical and crop analysis (04)
+5. insights       - advanced soil health insights (05)
+
+The dataset is loaded once and handed to the other stages in memory.
+Stages 2-5 depend only on it, so they run concurrently in forked worker
+processes. Per-stage wall time and peak memory are written to
+pipeline_run_log.csv.
+
+Stage results are cached under <base-dir>/.stage_cache, keyed by the raw
+data, the script and pipeline code and the stage's inputs, so a rerun
+with nothing changed only checks hashes and restores missing outputs.
 
 Usage:
-    python run_all_analyses.py
+    python run_all_analyses.py [--workers N] [--base-dir DIR] [--no-cache]
 
 Author: Claude Code
 Date: October 5, 2025
 """
 
+import argparse
+import runpy
 import sys
 import time
 from pathlib import Path
 
-def run_script(script_name):
-    """Run a Python script and report timing."""
-    print(f"\n{'='*80}")
-    print(f"Running: {script_name}")
-    print(f"{'='*80}")
-
-    start_time = time.time()
-
-    try:
-        # Read and execute the script
-        script_path = Path(__file__).parent / script_name
-        with open(script_path, 'r') as f:
-            code = f.read()
-
-        exec(code, {'__name__': '__main__'})
-
-        elapsed = time.time() - start_time
-        print(f"\n✓ {script_name} completed in {elapsed:.2f} seconds")
-        return True
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import Stage, StageCache, code_version, run_pipeline
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PIPELINE_DIR = SCRIPT_DIR.parent / 'pipeline'
+DEFAULT_BASE_DIR = Path('/Users/deyus-ex-machina/agwise')
+
+
+def script_stage(name, script_name, base_dir, inputs=(), outputs=(), files=(), sources=()):
+    """Stage that runs a numbered script with its inputs already in scope."""
+    script_path = SCRIPT_DIR / script_name
+
+    def run(**inputs):
+        module_globals = runpy.run_path(str(script_path), init_globals={'BASE_DIR': base_dir, **inputs},
+                                        run_name='__main__')
+        return {output: module_globals[output] for output in outputs}
+
+    return Stage(name, run, inputs=inputs, outputs=outputs,
+                 files=[base_dir / file for file in files],
+                 sources=[base_dir / source for source in sources],
+                 version=code_version(script_path, PIPELINE_DIR))
+
+
+def build_stages(base_dir):
+    """Declare the analysis stages, their inputs and the files they write."""
+    return [
+        script_stage('load', '01_eda_analysis.py', base_dir, outputs=['data'], sources=['data'], files=[
+            'combined_soil_data.csv', 'missing_values_report.csv',
+            'descriptive_statistics.csv', 'categorical_summary.csv'
+        ]),
+        script_stage('visualizations', '02_eda_visualizations.py', base_dir, inputs=['data'], files=[
+            'outlier_analysis.csv', 'distributions.png', 'boxplots.png', 'missing_pattern.png'
+        ]),
+        script_stage('correlations', '03_eda_correlations.py', base_dir, inputs=['data'], files=[
+            'correlation_matrix.csv', 'strong_correlations.csv', 'correlation_heatmap.png',
+            'scatter_correlations.png', 'soil_health_correlations.csv', 'soil_health_factors.png'
+        ]),
+        script_stage('categorical', '04_eda_categorical_crops.py', base_dir, inputs=['data'], files=[
+            'crop_nutrient_recommendations.csv', 'soil_health_by_cover_crop.csv',
+            'ph_by_past_crop.csv', 'crop_distribution.png', 'soil_health_by_cover_boxplot.png',
+            'nutrient_recs_by_crop.png', 'cover_crop*_distribution.png'
+        ]),
+        script_stage('insights', '05_eda_advanced_insights.py', base_dir, inputs=['data'], files=[
+            'soil_health_distribution.png', 'npk_comparison.png',
+            'traditional_vs_haney.png', 'om_vs_health.png'
+        ]),
+    ]
 
-    except Exception as e:
-        print(f"\n✗ Error in {script_name}: {str(e)}")
-        return False
 
 def main():
-    """Run all analysis scripts in sequence."""
+    """Run all analysis stages."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parallel stages (default: CPU count)')
+    parser.add_argument('--base-dir', type=Path, default=DEFAULT_BASE_DIR,
+                        help='directory holding data/ and receiving outputs')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='run every stage even if its cached result is current')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record peak Python heap per stage (tracemalloc; slows stages)')
+    args = parser.parse_args()
 
     print("="*80)
     print("AGRICULTURAL SOIL HEALTH EDA - FULL ANALYSIS PIPELINE")
     print("="*80)
     print(f"Start time: {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
-    # Define analysis pipeline
-    scripts = [
-        '01_eda_analysis.py',
-        '02_eda_visualizations.py',
-        '03_eda_correlations.py',
-        '04_eda_categorical_crops.py',
-        '05_eda_advanced_insights.py'
-    ]
-
-    # Track results
-    results = {}
+    stages = build_stages(args.base_dir)
+    cache = None if args.no_cache else StageCache(args.base_dir / '.stage_cache')
     start_time = time.time()
+    _, run_log = run_pipeline(stages, workers=args.workers, cache=cache,
+                              trace_memory=args.trace_memory)
+    total_time = time.time() - start_time
 
-    # Run each script
-    for script in scripts:
-        results[script] = run_script(script)
-
-        # Stop if any script fails
-        if not results[script]:
-            print(f"\n⚠ Pipeline stopped due to error in {script}")
-            sys.exit(1)
+    run_log_path = args.base_dir / 'pipeline_run_log.csv'
+    run_log.to_csv(run_log_path, index=False)
 
     # Summary
-    total_time = time.time() - start_time
-
     print(f"\n{'='*80}")
     print("PIPELINE COMPLETE")
     print(f"{'='*80}")
     print(f"Total runtime: {total_time:.2f} seconds ({total_time/60:.1f} minutes)")
     print(f"\nResults:")
-    for script, success in results.items():
-        status = "✓ SUCCESS" if success else "✗ FAILED"
-        print(f"  {status}: {script}")
+    columns = ['stage', 'status', 'seconds', 'max_rss_mb'] + (['peak_traced_mb'] if args.trace_memory else [])
+    print(run_log[columns].to_string(index=False))
+    print(f"\n✓ Stage timings saved to: {run_log_path}")
 
-    print(f"\nAll outputs saved to:")
-    print(f"  - Visualizations: ../outputs/visualizations/")
-    print(f"  - Tables: ../outputs/tables/")
-    print(f"  - Reports: ../reports/")
+    print(f"\nAll outputs saved to: {args.base_dir}")
 
     print(f"\nNext steps:")
     print(f"  1. Review main report: ../reports/COMPREHENSIVE_EDA_REPORT.md")
     print(f"  2. Examine visualizations in outputs/visualizations/")
     print(f"  3. Check summary tables in outputs/tables/")
 
-    return 0
+    return 0 if run_log['status'].isin(['ok', 'cached']).all() else 1
+
 
 if __name__ == '__main__':
     sys.exit(main())
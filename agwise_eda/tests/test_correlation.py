@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import pairwise_correlation
+
+
+def _sample(rows=400, seed=0):
+    """Correlated columns with ties, a constant column and several missingness patterns."""
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=rows)
+    data = pd.DataFrame({
+        'a': base + rng.normal(scale=0.5, size=rows),
+        'b': np.round(base * 2 + rng.normal(size=rows)),
+        'c': np.exp(base) + rng.normal(scale=0.1, size=rows),
+        'd': rng.integers(0, 4, size=rows).astype('float64'),
+        'e': -base + rng.normal(size=rows),
+        'f': np.ones(rows),
+    })
+    data.loc[rng.random(rows) < 0.3, 'a'] = np.nan
+    data.loc[rng.random(rows) < 0.5, 'b'] = np.nan
+    data.loc[data['a'].isna(), 'c'] = np.nan  # same pattern as a
+    data.loc[rows // 2:, 'd'] = np.nan
+    data.loc[rng.random(rows) < 0.1, 'f'] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_matches_dataframe_corr_with_missing_values(method):
+    data = _sample()
+    corr, n = pairwise_correlation(data, method=method, chunk_size=64)
+    expected = data.corr(method=method)
+    pd.testing.assert_frame_equal(corr, expected, check_exact=False, atol=1e-10)
+
+    present = data.notna().astype('int64')
+    pd.testing.assert_frame_equal(n, present.T @ present)
+
+
+def test_spearman_min_periods():
+    data = _sample(rows=60, seed=1)
+    corr, _ = pairwise_correlation(data, method='spearman', min_periods=25)
+    expected = data.corr(method='spearman', min_periods=25)
+    pd.testing.assert_frame_equal(corr, expected, check_exact=False, atol=1e-10)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from pipeline import (dtype_map_path_for, load_dataset, load_dtype_map, load_manifest, part_files, store_path_for,
+                      update_combined_dataset)
+from pipeline.store import PYARROW_AVAILABLE
+
+
+def _write_file(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'Lab No': [f'{path.stem}-{i}' for i in range(rows)],
+        'pH': np.round(rng.normal(6.5, 0.5, size=rows), 1),
+        'Organic Matter': np.round(rng.gamma(2.0, 1.5, size=rows), 2),
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(path, index=False)
+
+
+def test_failed_files_are_skipped_until_they_change(tmp_path):
+    data_dir = tmp_path / 'raw'
+    combined_path = tmp_path / 'out' / 'combined.csv'
+    _write_file(data_dir / 'batch_1' / 'Processed File (1).csv', 20)
+    empty = data_dir / 'batch_1' / 'Processed File (2).csv'
+    empty.write_text('')
+
+    _, load_log, _ = update_combined_dataset(data_dir, combined_path, workers=1)
+    assert load_log['error'].notna().sum() == 1
+    assert 'error' in load_manifest(combined_path.parent / 'ingest_manifest.json')['files'][
+        'batch_1/Processed File (2).csv']
+
+    mtime = combined_path.stat().st_mtime_ns
+    _, load_log, changes = update_combined_dataset(data_dir, combined_path, workers=1)
+    assert len(load_log) == 0
+    assert changes['failed'] == ['batch_1/Processed File (2).csv']
+    assert combined_path.stat().st_mtime_ns == mtime
+
+    _write_file(empty, 5, seed=1)
+    data, load_log, changes = update_combined_dataset(data_dir, combined_path, workers=1)
+    assert changes['changed'] == ['batch_1/Processed File (2).csv']
+    assert load_log['error'].isna().all()
+    assert len(data) == 25
+
+
+def _write_lab_file(path, rows, seed=0, text_every=None):
+    """A raw export whose 'Iron Rec' column is numeric, with 'ND' in every text_every-th row."""
+    rng = np.random.default_rng(seed)
+    iron = np.round(rng.gamma(2.0, 20.0, size=rows), 1).astype(object)
+    if text_every:
+        iron[::text_every] = 'ND'
+    frame = pd.DataFrame({
+        'Lab No': [f'{path.stem}-{i}' for i in range(rows)],
+        'pH': np.round(rng.normal(6.5, 0.5, size=rows), 1),
+        'Iron Rec': iron,
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(path, index=False)
+
+
+def _assert_matches_rebuild(data_dir, combined_path, rebuild_path):
+    update_combined_dataset(data_dir, rebuild_path, workers=1, merge_group=1)
+
+    def by_source(data):
+        return data.sort_values(['_source_batch', '_source_file'], kind='stable').reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(by_source(load_dataset(combined_path)), by_source(load_dataset(rebuild_path)),
+                                  check_like=True)
+    assert load_dtype_map(dtype_map_path_for(combined_path)) == load_dtype_map(dtype_map_path_for(rebuild_path))
+
+
+def test_incremental_updates_match_full_rebuild(tmp_path):
+    data_dir = tmp_path / 'raw'
+    combined_path = tmp_path / 'out' / 'combined.csv'
+    for number in range(3):
+        _write_lab_file(data_dir / 'batch_1' / f'Processed File ({number}).csv', 40, seed=number, text_every=40)
+    data, _, _ = update_combined_dataset(data_dir, combined_path, workers=1, merge_group=1)
+    assert str(data['Iron Rec'].dtype) == 'float32'
+
+    # An addition that fits the stored types is appended as one more part
+    store_path = store_path_for(combined_path)
+    mtimes = {part: part.stat().st_mtime_ns for part in part_files(store_path)}
+    _write_lab_file(data_dir / 'batch_2' / 'Processed File (3).csv', 40, seed=3)
+    _, load_log, _ = update_combined_dataset(data_dir, combined_path, workers=1, merge_group=1)
+    assert len(load_log) == 1
+    if PYARROW_AVAILABLE:
+        assert len(part_files(store_path)) == 4
+        assert all(part.stat().st_mtime_ns == mtime for part, mtime in mtimes.items())
+    _assert_matches_rebuild(data_dir, combined_path, tmp_path / 'rebuild_1' / 'combined.csv')
+
+    # Enough 'ND' to make 'Iron Rec' text: the earlier 'ND' must come back
+    _write_lab_file(data_dir / 'batch_2' / 'Processed File (4).csv', 40, seed=4, text_every=2)
+    data, _, _ = update_combined_dataset(data_dir, combined_path, workers=1, merge_group=1)
+    assert str(data['Iron Rec'].dtype) == 'string'
+    assert (data['Iron Rec'] == 'ND').sum() == 23
+    _assert_matches_rebuild(data_dir, combined_path, tmp_path / 'rebuild_2' / 'combined.csv')
+
+    # A changed and a removed file: only the changed file is read again
+    _write_lab_file(data_dir / 'batch_1' / 'Processed File (1).csv', 30, seed=10, text_every=3)
+    (data_dir / 'batch_1' / 'Processed File (2).csv').unlink()
+    _, load_log, changes = update_combined_dataset(data_dir, combined_path, workers=1, merge_group=1)
+    assert changes['changed'] == ['batch_1/Processed File (1).csv']
+    assert changes['removed'] == ['batch_1/Processed File (2).csv']
+    assert load_log['file'].tolist() == ['Processed File (1).csv']
+    _assert_matches_rebuild(data_dir, combined_path, tmp_path / 'rebuild_3' / 'combined.csv')
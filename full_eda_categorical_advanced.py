@@ -12,15 +12,19 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'agwise_eda'))
+from pipeline import FigureJob, build_sketches, load_dataset, load_sketches, render_figures
+
 # Configuration
 sns.set_style("whitegrid")
 plt.rcParams['figure.dpi'] = 300
 
-# Paths
-BASE_DIR = Path('/Users/deyus-ex-machina/agwise/agwise_eda')
+# Paths (run_full_eda.py sets BASE_DIR when running this as a stage)
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise/agwise_eda'))
 DATA_FILE = BASE_DIR / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
 VIZ_DIR = BASE_DIR / 'outputs' / 'visualizations'
 TABLE_DIR = BASE_DIR / 'outputs' / 'tables'
@@ -29,10 +33,28 @@ print("="*80)
 print("CATEGORICAL & ADVANCED ANALYSIS - FULL DATASET")
 print("="*80)
 
+# Columns used by this analysis (canonical names; missing ones are skipped)
+ANALYSIS_COLUMNS = [
+    'Cover Crop Mix', 'Crop 1', 'Crop 2', 'Crop 3', 'Past Crop',
+    'Soil Health Calculation',
+    'Available N', 'H3A Nitrate', 'Available P', 'H3A Total Phosphorus',
+    'Available K', 'H3A ICAP Potassium',
+    'Traditional N', 'Haney Test N', 'Organic Matter'
+]
+
 # Load data
 print("\nLoading data...")
-data = pd.read_csv(DATA_FILE)
-print(f"✓ Loaded {len(data):,} samples")
+data = load_dataset(DATA_FILE, columns=ANALYSIS_COLUMNS)
+print(f"✓ Loaded {len(data):,} samples ({len(data.columns)} analysis columns)")
+
+# Per-group quantile sketches written at ingest (medians without re-sorting groups)
+sketches = load_sketches(DATA_FILE)
+if sketches is None:
+    sketches = build_sketches(data, group_by=['Cover Crop Mix'])
+
+# Figures are queued as independent jobs (each with only the columns it
+# plots) and rendered together in a process pool at the end
+figure_jobs = []
 
 # ============================================================================
 # SECTION 1: CATEGORICAL ANALYSIS
@@ -41,8 +63,23 @@ print("\n" + "="*80)
 print("SECTION 1: CROP AND COVER CROP ANALYSIS")
 print("="*80)
 
+
+def draw_value_counts(data, col):
+    value_counts = data[col].value_counts()
+    fig, ax = plt.subplots(figsize=(12, 8))
+    value_counts.plot(kind='bar', ax=ax, color='forestgreen')
+    ax.set_xlabel('Cover Crop Mix', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Count', fontsize=12)
+    ax.set_title(f'Distribution of {col} (n={data[col].notna().sum():,})',
+                fontsize=14, fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
 # Analyze cover crop mixes
-cover_cols = ['Cover Crop Mix', 'Cover crop mix']
+cover_cols = ['Cover Crop Mix']
 for col in cover_cols:
     if col in data.columns and data[col].notna().sum() > 50:
         print(f"\n{col} Distribution:")
@@ -56,19 +93,10 @@ for col in cover_cols:
 
         # Visualize
         if len(value_counts) < 15:
-            fig, ax = plt.subplots(figsize=(12, 8))
-            value_counts.plot(kind='bar', ax=ax, color='forestgreen')
-            ax.set_xlabel('Cover Crop Mix', fontsize=12, fontweight='bold')
-            ax.set_ylabel('Count', fontsize=12)
-            ax.set_title(f'Distribution of {col} (n={data[col].notna().sum():,})',
-                        fontsize=14, fontweight='bold')
-            ax.grid(axis='y', alpha=0.3)
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
             filename = col.lower().replace(' ', '_')
-            plt.savefig(VIZ_DIR / f'{filename}_distribution_FULL.png', dpi=300, bbox_inches='tight')
-            print(f"  ✓ Saved: {filename}_distribution_FULL.png")
-            plt.close()
+            figure_jobs.append(FigureJob(f'{filename}_distribution', draw_value_counts,
+                                         VIZ_DIR / f'{filename}_distribution_FULL.png',
+                                         columns=[col], params={'col': col}))
 
 # Analyze crops
 crop_cols = ['Crop 1', 'Crop 2', 'Crop 3', 'Past Crop']
@@ -93,8 +121,9 @@ if crop_summary:
     crop_df.to_csv(TABLE_DIR / 'crop_summary_FULL.csv', index=False)
     print(f"\n✓ Saved: crop_summary_FULL.csv")
 
+
 # Crop 1 distribution
-if 'Crop 1' in data.columns and data['Crop 1'].notna().sum() > 20:
+def draw_crop_distribution(data):
     crop1_counts = data['Crop 1'].value_counts().head(15)
     fig, ax = plt.subplots(figsize=(14, 8))
     crop1_counts.plot(kind='barh', ax=ax, color='steelblue')
@@ -104,9 +133,12 @@ if 'Crop 1' in data.columns and data['Crop 1'].notna().sum() > 20:
                 fontsize=14, fontweight='bold')
     ax.grid(axis='x', alpha=0.3)
     plt.tight_layout()
-    plt.savefig(VIZ_DIR / 'crop_distribution_FULL.png', dpi=300, bbox_inches='tight')
-    print("✓ Saved: crop_distribution_FULL.png")
-    plt.close()
+    return fig
+
+
+if 'Crop 1' in data.columns and data['Crop 1'].notna().sum() > 20:
+    figure_jobs.append(FigureJob('crop_distribution', draw_crop_distribution,
+                                 VIZ_DIR / 'crop_distribution_FULL.png', columns=['Crop 1']))
 
 # ============================================================================
 # SECTION 2: SOIL HEALTH BY COVER CROP
@@ -115,20 +147,36 @@ print("\n" + "="*80)
 print("SECTION 2: SOIL HEALTH BY COVER CROP MIX")
 print("="*80)
 
-health_col = 'Soil Health Calculation' if 'Soil Health Calculation' in data.columns else 'Soil Health Score'
+health_col = 'Soil Health Calculation'
+
+
+def draw_health_by_cover(data, cover_col):
+    cover_health = data.dropna()
+    fig, ax = plt.subplots(figsize=(14, 8))
+    cover_health.boxplot(column=health_col, by=cover_col, ax=ax)
+    ax.set_xlabel('Cover Crop Mix', fontsize=12, fontweight='bold')
+    ax.set_ylabel(health_col, fontsize=12)
+    ax.set_title(f'{health_col} by Cover Crop Mix (n={len(cover_health):,})',
+                fontsize=14, fontweight='bold')
+    plt.suptitle('')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
 
 for cover_col in cover_cols:
     if cover_col in data.columns and health_col in data.columns:
-        cover_health = data[[cover_col, health_col]].copy()
-        cover_health[health_col] = pd.to_numeric(cover_health[health_col], errors='coerce')
-        cover_health = cover_health.dropna()
+        cover_health = data[[cover_col, health_col]].dropna()
 
         if len(cover_health) > 50:
             print(f"\n{health_col} by {cover_col}:")
 
-            health_by_cover = cover_health.groupby(cover_col)[health_col].agg([
-                'count', 'mean', 'median', 'std', 'min', 'max'
-            ]).sort_values('mean', ascending=False)
+            health_by_cover = cover_health.groupby(cover_col, observed=True)[health_col].agg([
+                'count', 'mean', 'std', 'min', 'max'
+            ])
+            medians = sketches.group_quantiles(cover_col, health_col, probs=[0.5])[0.5]
+            health_by_cover.insert(2, 'median', medians.reindex(health_by_cover.index.astype(str)).to_numpy())
+            health_by_cover = health_by_cover.sort_values('mean', ascending=False)
 
             print(health_by_cover.round(2))
 
@@ -138,18 +186,10 @@ for cover_col in cover_cols:
 
             # Visualize
             if len(health_by_cover) < 15:
-                fig, ax = plt.subplots(figsize=(14, 8))
-                cover_health.boxplot(column=health_col, by=cover_col, ax=ax)
-                ax.set_xlabel('Cover Crop Mix', fontsize=12, fontweight='bold')
-                ax.set_ylabel(health_col, fontsize=12)
-                ax.set_title(f'{health_col} by Cover Crop Mix (n={len(cover_health):,})',
-                            fontsize=14, fontweight='bold')
-                plt.suptitle('')
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                plt.savefig(VIZ_DIR / 'soil_health_by_cover_boxplot_FULL.png', dpi=300, bbox_inches='tight')
-                print("✓ Saved: soil_health_by_cover_boxplot_FULL.png")
-                plt.close()
+                figure_jobs.append(FigureJob('soil_health_by_cover_boxplot', draw_health_by_cover,
+                                             VIZ_DIR / 'soil_health_by_cover_boxplot_FULL.png',
+                                             columns=[cover_col, health_col],
+                                             params={'cover_col': cover_col}))
 
 # ============================================================================
 # SECTION 3: NUTRIENT AVAILABILITY ANALYSIS
@@ -170,7 +210,7 @@ for nutrient, possible_cols in nutrient_cols.items():
     for col in possible_cols:
         if col in data.columns and data[col].notna().sum() > 500:
             npk_cols.append(col)
-            values = pd.to_numeric(data[col], errors='coerce').dropna()
+            values = data[col].dropna()
             print(f"\n{col}:")
             print(f"  Count: {len(values):,}")
             print(f"  Mean: {values.mean():.2f}")
@@ -179,21 +219,24 @@ for nutrient, possible_cols in nutrient_cols.items():
             print(f"  Range: {values.min():.2f} - {values.max():.2f}")
             break
 
+
 # N-P-K comparison visualization
-if len(npk_cols) >= 3:
-    npk_compare = data[npk_cols].apply(pd.to_numeric, errors='coerce').dropna()
-    if len(npk_compare) > 0:
-        fig, ax = plt.subplots(figsize=(12, 8))
-        npk_compare.boxplot(ax=ax)
-        ax.set_ylabel('Availability', fontsize=12, fontweight='bold')
-        ax.set_title(f'N-P-K Nutrient Availability Distribution (n={len(npk_compare):,})',
-                    fontsize=14, fontweight='bold')
-        ax.grid(axis='y', alpha=0.3)
-        plt.xticks(rotation=0, fontsize=10)
-        plt.tight_layout()
-        plt.savefig(VIZ_DIR / 'npk_comparison_FULL.png', dpi=300, bbox_inches='tight')
-        print("\n✓ Saved: npk_comparison_FULL.png")
-        plt.close()
+def draw_npk_comparison(data):
+    npk_compare = data.dropna()
+    fig, ax = plt.subplots(figsize=(12, 8))
+    npk_compare.boxplot(ax=ax)
+    ax.set_ylabel('Availability', fontsize=12, fontweight='bold')
+    ax.set_title(f'N-P-K Nutrient Availability Distribution (n={len(npk_compare):,})',
+                fontsize=14, fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+    plt.xticks(rotation=0, fontsize=10)
+    plt.tight_layout()
+    return fig
+
+
+if len(npk_cols) >= 3 and data[npk_cols].notna().all(axis=1).any():
+    figure_jobs.append(FigureJob('npk_comparison', draw_npk_comparison,
+                                 VIZ_DIR / 'npk_comparison_FULL.png', columns=npk_cols))
 
 # ============================================================================
 # SECTION 4: TRADITIONAL VS HANEY TEST
@@ -202,14 +245,11 @@ print("\n" + "="*80)
 print("SECTION 4: TRADITIONAL VS HANEY TEST COMPARISON")
 print("="*80)
 
-trad_cols = ['Traditional N', 'Traditional Test N, lbs/A']
-haney_cols = ['Haney Test N', 'Haney Test N, lbs/A']
-
-trad_col = next((col for col in trad_cols if col in data.columns and data[col].notna().sum() > 100), None)
-haney_col = next((col for col in haney_cols if col in data.columns and data[col].notna().sum() > 100), None)
+trad_col = 'Traditional N'
+haney_col = 'Haney Test N'
 
-if trad_col and haney_col:
-    comparison_data = data[[trad_col, haney_col]].apply(pd.to_numeric, errors='coerce').dropna()
+if trad_col in data.columns and haney_col in data.columns:
+    comparison_data = data[[trad_col, haney_col]].dropna()
 
     if len(comparison_data) > 0:
         print(f"\nSamples with both tests: {len(comparison_data):,}")
@@ -227,29 +267,33 @@ if trad_col and haney_col:
         print(f"  Median: {diff.median():.2f} lbs/A")
 
         # Visualization
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
-
-        # Scatter plot
-        ax1.scatter(comparison_data[trad_col], comparison_data[haney_col],
-                   alpha=0.4, s=20)
-        max_val = max(comparison_data[trad_col].max(), comparison_data[haney_col].max())
-        ax1.plot([0, max_val], [0, max_val], 'r--', linewidth=2, label='1:1 Line')
-        ax1.set_xlabel(trad_col, fontsize=11, fontweight='bold')
-        ax1.set_ylabel(haney_col, fontsize=11)
-        ax1.set_title(f'Traditional vs Haney Test (n={len(comparison_data):,})', fontsize=12)
-        ax1.legend()
-        ax1.grid(True, alpha=0.3)
-
-        # Box plot
-        comparison_data.boxplot(ax=ax2)
-        ax2.set_ylabel('N Recommendation (lbs/A)', fontsize=11, fontweight='bold')
-        ax2.set_title('Distribution Comparison', fontsize=12)
-        ax2.grid(axis='y', alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig(VIZ_DIR / 'traditional_vs_haney_FULL.png', dpi=300, bbox_inches='tight')
-        print("\n✓ Saved: traditional_vs_haney_FULL.png")
-        plt.close()
+        def draw_traditional_vs_haney(data):
+            comparison_data = data.dropna()
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7))
+
+            # Scatter plot
+            ax1.scatter(comparison_data[trad_col], comparison_data[haney_col],
+                       alpha=0.4, s=20)
+            max_val = max(comparison_data[trad_col].max(), comparison_data[haney_col].max())
+            ax1.plot([0, max_val], [0, max_val], 'r--', linewidth=2, label='1:1 Line')
+            ax1.set_xlabel(trad_col, fontsize=11, fontweight='bold')
+            ax1.set_ylabel(haney_col, fontsize=11)
+            ax1.set_title(f'Traditional vs Haney Test (n={len(comparison_data):,})', fontsize=12)
+            ax1.legend()
+            ax1.grid(True, alpha=0.3)
+
+            # Box plot
+            comparison_data.boxplot(ax=ax2)
+            ax2.set_ylabel('N Recommendation (lbs/A)', fontsize=11, fontweight='bold')
+            ax2.set_title('Distribution Comparison', fontsize=12)
+            ax2.grid(axis='y', alpha=0.3)
+
+            plt.tight_layout()
+            return fig
+
+        figure_jobs.append(FigureJob('traditional_vs_haney', draw_traditional_vs_haney,
+                                     VIZ_DIR / 'traditional_vs_haney_FULL.png',
+                                     columns=[trad_col, haney_col]))
 
 # ============================================================================
 # SECTION 5: ORGANIC MATTER VS SOIL HEALTH
@@ -258,10 +302,10 @@ print("\n" + "="*80)
 print("SECTION 5: ORGANIC MATTER VS SOIL HEALTH")
 print("="*80)
 
-om_col = 'Organic Matter' if 'Organic Matter' in data.columns else 'Organic Matter, % LOI'
+om_col = 'Organic Matter'
 
 if om_col in data.columns and health_col in data.columns:
-    om_health = data[[om_col, health_col]].apply(pd.to_numeric, errors='coerce').dropna()
+    om_health = data[[om_col, health_col]].dropna()
 
     if len(om_health) > 0:
         corr = om_health[om_col].corr(om_health[health_col])
@@ -269,30 +313,46 @@ if om_col in data.columns and health_col in data.columns:
         print(f"Sample size: {len(om_health):,}")
 
         # Visualization
-        fig, ax = plt.subplots(figsize=(12, 8))
-        # Sample if too many points
-        if len(om_health) > 2000:
-            plot_data = om_health.sample(2000, random_state=42)
-        else:
-            plot_data = om_health
-
-        ax.scatter(plot_data[om_col], plot_data[health_col], alpha=0.4, s=20)
-        ax.set_xlabel(om_col, fontsize=12, fontweight='bold')
-        ax.set_ylabel(health_col, fontsize=12, fontweight='bold')
-        ax.set_title(f'{health_col} vs {om_col} (r={corr:.3f}, n={len(om_health):,})',
-                    fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3)
-
-        # Add regression line
-        z = np.polyfit(plot_data[om_col], plot_data[health_col], 1)
-        p = np.poly1d(z)
-        x_line = np.linspace(plot_data[om_col].min(), plot_data[om_col].max(), 100)
-        ax.plot(x_line, p(x_line), "r--", alpha=0.8, linewidth=2)
-
-        plt.tight_layout()
-        plt.savefig(VIZ_DIR / 'om_vs_health_FULL.png', dpi=300, bbox_inches='tight')
-        print("✓ Saved: om_vs_health_FULL.png")
-        plt.close()
+        def draw_om_vs_health(data, corr):
+            om_health = data.dropna()
+            fig, ax = plt.subplots(figsize=(12, 8))
+            # Sample if too many points
+            if len(om_health) > 2000:
+                plot_data = om_health.sample(2000, random_state=42)
+            else:
+                plot_data = om_health
+
+            ax.scatter(plot_data[om_col], plot_data[health_col], alpha=0.4, s=20)
+            ax.set_xlabel(om_col, fontsize=12, fontweight='bold')
+            ax.set_ylabel(health_col, fontsize=12, fontweight='bold')
+            ax.set_title(f'{health_col} vs {om_col} (r={corr:.3f}, n={len(om_health):,})',
+                        fontsize=14, fontweight='bold')
+            ax.grid(True, alpha=0.3)
+
+            # Add regression line
+            z = np.polyfit(plot_data[om_col], plot_data[health_col], 1)
+            p = np.poly1d(z)
+            x_line = np.linspace(plot_data[om_col].min(), plot_data[om_col].max(), 100)
+            ax.plot(x_line, p(x_line), "r--", alpha=0.8, linewidth=2)
+
+            plt.tight_layout()
+            return fig
+
+        figure_jobs.append(FigureJob('om_vs_health', draw_om_vs_health, VIZ_DIR / 'om_vs_health_FULL.png',
+                                     columns=[om_col, health_col], params={'corr': corr}))
+
+# ============================================================================
+# SECTION 6: RENDERING
+# ============================================================================
+print("\n" + "="*80)
+print(f"SECTION 6: RENDERING {len(figure_jobs)} FIGURES")
+print("="*80 + "\n")
+
+render_log = render_figures(data, figure_jobs)
+render_log.to_csv(TABLE_DIR / 'figure_render_log_categorical_FULL.csv', index=False)
+print(f"\n✓ Rendered {(render_log['status'] == 'ok').sum()} of {len(render_log)} figures "
+      f"({render_log['seconds'].sum():.1f}s of rendering)")
+print("✓ Saved: figure_render_log_categorical_FULL.csv")
 
 print("\n" + "="*80)
 print("CATEGORICAL & ADVANCED ANALYSIS COMPLETE")
@@ -23,16 +23,31 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'agwise_eda'))
+from pipeline import (KEY_COLUMNS, KEY_HASH_COL, METADATA_COLS, PYARROW_AVAILABLE, ROW_HASH_COL, CubeAccumulator,
+                      DuplicateIndex, ProfileAccumulator, build_cube, count_outliers, cube_path_for, discover_csv_files,
+                      dtype_map_path_for, iter_dataset, load_cube, load_errors_from_log, load_provenance,
+                      load_row_index, part_files, provenance_counts, provenance_path_for, store_path_for,
+                      stream_combined_dataset, update_combined_dataset, write_cube)
+
 # Configuration
 sns.set_style("whitegrid")
 sns.set_palette("husl")
 plt.rcParams['figure.figsize'] = (14, 10)
 
-# Paths
-BASE_DIR = Path('/Users/deyus-ex-machina/agwise')
+# Paths (run_full_eda.py sets BASE_DIR when running this as a stage)
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise'))
+# Store each unique sample once, with a provenance table of its source files
+DEDUP = bool(globals().get('DEDUP', False))
+# Process the dataset in file-group chunks so memory is bounded by the
+# chunk size rather than the number of rows
+STREAM = bool(globals().get('STREAM', False))
+if DEDUP and STREAM:
+    raise ValueError("DEDUP and STREAM cannot be combined: dedup keeps the unique rows in memory")
 DATA_DIR = BASE_DIR / 'data'
 OUTPUT_DIR = BASE_DIR / 'agwise_eda'
 VIZ_DIR = OUTPUT_DIR / 'outputs' / 'visualizations'
@@ -56,59 +71,87 @@ print("SECTION 1: DATA LOADING AND INTEGRATION")
 print("="*80)
 
 # Find all CSV files
-csv_files = list(DATA_DIR.glob('**/*.csv'))
+csv_files, batches = discover_csv_files(DATA_DIR)
 print(f"\nTotal CSV files found: {len(csv_files)}")
 
-# Group by batch
-batches = {}
-for file in csv_files:
-    batch_name = file.parent.name
-    if batch_name not in batches:
-        batches[batch_name] = []
-    batches[batch_name].append(file)
-
 print(f"\nBatches identified:")
 for batch_name, files in batches.items():
     print(f"  - {batch_name}: {len(files)} files")
 
-# Load all data
-print(f"\nLoading all {len(csv_files)} CSV files...")
-dfs = []
-load_errors = []
-
-for i, file in enumerate(csv_files, 1):
-    if i % 100 == 0:
-        print(f"  Loading file {i}/{len(csv_files)}...")
-    try:
-        df = pd.read_csv(file)
-        df['_source_file'] = file.name
-        df['_source_batch'] = file.parent.name
-        dfs.append(df)
-    except Exception as e:
-        load_errors.append((file.name, str(e)))
-
-print(f"\n✓ Successfully loaded: {len(dfs)} files")
+# Incremental load: only new or changed files are parsed (process pool,
+# bounded merge); rows from changed or deleted files are replaced. In
+# streaming mode the rows arrive as chunks that are profiled and dropped.
+combined_path = OUTPUT_DIR / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
+print(f"\nChecking {len(csv_files)} CSV files against the ingest manifest...")
+profile = ProfileAccumulator()
+if STREAM:
+    data = None
+    cube_builder = CubeAccumulator()
+    chunks, load_log, changes = stream_combined_dataset(DATA_DIR, combined_path)
+    for chunk in chunks:
+        profile.update(chunk)
+        cube_builder.update(chunk)
+else:
+    data, load_log, changes = update_combined_dataset(DATA_DIR, combined_path, dedup=DEDUP)
+    profile.update(data)
+provenance = load_provenance(combined_path) if DEDUP else None
+load_errors = load_errors_from_log(load_log)
+dtype_names = pd.Series(profile.dtypes, dtype='object')
+
+print(f"  New: {len(changes['added'])} | Changed: {len(changes['changed'])} | "
+      f"Removed: {len(changes['removed'])} | Unchanged (skipped): {len(changes['unchanged'])}")
+print(f"\n✓ Successfully loaded: {len(load_log) - len(load_errors)} files")
+if len(load_log) > 0:
+    print(f"  Read time: {load_log['seconds'].sum():.2f}s total, "
+          f"slowest file {load_log['seconds'].max():.3f}s")
 if load_errors:
     print(f"✗ Failed to load: {len(load_errors)} files")
     for fname, error in load_errors[:5]:
         print(f"    {fname}: {error}")
+if changes['failed']:
+    print(f"⚠ Skipped {len(changes['failed'])} unchanged files that failed to load in an earlier run")
 
-# Combine all dataframes
-print(f"\nMerging all dataframes...")
-data = pd.concat(dfs, ignore_index=True)
+load_log.to_csv(TABLE_DIR / 'ingest_log_FULL.csv', index=False)
+print(f"✓ Saved per-file load log: ingest_log_FULL.csv")
 
 print(f"\n" + "="*80)
 print(f"COMBINED DATASET OVERVIEW")
 print(f"="*80)
-print(f"Total Samples: {len(data):,}")
-print(f"Total Variables: {len(data.columns)}")
-print(f"Memory Usage: {data.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
-
-# Save combined dataset
-combined_path = OUTPUT_DIR / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
-combined_path.parent.mkdir(parents=True, exist_ok=True)
-data.to_csv(combined_path, index=False)
-print(f"\n✓ Saved combined dataset: {combined_path}")
+print(f"Total Samples: {profile.rows:,}")
+print(f"Total Variables: {len(profile.columns)}")
+if STREAM:
+    print(f"Streaming mode: {profile.chunks} chunks, largest {profile.max_chunk_rows:,} rows / "
+          f"{profile.max_chunk_mb:.2f} MB in memory")
+else:
+    print(f"Memory Usage: {data.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+if DEDUP:
+    print(f"Dedup mode: {profile.rows:,} unique samples stored for "
+          f"{provenance_counts(provenance)['rows']:,} ingested rows "
+          f"(provenance: {provenance_path_for(combined_path).name})")
+
+print(f"\n✓ Combined dataset: {combined_path}")
+print(f"✓ Dtype map: {dtype_map_path_for(combined_path)} "
+      f"({dtype_names.isin(['float32', 'int8', 'int16', 'int32', 'category']).sum()} "
+      f"columns downcast)")
+if PYARROW_AVAILABLE:
+    store_path = store_path_for(combined_path)
+    store_parts = part_files(store_path)
+    print(f"✓ Columnar store: {store_path} "
+          f"({sum(part.stat().st_size for part in store_parts) / 1024**2:.2f} MB in {len(store_parts)} parts vs "
+          f"{combined_path.stat().st_size / 1024**2:.2f} MB CSV)")
+else:
+    print("⚠ pyarrow not installed - skipping columnar store (pip install pyarrow)")
+
+# Dashboard aggregates, rebuilt only when the dataset version changed
+if load_cube(combined_path) is not None:
+    print(f"✓ Dashboard aggregate cube is current: {cube_path_for(combined_path)}")
+elif STREAM:
+    # Folded from the chunks above; quartiles and whiskers are sketch estimates
+    cube_dir = write_cube(cube_builder.cube(load_row_index(combined_path)), combined_path)
+    print(f"✓ Dashboard aggregate cube (from streamed chunks): {cube_dir}")
+else:
+    cube_dir = write_cube(build_cube(data, provenance=provenance), combined_path)
+    print(f"✓ Dashboard aggregate cube: {cube_dir}")
 
 # ============================================================================
 # SECTION 2: DATA QUALITY ASSESSMENT
@@ -118,16 +161,16 @@ print("SECTION 2: DATA QUALITY ASSESSMENT")
 print("="*80)
 
 # Basic structure
-print(f"\nDataset Shape: {data.shape}")
+print(f"\nDataset Shape: {(profile.rows, len(profile.columns))}")
 print(f"\nData Types:")
-print(data.dtypes.value_counts())
+print(dtype_names.value_counts())
 
 # Identify column types
-numeric_cols = data.select_dtypes(include=[np.number]).columns.tolist()
-categorical_cols = data.select_dtypes(include=['object']).columns.tolist()
+numeric_cols = dtype_names.index[dtype_names.str.match(r'u?int|float')].tolist()
+categorical_cols = dtype_names.index[dtype_names.isin(['object', 'string', 'category'])].tolist()
 
 # Remove metadata columns
-metadata_cols = ['_source_file', '_source_batch']
+metadata_cols = METADATA_COLS
 categorical_cols = [col for col in categorical_cols if col not in metadata_cols]
 
 print(f"\nColumn Classification:")
@@ -140,17 +183,10 @@ print(f"\n" + "-"*80)
 print("MISSING VALUES ANALYSIS")
 print("-"*80)
 
-missing_summary = pd.DataFrame({
-    'Column': data.columns,
-    'Missing_Count': data.isnull().sum(),
-    'Missing_Percentage': (data.isnull().sum() / len(data) * 100).round(2),
-    'Data_Type': data.dtypes.astype(str)
-})
-missing_summary = missing_summary[missing_summary['Missing_Count'] > 0].sort_values(
-    'Missing_Percentage', ascending=False
-)
+# Null counts accumulated chunk by chunk during loading
+missing_summary = profile.missing_report()
 
-print(f"\nColumns with missing values: {len(missing_summary)}/{len(data.columns)}")
+print(f"\nColumns with missing values: {len(missing_summary)}/{len(profile.columns)}")
 print(f"\nTop 20 columns with most missing data:")
 print(missing_summary.head(20).to_string(index=False))
 
@@ -158,26 +194,41 @@ print(missing_summary.head(20).to_string(index=False))
 missing_summary.to_csv(TABLE_DIR / 'missing_values_report_FULL.csv', index=False)
 print(f"\n✓ Saved: missing_values_report_FULL.csv")
 
-# Duplicate analysis
-duplicates = data.duplicated().sum()
+# Duplicate analysis (row-hash index written at ingest; no full-frame comparison)
+row_index = load_row_index(combined_path)
+sample_index = DuplicateIndex.from_row_index(row_index)
+if DEDUP:
+    # Stored rows are unique; the ingested rows are recovered from provenance
+    ingested = provenance_counts(provenance)
+    n_rows, duplicates = ingested['rows'], ingested['duplicate_rows']
+    n_sample_duplicates = n_rows - profile.rows
+    files_per_sample = provenance.groupby(ROW_HASH_COL).size()
+    n_multi_file = (files_per_sample > 1).sum()
+    batch_stats = ingested['batch_counts']
+else:
+    n_rows = profile.rows
+    duplicates = DuplicateIndex.from_row_index(row_index, within_source=True).n_duplicates
+    n_sample_duplicates = sample_index.n_duplicates
+    n_multi_file = (sample_index.groups()['files'] > 1).sum()
+    batch_stats = profile.batch_counts()
 print(f"\n" + "-"*80)
 print("DUPLICATE ANALYSIS")
 print("-"*80)
-print(f"Duplicate rows: {duplicates:,} ({(duplicates/len(data)*100):.2f}%)")
-print(f"Unique rows: {len(data) - duplicates:,}")
+print(f"Duplicate rows: {duplicates:,} ({(duplicates/n_rows*100):.2f}%)")
+print(f"Unique rows: {n_rows - duplicates:,}")
+print(f"Duplicate samples ignoring source file: {n_sample_duplicates:,} "
+      f"({n_multi_file:,} samples appear in more than one file)")
 
-# Check key identifier duplicates
-key_cols = ['Lab No', 'Date Recd', 'Date Rept']
-existing_keys = [col for col in key_cols if col in data.columns]
+# Check key identifier duplicates (among the stored rows)
+existing_keys = [col for col in KEY_COLUMNS if col in profile.columns]
 if existing_keys:
-    key_duplicates = data[existing_keys].duplicated().sum()
+    key_duplicates = DuplicateIndex.from_row_index(row_index, column=KEY_HASH_COL).n_duplicates
     print(f"Duplicates by {existing_keys}: {key_duplicates:,}")
 
 # Batch-level statistics
 print(f"\n" + "-"*80)
 print("BATCH-LEVEL STATISTICS")
 print("-"*80)
-batch_stats = data.groupby('_source_batch').size().sort_index()
 print(batch_stats)
 
 # ============================================================================
@@ -187,16 +238,8 @@ print("\n" + "="*80)
 print("SECTION 3: DESCRIPTIVE STATISTICS")
 print("="*80)
 
-# Key soil health metrics (identify which naming convention exists)
-key_metrics_v1 = [
-    'Soil pH 1:1', '1:1 Electrical Conductivity, mmho/cm',
-    'Organic Matter, % LOI', 'Soil Respiration, ppm CO2-C',
-    'H3A Nitrate, ppm NO3-N', 'H3A Total Phosphorus, ppm P',
-    'H3A Potassium, ppm K', 'H3A Calcium, ppm Ca',
-    'H3A Magnesium, ppm Mg', 'Soil Health Score'
-]
-
-key_metrics_v2 = [
+# Key soil health metrics (canonical names; v1 spellings are mapped at ingest)
+key_metrics = [
     '1:1 Soil pH', '1:1 Soluble Salt',
     'Organic Matter', 'CO2-C',
     'H3A Nitrate', 'H3A Total Phosphorus',
@@ -204,23 +247,22 @@ key_metrics_v2 = [
     'H3A ICAP Magnesium', 'Soil Health Calculation'
 ]
 
+# Single pass over every numeric column: the profile kept one mergeable
+# accumulator per batch, combined into the global summary without
+# re-reading rows
+batch_accumulators = profile.batch_stats
+stats = profile.stats
+all_stats = stats.summary()
+
 # Find available metrics
-available_metrics = []
-for col in key_metrics_v1 + key_metrics_v2:
-    if col in data.columns and col not in available_metrics:
-        non_null = data[col].notna().sum()
-        if non_null > 50:  # Only include if sufficient data
-            available_metrics.append(col)
+available_metrics = [col for col in key_metrics
+                     if col in all_stats.index and all_stats.loc[col, 'count'] > 50]
 
 print(f"\nAvailable key metrics: {len(available_metrics)}")
 for i, col in enumerate(available_metrics, 1):
-    print(f"{i:2d}. {col:50s} (n={data[col].notna().sum():,})")
+    print(f"{i:2d}. {col:50s} (n={int(all_stats.loc[col, 'count']):,})")
 
-# Compute descriptive statistics
-desc_stats = data[available_metrics].describe().T
-desc_stats['missing_count'] = len(data) - data[available_metrics].notna().sum()
-desc_stats['missing_pct'] = (desc_stats['missing_count'] / len(data) * 100).round(2)
-desc_stats['cv'] = (desc_stats['std'] / desc_stats['mean'] * 100).round(2)
+desc_stats = all_stats.loc[available_metrics]
 
 print(f"\nDescriptive Statistics (Key Metrics):")
 print(desc_stats[['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max', 'cv']].round(2))
@@ -229,6 +271,14 @@ print(desc_stats[['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max', 'cv
 desc_stats.to_csv(TABLE_DIR / 'descriptive_statistics_FULL.csv')
 print(f"\n✓ Saved: descriptive_statistics_FULL.csv")
 
+all_stats.to_csv(TABLE_DIR / 'descriptive_statistics_all_numeric_FULL.csv')
+print(f"✓ Saved: descriptive_statistics_all_numeric_FULL.csv ({len(all_stats)} numeric columns)")
+
+batch_desc = pd.concat({batch: acc.summary() for batch, acc in batch_accumulators.items()},
+                       names=['Batch', 'Metric'])
+batch_desc.to_csv(TABLE_DIR / 'descriptive_statistics_by_batch_FULL.csv')
+print(f"✓ Saved: descriptive_statistics_by_batch_FULL.csv ({len(batch_accumulators)} batches)")
+
 # ============================================================================
 # SECTION 4: OUTLIER DETECTION
 # ============================================================================
@@ -236,39 +286,36 @@ print("\n" + "="*80)
 print("SECTION 4: OUTLIER DETECTION")
 print("="*80)
 
-outlier_summary = []
-for col in available_metrics[:15]:  # Top 15 metrics
-    try:
-        values = data[col].dropna()
-        # Ensure numeric type
-        values = pd.to_numeric(values, errors='coerce').dropna()
-        if len(values) > 0:
-            Q1 = values.quantile(0.25)
-            Q3 = values.quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            outliers = ((values < lower_bound) | (values > upper_bound)).sum()
-            outlier_summary.append({
-                'Metric': col,
-                'Count': len(values),
-                'Outliers': outliers,
-                'Outlier_%': (outliers/len(values)*100).round(2),
-                'Lower_Bound': lower_bound,
-                'Upper_Bound': upper_bound,
-                'Min': values.min(),
-                'Q1': Q1,
-                'Median': values.median(),
-                'Q3': Q3,
-                'Max': values.max()
-            })
-    except Exception as e:
-        print(f"  ⚠ Skipping {col}: {str(e)}")
-        continue
-
-outlier_df = pd.DataFrame(outlier_summary)
-print(f"\nOutlier Analysis (IQR Method, 1.5×IQR):")
-print(outlier_df[['Metric', 'Count', 'Outliers', 'Outlier_%', 'Min', 'Median', 'Max']].to_string(index=False))
+# IQR fences come from the accumulated quantiles; counting values outside
+# them is one vectorized comparison over all numeric columns (per chunk
+# of the written dataset in streaming mode)
+bounds = stats.outlier_bounds(factor=1.5)
+bounds = bounds[all_stats['count'] > 0]
+if STREAM:
+    outlier_counts = pd.Series(0, index=bounds.index)
+    for chunk in iter_dataset(combined_path, columns=list(bounds.index)):
+        outlier_counts = outlier_counts.add(count_outliers(chunk, bounds), fill_value=0)
+else:
+    outlier_counts = count_outliers(data, bounds)
+
+outlier_df = pd.DataFrame({
+    'Metric': bounds.index,
+    'Count': all_stats.loc[bounds.index, 'count'].astype(int).values,
+    'Outliers': outlier_counts[bounds.index].values,
+})
+outlier_df['Outlier_%'] = (outlier_df['Outliers'] / outlier_df['Count'] * 100).round(2)
+outlier_df['Lower_Bound'] = bounds['Lower_Bound'].values
+outlier_df['Upper_Bound'] = bounds['Upper_Bound'].values
+outlier_df['Min'] = all_stats.loc[bounds.index, 'min'].values
+outlier_df['Q1'] = bounds['Q1'].values
+outlier_df['Median'] = bounds['Median'].values
+outlier_df['Q3'] = bounds['Q3'].values
+outlier_df['Max'] = all_stats.loc[bounds.index, 'max'].values
+
+print(f"\nOutlier Analysis (IQR Method, 1.5×IQR) - {len(outlier_df)} numeric columns")
+print("Key metrics:")
+key_outliers = outlier_df[outlier_df['Metric'].isin(available_metrics)]
+print(key_outliers[['Metric', 'Count', 'Outliers', 'Outlier_%', 'Min', 'Median', 'Max']].round(2).to_string(index=False))
 
 # Save outlier analysis
 outlier_df.to_csv(TABLE_DIR / 'outlier_analysis_FULL.csv', index=False)
@@ -13,16 +13,23 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'agwise_eda'))
+from pipeline import (FigureJob, column_null_counts, dataset_columns, dataset_numeric_columns,
+                      has_store, load_dataset, numeric_columns, pairwise_correlation,
+                      render_figures, store_path_for, strongest_pairs, strongest_pairs_by_group,
+                      unify_columns)
+
 # Configuration
 sns.set_style("whitegrid")
 sns.set_palette("husl")
 plt.rcParams['figure.dpi'] = 300
 
-# Paths
-BASE_DIR = Path('/Users/deyus-ex-machina/agwise/agwise_eda')
+# Paths (run_full_eda.py sets BASE_DIR when running this as a stage)
+BASE_DIR = Path(globals().get('BASE_DIR', '/Users/deyus-ex-machina/agwise/agwise_eda'))
 DATA_FILE = BASE_DIR / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
 VIZ_DIR = BASE_DIR / 'outputs' / 'visualizations'
 TABLE_DIR = BASE_DIR / 'outputs' / 'tables'
@@ -31,10 +38,31 @@ print("="*80)
 print("COMPREHENSIVE VISUALIZATIONS - FULL DATASET (12,684 samples)")
 print("="*80)
 
-# Load data
+# Key metrics for visualization
+key_viz_metrics = [
+    '1:1 Soil pH', '1:1 Soluble Salt', 'Organic Matter', 'CO2-C',
+    'H3A Nitrate', 'H3A Total Phosphorus', 'H3A ICAP Potassium',
+    'H3A ICAP Calcium', 'Soil Health Calculation'
+]
+health_col = 'Soil Health Calculation'
+
+# Load data - the metric columns, the numeric columns for the full correlation
+# matrix and the columns shown in the missing-data heatmap
 print("\nLoading combined dataset...")
-data = pd.read_csv(DATA_FILE)
-print(f"✓ Loaded {len(data):,} samples with {len(data.columns)} variables")
+all_columns = dataset_columns(DATA_FILE)
+if has_store(DATA_FILE):
+    null_counts = column_null_counts(store_path_for(DATA_FILE))
+    missing_cols = null_counts[null_counts > 0].index.tolist()[:40]  # Top 40
+    data = load_dataset(DATA_FILE, columns=key_viz_metrics + [health_col] + missing_cols
+                        + dataset_numeric_columns(DATA_FILE) + ['_source_batch'])
+else:
+    data = unify_columns(load_dataset(DATA_FILE))
+    missing_cols = data.columns[data.isnull().any()].tolist()[:40]  # Top 40
+print(f"✓ Loaded {len(data):,} samples with {len(data.columns)} of {len(all_columns)} variables")
+
+# Figures are queued as independent jobs (each with only the columns it
+# plots) and rendered together in a process pool at the end
+figure_jobs = []
 
 # ============================================================================
 # SECTION 1: DISTRIBUTIONS
@@ -43,95 +71,98 @@ print("\n" + "="*80)
 print("SECTION 1: DISTRIBUTION VISUALIZATIONS")
 print("="*80)
 
-# Key metrics for visualization
-key_viz_metrics = [
-    '1:1 Soil pH', '1:1 Soluble Salt', 'Organic Matter', 'CO2-C',
-    'H3A Nitrate', 'H3A Total Phosphorus', 'H3A ICAP Potassium',
-    'H3A ICAP Calcium', 'Soil Health Calculation'
-]
-
 # Filter to available
 available_viz = [col for col in key_viz_metrics if col in data.columns
                  and data[col].notna().sum() > 100]
 
-print(f"\nGenerating distribution plots for {len(available_viz)} metrics...")
+print(f"\nQueueing distribution plots for {len(available_viz)} metrics...")
+
 
 # 1. Histograms
-fig, axes = plt.subplots(3, 3, figsize=(20, 16))
-fig.suptitle('Distribution of Key Soil Health Metrics (Full Dataset: n=12,684)',
-             fontsize=18, y=0.995, fontweight='bold')
-
-for idx, col in enumerate(available_viz[:9]):
-    row = idx // 3
-    col_idx = idx % 3
-    ax = axes[row, col_idx]
-
-    values = pd.to_numeric(data[col], errors='coerce').dropna()
-
-    if len(values) > 0:
-        ax.hist(values, bins=60, edgecolor='black', alpha=0.7, color='steelblue')
-
-        # Add statistics
-        mean_val = values.mean()
-        median_val = values.median()
-        ax.axvline(mean_val, color='red', linestyle='--', linewidth=2,
-                  label=f'Mean: {mean_val:.2f}')
-        ax.axvline(median_val, color='green', linestyle='--', linewidth=2,
-                  label=f'Median: {median_val:.2f}')
-
-        ax.set_xlabel(col, fontsize=11, fontweight='bold')
-        ax.set_ylabel('Frequency', fontsize=11)
-        ax.set_title(f'{col}\n(n={len(values):,})', fontsize=10)
-        ax.legend(fontsize=9)
-        ax.grid(True, alpha=0.3)
+def draw_distributions(data):
+    fig, axes = plt.subplots(3, 3, figsize=(20, 16))
+    fig.suptitle('Distribution of Key Soil Health Metrics (Full Dataset: n=12,684)',
+                 fontsize=18, y=0.995, fontweight='bold')
+
+    for idx, col in enumerate(data.columns):
+        row = idx // 3
+        col_idx = idx % 3
+        ax = axes[row, col_idx]
+
+        values = data[col].dropna()
+
+        if len(values) > 0:
+            ax.hist(values, bins=60, edgecolor='black', alpha=0.7, color='steelblue')
+
+            # Add statistics
+            mean_val = values.mean()
+            median_val = values.median()
+            ax.axvline(mean_val, color='red', linestyle='--', linewidth=2,
+                      label=f'Mean: {mean_val:.2f}')
+            ax.axvline(median_val, color='green', linestyle='--', linewidth=2,
+                      label=f'Median: {median_val:.2f}')
+
+            ax.set_xlabel(col, fontsize=11, fontweight='bold')
+            ax.set_ylabel('Frequency', fontsize=11)
+            ax.set_title(f'{col}\n(n={len(values):,})', fontsize=10)
+            ax.legend(fontsize=9)
+            ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+
+figure_jobs.append(FigureJob('distributions', draw_distributions,
+                             VIZ_DIR / 'distributions_FULL.png', columns=available_viz[:9]))
 
-plt.tight_layout()
-plt.savefig(VIZ_DIR / 'distributions_FULL.png', dpi=300, bbox_inches='tight')
-print("✓ Saved: distributions_FULL.png")
-plt.close()
 
 # 2. Box plots
-fig, axes = plt.subplots(3, 3, figsize=(20, 16))
-fig.suptitle('Box Plots - Outlier Detection (Full Dataset: n=12,684)',
-             fontsize=18, y=0.995, fontweight='bold')
-
-for idx, col in enumerate(available_viz[:9]):
-    row = idx // 3
-    col_idx = idx % 3
-    ax = axes[row, col_idx]
-
-    values = pd.to_numeric(data[col], errors='coerce').dropna()
-
-    if len(values) > 0:
-        bp = ax.boxplot(values, vert=True, patch_artist=True,
-                       boxprops=dict(facecolor='lightblue', alpha=0.7),
-                       medianprops=dict(color='red', linewidth=2))
-        ax.set_ylabel(col, fontsize=11, fontweight='bold')
-        ax.set_title(f'{col}\n(n={len(values):,})', fontsize=10)
-        ax.grid(True, alpha=0.3, axis='y')
-
-plt.tight_layout()
-plt.savefig(VIZ_DIR / 'boxplots_FULL.png', dpi=300, bbox_inches='tight')
-print("✓ Saved: boxplots_FULL.png")
-plt.close()
+def draw_boxplots(data):
+    fig, axes = plt.subplots(3, 3, figsize=(20, 16))
+    fig.suptitle('Box Plots - Outlier Detection (Full Dataset: n=12,684)',
+                 fontsize=18, y=0.995, fontweight='bold')
+
+    for idx, col in enumerate(data.columns):
+        row = idx // 3
+        col_idx = idx % 3
+        ax = axes[row, col_idx]
+
+        values = data[col].dropna()
+
+        if len(values) > 0:
+            bp = ax.boxplot(values, vert=True, patch_artist=True,
+                           boxprops=dict(facecolor='lightblue', alpha=0.7),
+                           medianprops=dict(color='red', linewidth=2))
+            ax.set_ylabel(col, fontsize=11, fontweight='bold')
+            ax.set_title(f'{col}\n(n={len(values):,})', fontsize=10)
+            ax.grid(True, alpha=0.3, axis='y')
+
+    plt.tight_layout()
+    return fig
+
+
+figure_jobs.append(FigureJob('boxplots', draw_boxplots,
+                             VIZ_DIR / 'boxplots_FULL.png', columns=available_viz[:9]))
+
 
 # 3. Missing data heatmap
-print("\nGenerating missing data pattern...")
-missing_cols = data.columns[data.isnull().any()].tolist()[:40]  # Top 40
-missing_matrix = data[missing_cols].isnull().astype(int)
-
-fig, ax = plt.subplots(figsize=(16, 12))
-sns.heatmap(missing_matrix.iloc[:500], cmap='RdYlGn_r', cbar_kws={'label': 'Missing'},
-            yticklabels=False, ax=ax)
-ax.set_title('Missing Values Pattern (First 500 Samples, Top 40 Variables)',
-            fontsize=14, fontweight='bold')
-ax.set_xlabel('Variables', fontsize=12)
-ax.set_ylabel('Samples (n=12,684)', fontsize=12)
-plt.xticks(rotation=90, ha='right', fontsize=8)
-plt.tight_layout()
-plt.savefig(VIZ_DIR / 'missing_pattern_FULL.png', dpi=300, bbox_inches='tight')
-print("✓ Saved: missing_pattern_FULL.png")
-plt.close()
+def draw_missing_pattern(data):
+    missing_matrix = data.iloc[:500].isnull().astype(int)
+
+    fig, ax = plt.subplots(figsize=(16, 12))
+    sns.heatmap(missing_matrix, cmap='RdYlGn_r', cbar_kws={'label': 'Missing'},
+                yticklabels=False, ax=ax)
+    ax.set_title('Missing Values Pattern (First 500 Samples, Top 40 Variables)',
+                fontsize=14, fontweight='bold')
+    ax.set_xlabel('Variables', fontsize=12)
+    ax.set_ylabel('Samples (n=12,684)', fontsize=12)
+    plt.xticks(rotation=90, ha='right', fontsize=8)
+    plt.tight_layout()
+    return fig
+
+
+figure_jobs.append(FigureJob('missing_pattern', draw_missing_pattern,
+                             VIZ_DIR / 'missing_pattern_FULL.png', columns=missing_cols))
 
 # ============================================================================
 # SECTION 2: CORRELATIONS
@@ -146,61 +177,75 @@ for col in available_viz:
     if data[col].notna().sum() > 1000:
         corr_metrics.append(col)
 
-print(f"\nAnalyzing correlations for {len(corr_metrics)} metrics...")
+# Pairwise-complete Pearson and Spearman over every numeric column, with the
+# number of rows behind each pair
+numeric_cols = numeric_columns(data)
+print(f"\nComputing pairwise-complete correlations for all {len(numeric_cols)} numeric columns...")
+corr_all, pair_n = pairwise_correlation(data, numeric_cols)
+spearman_all, _ = pairwise_correlation(data, numeric_cols, method='spearman')
+
+corr_all.to_csv(TABLE_DIR / 'correlation_matrix_all_numeric_FULL.csv')
+spearman_all.to_csv(TABLE_DIR / 'spearman_matrix_all_numeric_FULL.csv')
+pair_n.to_csv(TABLE_DIR / 'correlation_pair_counts_FULL.csv')
+print("✓ Saved: correlation_matrix_all_numeric_FULL.csv, spearman_matrix_all_numeric_FULL.csv, "
+      "correlation_pair_counts_FULL.csv")
 
-# Compute correlation matrix
-corr_data = data[corr_metrics].apply(pd.to_numeric, errors='coerce')
-corr_matrix = corr_data.corr()
+print(f"\nKey metric heatmap: {len(corr_metrics)} metrics")
+corr_matrix = corr_all.loc[corr_metrics, corr_metrics]
 
 # Save correlation matrix
 corr_matrix.to_csv(TABLE_DIR / 'correlation_matrix_FULL.csv')
 print("✓ Saved: correlation_matrix_FULL.csv")
 
-# 4. Correlation heatmap
-fig, ax = plt.subplots(figsize=(14, 12))
-sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0,
-            square=True, linewidths=0.5, cbar_kws={"shrink": 0.8},
-            vmin=-1, vmax=1, ax=ax, annot_kws={'size': 8})
-ax.set_title('Correlation Matrix - Key Soil Metrics (Full Dataset)',
-            fontsize=14, fontweight='bold')
-plt.xticks(rotation=45, ha='right', fontsize=9)
-plt.yticks(rotation=0, fontsize=9)
-plt.tight_layout()
-plt.savefig(VIZ_DIR / 'correlation_heatmap_FULL.png', dpi=300, bbox_inches='tight')
-print("✓ Saved: correlation_heatmap_FULL.png")
-plt.close()
-
-# Find strong correlations
-mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-corr_pairs = corr_matrix.where(~mask).stack().sort_values(ascending=False)
-strong_corr = corr_pairs[(abs(corr_pairs) > 0.5) & (abs(corr_pairs) < 1.0)]
-
-print(f"\nFound {len(strong_corr)} strong correlations (|r| > 0.5)")
+
+# 4. Correlation heatmap (drawn from the matrix, so it needs no data columns)
+def draw_correlation_heatmap(data, corr_matrix):
+    fig, ax = plt.subplots(figsize=(14, 12))
+    sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0,
+                square=True, linewidths=0.5, cbar_kws={"shrink": 0.8},
+                vmin=-1, vmax=1, ax=ax, annot_kws={'size': 8})
+    ax.set_title('Correlation Matrix - Key Soil Metrics (Full Dataset)',
+                fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, ha='right', fontsize=9)
+    plt.yticks(rotation=0, fontsize=9)
+    plt.tight_layout()
+    return fig
+
+
+figure_jobs.append(FigureJob('correlation_heatmap', draw_correlation_heatmap,
+                             VIZ_DIR / 'correlation_heatmap_FULL.png',
+                             params={'corr_matrix': corr_matrix}))
+
+# Find the strongest correlations across every numeric column, ignoring
+# pairs with too few shared rows (bounded heap over the upper triangle)
+MIN_PAIR_N = 100
+TOP_K_PAIRS = 100
+strong_corr_df = strongest_pairs(corr_all, pair_n, k=TOP_K_PAIRS, threshold=0.5, min_n=MIN_PAIR_N)
+strong_corr = strong_corr_df.set_index(['Variable_1', 'Variable_2'])['Correlation']
+
+print(f"\nFound {len(strong_corr)} strong correlations (|r| > 0.5, n >= {MIN_PAIR_N}, top {TOP_K_PAIRS})")
 print("\nTop 10 strongest correlations:")
 for idx, ((v1, v2), r) in enumerate(strong_corr.head(10).items(), 1):
     print(f"  {idx:2d}. {v1[:35]:35s} <-> {v2[:35]:35s}: {r:6.3f}")
 
 # Save strong correlations
-strong_corr_df = pd.DataFrame({
-    'Variable_1': [pair[0] for pair in strong_corr.index],
-    'Variable_2': [pair[1] for pair in strong_corr.index],
-    'Correlation': strong_corr.values
-})
+strong_corr_df.insert(3, 'Spearman', [spearman_all.loc[pair] for pair in strong_corr.index])
 strong_corr_df.to_csv(TABLE_DIR / 'strong_correlations_FULL.csv', index=False)
 print("\n✓ Saved: strong_correlations_FULL.csv")
 
+
 # 5. Scatter plots for top correlations
-if len(strong_corr) >= 6:
+def draw_scatter_correlations(data, pairs):
     fig, axes = plt.subplots(2, 3, figsize=(18, 12))
     fig.suptitle('Top 6 Strongest Correlations (Full Dataset)',
                 fontsize=16, fontweight='bold')
 
-    for idx, ((var1, var2), corr_val) in enumerate(strong_corr.head(6).items()):
+    for idx, ((var1, var2), corr_val) in enumerate(pairs.items()):
         row = idx // 3
         col = idx % 3
         ax = axes[row, col]
 
-        plot_data = data[[var1, var2]].apply(pd.to_numeric, errors='coerce').dropna()
+        plot_data = data[[var1, var2]].dropna()
 
         if len(plot_data) > 0:
             # Sample if too many points
@@ -221,9 +266,22 @@ if len(strong_corr) >= 6:
                 ax.plot(x_line, p(x_line), "r--", alpha=0.8, linewidth=2)
 
     plt.tight_layout()
-    plt.savefig(VIZ_DIR / 'scatter_correlations_FULL.png', dpi=300, bbox_inches='tight')
-    print("✓ Saved: scatter_correlations_FULL.png")
-    plt.close()
+    return fig
+
+
+if len(strong_corr) >= 6:
+    top_pairs = strong_corr.head(6)
+    figure_jobs.append(FigureJob('scatter_correlations', draw_scatter_correlations,
+                                 VIZ_DIR / 'scatter_correlations_FULL.png',
+                                 columns=[var for pair in top_pairs.index for var in pair],
+                                 params={'pairs': top_pairs}))
+
+# Strongest correlations within each lab batch
+batch_corr_df = strongest_pairs_by_group(data, '_source_batch', numeric_cols, k=20,
+                                         threshold=0.5, min_n=MIN_PAIR_N)
+batch_corr_df.to_csv(TABLE_DIR / 'strong_correlations_by_batch_FULL.csv', index=False)
+print(f"✓ Saved: strong_correlations_by_batch_FULL.csv "
+      f"({batch_corr_df['_source_batch'].nunique()} batches)")
 
 # ============================================================================
 # SECTION 3: SOIL HEALTH ANALYSIS
@@ -232,18 +290,19 @@ print("\n" + "="*80)
 print("SECTION 3: SOIL HEALTH SCORE ANALYSIS")
 print("="*80)
 
-health_col = 'Soil Health Calculation' if 'Soil Health Calculation' in data.columns else 'Soil Health Score'
-
 if health_col in data.columns:
-    health_data = pd.to_numeric(data[health_col], errors='coerce').dropna()
+    health_data = data[health_col].dropna()
     print(f"\n{health_col} Statistics (n={len(health_data):,}):")
     print(f"  Mean: {health_data.mean():.2f}")
     print(f"  Median: {health_data.median():.2f}")
     print(f"  Std: {health_data.std():.2f}")
     print(f"  Range: {health_data.min():.2f} - {health_data.max():.2f}")
 
-    # Get correlations with health
-    health_correlations = corr_data.corrwith(corr_data[health_col]).sort_values(ascending=False)
+    # Get correlations with health across every numeric column
+    health_correlations = (corr_all[health_col]
+                           .where(pair_n[health_col] >= MIN_PAIR_N)
+                           .dropna()
+                           .sort_values(ascending=False))
 
     print(f"\nTop factors correlated with {health_col}:")
     for var, corr in health_correlations.items():
@@ -253,58 +312,79 @@ if health_col in data.columns:
     # Save
     health_corr_df = pd.DataFrame({
         'Variable': health_correlations.index,
-        'Correlation': health_correlations.values
+        'Correlation': health_correlations.values,
+        'N': pair_n.loc[health_correlations.index, health_col].values
     })
     health_corr_df.to_csv(TABLE_DIR / 'soil_health_correlations_FULL.csv', index=False)
     print("\n✓ Saved: soil_health_correlations_FULL.csv")
 
     # 6. Soil health distribution
-    fig, ax = plt.subplots(figsize=(12, 8))
-    ax.hist(health_data, bins=60, edgecolor='black', alpha=0.7, color='forestgreen')
-    ax.axvline(health_data.median(), color='red', linestyle='--', linewidth=2,
-              label=f'Median: {health_data.median():.2f}')
-    ax.axvline(health_data.mean(), color='blue', linestyle='--', linewidth=2,
-              label=f'Mean: {health_data.mean():.2f}')
-    ax.set_xlabel(health_col, fontsize=12, fontweight='bold')
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title(f'Distribution of {health_col} (n={len(health_data):,})',
-                fontsize=14, fontweight='bold')
-    ax.legend(fontsize=11)
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(VIZ_DIR / 'soil_health_distribution_FULL.png', dpi=300, bbox_inches='tight')
-    print("✓ Saved: soil_health_distribution_FULL.png")
-    plt.close()
+    def draw_health_distribution(data):
+        health_data = data[health_col].dropna()
+        fig, ax = plt.subplots(figsize=(12, 8))
+        ax.hist(health_data, bins=60, edgecolor='black', alpha=0.7, color='forestgreen')
+        ax.axvline(health_data.median(), color='red', linestyle='--', linewidth=2,
+                  label=f'Median: {health_data.median():.2f}')
+        ax.axvline(health_data.mean(), color='blue', linestyle='--', linewidth=2,
+                  label=f'Mean: {health_data.mean():.2f}')
+        ax.set_xlabel(health_col, fontsize=12, fontweight='bold')
+        ax.set_ylabel('Frequency', fontsize=12)
+        ax.set_title(f'Distribution of {health_col} (n={len(health_data):,})',
+                    fontsize=14, fontweight='bold')
+        ax.legend(fontsize=11)
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        return fig
+
+    figure_jobs.append(FigureJob('soil_health_distribution', draw_health_distribution,
+                                 VIZ_DIR / 'soil_health_distribution_FULL.png', columns=[health_col]))
 
     # 7. Soil health factors scatter
     top_factors = health_correlations[health_correlations.index != health_col].head(8)
 
-    fig, axes = plt.subplots(2, 4, figsize=(20, 10))
-    fig.suptitle(f'Top 8 Factors Correlated with {health_col} (Full Dataset)',
-                fontsize=16, fontweight='bold')
+    def draw_health_factors(data, factors):
+        fig, axes = plt.subplots(2, 4, figsize=(20, 10))
+        fig.suptitle(f'Top 8 Factors Correlated with {health_col} (Full Dataset)',
+                    fontsize=16, fontweight='bold')
 
-    for idx, (var, corr) in enumerate(top_factors.items()):
-        row = idx // 4
-        col = idx % 4
-        ax = axes[row, col]
+        for idx, (var, corr) in enumerate(factors.items()):
+            row = idx // 4
+            col = idx % 4
+            ax = axes[row, col]
 
-        plot_data = data[[health_col, var]].apply(pd.to_numeric, errors='coerce').dropna()
+            plot_data = data[[health_col, var]].dropna()
 
-        if len(plot_data) > 0:
-            # Sample if needed
-            if len(plot_data) > 1500:
-                plot_data = plot_data.sample(1500, random_state=42)
-
-            ax.scatter(plot_data[var], plot_data[health_col], alpha=0.4, s=15)
-            ax.set_xlabel(var, fontsize=9)
-            ax.set_ylabel(health_col, fontsize=9)
-            ax.set_title(f'r = {corr:.3f}', fontsize=10)
-            ax.grid(True, alpha=0.3)
+            if len(plot_data) > 0:
+                # Sample if needed
+                if len(plot_data) > 1500:
+                    plot_data = plot_data.sample(1500, random_state=42)
 
-    plt.tight_layout()
-    plt.savefig(VIZ_DIR / 'soil_health_factors_FULL.png', dpi=300, bbox_inches='tight')
-    print("✓ Saved: soil_health_factors_FULL.png")
-    plt.close()
+                ax.scatter(plot_data[var], plot_data[health_col], alpha=0.4, s=15)
+                ax.set_xlabel(var, fontsize=9)
+                ax.set_ylabel(health_col, fontsize=9)
+                ax.set_title(f'r = {corr:.3f}', fontsize=10)
+                ax.grid(True, alpha=0.3)
+
+        plt.tight_layout()
+        return fig
+
+    figure_jobs.append(FigureJob('soil_health_factors', draw_health_factors,
+                                 VIZ_DIR / 'soil_health_factors_FULL.png',
+                                 columns=[health_col] + top_factors.index.tolist(),
+                                 params={'factors': top_factors}))
+
+# ============================================================================
+# SECTION 4: RENDERING
+# ============================================================================
+print("\n" + "="*80)
+print(f"SECTION 4: RENDERING {len(figure_jobs)} FIGURES")
+print("="*80 + "\n")
+
+render_log = render_figures(data, figure_jobs)
+render_log.to_csv(TABLE_DIR / 'figure_render_log_visualizations_FULL.csv', index=False)
+print(f"\n✓ Rendered {(render_log['status'] == 'ok').sum()} of {len(render_log)} figures "
+      f"({render_log['seconds'].sum():.1f}s of rendering)")
+print("✓ Saved: figure_render_log_visualizations_FULL.csv")
 
 print("\n" + "="*80)
 print("VISUALIZATION GENERATION COMPLETE")
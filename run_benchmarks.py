@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK SUITE - INGESTION, STATISTICS, CORRELATION AND DASHBOARD COMPUTE
+Times the key stages of the EDA pipeline and records their peak memory:
+
+1. ingest       - full_eda_pipeline.py end to end, cold (empty processed/)
+                  and warm (nothing changed)
+2. stats        - descriptive statistics and IQR outlier counts
+3. correlation  - Pearson matrix over all numeric columns
+4. categorical  - cover crop / crop group-bys of the categorical stage
+5. dashboard    - the compute behind every dashboard page (data load,
+                  cube, ZIP geocoding, correlations, percentiles and the
+                  economic page), run headless without Streamlit
+
+Datasets are the in-repo OneDrive_1_10-5-2025 sample ('sample'), the
+sample scaled N times ('xN', the sample's files copied into N batches) and
+synthetic exports N times its size ('synN', new rows drawn from a
+SyntheticLabData model of the sample).
+Each case runs in its own forked process, so peak RSS is the case's own.
+Results are appended to outputs/benchmarks/benchmark_results.csv with the
+commit they were measured at, and each run is printed next to the
+previous run of the same dataset and case.
+
+Usage:
+    python run_benchmarks.py [--datasets sample x10] [--cases ingest_cold stats ...]
+                             [--repeat N] [--work-dir DIR] [--output FILE]
+
+Author: Claude Code
+Date: October 6, 2025
+"""
+
+import argparse
+import contextlib
+import io
+import platform
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT_DIR / 'agwise_eda'))
+from pipeline import (DEFAULT_PARAMETERS, SCENARIO_FIELD_SIZES, SCENARIO_N_PRICES, SyntheticLabData, build_cube,
+                      count_outliers, cover_crop_summary, default_correlation_pair,
+                      discover_csv_files, geocode_zip_counts, health_factor_correlations, load_dataset,
+                      load_n_columns, load_or_build_cube, load_sketches, load_zip_geocoder, n_comparison,
+                      n_difference_summary, numeric_columns, pair_correlation, pairwise_correlation, roi_simulation,
+                      savings_summary, scenario_grid_bytes, scenario_matrix, sensitivity_curve,
+                      simulation_bounds, simulation_distributions, summarize, unify_columns,
+                      valid_numeric_columns, variable_summary)
+from pipeline.ingest import pool_context
+
+SAMPLE_DIR = ROOT_DIR / 'data' / 'OneDrive_1_10-5-2025'
+DEFAULT_WORK_DIR = ROOT_DIR / 'agwise_eda' / 'outputs' / 'benchmarks' / 'work'
+DEFAULT_OUTPUT = ROOT_DIR / 'agwise_eda' / 'outputs' / 'benchmarks' / 'benchmark_results.csv'
+RESULT_COLUMNS = ['run', 'commit', 'dataset', 'rows', 'files', 'case', 'group', 'repeat', 'seconds',
+                  'min_seconds', 'setup_seconds', 'setup_rss_mb', 'peak_rss_mb', 'python', 'pandas', 'error']
+
+HEALTH_COL = 'Soil Health Calculation'
+COVER_COL = 'Cover Crop Mix'
+CROP_COLS = ['Crop 1', 'Crop 2', 'Crop 3', 'Past Crop']
+
+
+# ============================================================================
+# DATASETS
+# ============================================================================
+
+def prepare_dataset(work_dir, name):
+    """
+    Base directory (data/ plus agwise_eda/) for a dataset name: 'sample',
+    'xN' or 'synN'. Raw files of 'xN' are symlinked, so they cost no disk;
+    'synN' files are generated once and kept.
+    """
+    base_dir = work_dir / name
+    data_dir = base_dir / 'data'
+    if data_dir.exists():
+        return base_dir
+
+    if name.startswith('syn'):
+        model = SyntheticLabData.fit(SAMPLE_DIR)
+        model.write(data_dir, rows=int(name[3:]) * model.source_rows)
+        return base_dir
+
+    copies = 1 if name == 'sample' else int(name.lstrip('x'))
+    sample_files = sorted(SAMPLE_DIR.glob('*.csv'))
+    for copy in range(copies):
+        batch_dir = data_dir / (SAMPLE_DIR.name if copy == 0 else f'{SAMPLE_DIR.name}_copy{copy}')
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        for path in sample_files:
+            (batch_dir / path.name).symlink_to(path)
+    return base_dir
+
+
+def combined_path_for(base_dir):
+    return base_dir / 'agwise_eda' / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
+
+
+def run_ingest(base_dir, **params):
+    """full_eda_pipeline.py with its console output discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        runpy.run_path(str(ROOT_DIR / 'full_eda_pipeline.py'),
+                       init_globals={'BASE_DIR': base_dir, **params}, run_name='__main__')
+
+
+# ============================================================================
+# CASES
+# ============================================================================
+# Each case is (group, setup, run): setup(base_dir) builds the inputs and is
+# timed separately; run(state) is the measured compute.
+
+def _load(base_dir):
+    return load_dataset(combined_path_for(base_dir))
+
+
+def _load_dashboard(base_dir):
+    """What the dashboard holds after its cached loaders ran."""
+    csv_path = combined_path_for(base_dir)
+    data = unify_columns(load_dataset(csv_path))
+    return {'csv_path': csv_path, 'data': data, 'cube': load_or_build_cube(csv_path, data=data),
+            'sketches': load_sketches(csv_path), 'geocoder': load_zip_geocoder()}
+
+
+def _load_economic(base_dir):
+    """What the Economic Analysis page loads: the two N columns, resolved through the schema registry."""
+    csv_path = combined_path_for(base_dir)
+    return {'csv_path': csv_path, 'data': load_n_columns(csv_path)}
+
+
+def _cold_ingest_setup(base_dir):
+    shutil.rmtree(base_dir / 'agwise_eda' / 'data' / 'processed', ignore_errors=True)
+    return base_dir
+
+
+def case_stats(data):
+    stats = summarize(data)
+    summary = stats.summary()
+    bounds = stats.outlier_bounds(factor=1.5)[summary['count'] > 0]
+    return count_outliers(data, bounds)
+
+
+def case_correlation(data):
+    return pairwise_correlation(data, numeric_columns(data))
+
+
+def case_categorical(data):
+    tables = [data[col].value_counts() for col in [COVER_COL, *CROP_COLS] if col in data.columns]
+    if COVER_COL in data.columns and HEALTH_COL in data.columns:
+        cover_health = data[[COVER_COL, HEALTH_COL]].dropna()
+        tables.append(cover_health.groupby(COVER_COL, observed=True)[HEALTH_COL]
+                      .agg(['count', 'mean', 'median', 'std', 'min', 'max']))
+    return tables
+
+
+def page_overview(state):
+    """Overview page: cube tables plus one geocoder join over the ZIP counts."""
+    cube = load_or_build_cube(state['csv_path'], data=state['data'])
+    if state['geocoder'] is not None and len(cube['zip_counts']):
+        geocode_zip_counts(cube['zip_counts'], state['geocoder'])
+    return cube
+
+
+def page_soil_health(state):
+    """Soil health page: factor correlations against the health score."""
+    return health_factor_correlations(state['data'])
+
+
+def page_cover_crop(state):
+    """Cover crop page: counts and health summaries from the cube."""
+    cube = load_or_build_cube(state['csv_path'], data=state['data'])
+    if len(cube['cover_health']) == 0:
+        return cube['cover_counts'], None
+    return cube['cover_counts'], cover_crop_summary(cube['cover_health'])
+
+
+def page_economic_summary(state):
+    """Economic page of the main dashboard: Traditional vs Haney savings at the default $1/lb."""
+    comparison = n_comparison(state['data'])
+    return None if comparison is None else savings_summary(comparison, 1.0)
+
+
+def page_correlation_explorer(state):
+    """Correlation explorer: valid columns, then the default pair's r and regression line."""
+    data = state['data']
+    valid = valid_numeric_columns(data)
+    var1, var2 = default_correlation_pair(valid)
+    return pair_correlation(data, valid[var1], valid[var2])
+
+
+def page_custom_analysis(state):
+    """Custom analysis: valid columns, then the summary and percentiles of each."""
+    data = state['data']
+    sketches = state['sketches'] or {}
+    return {col: variable_summary(data[col], sketches.get(col)) for col in valid_numeric_columns(data)}
+
+
+def page_economic_analysis(state):
+    """Economic Analysis page at its defaults: N summary, sensitivity, scenarios, Monte Carlo, export."""
+    summary = n_difference_summary(state['data'])
+    params = dict(DEFAULT_PARAMETERS)
+    sensitivity = sensitivity_curve(summary['difference_mean'], params, 'nitrogen_price')
+    scenarios = scenario_matrix(summary['difference_mean'], params)
+    simulation = roi_simulation(summary['differences'],
+                                simulation_distributions(params, simulation_bounds(params)))
+    grid = {'n_difference': [round(summary['difference_mean'], 1)], 'nitrogen_price': SCENARIO_N_PRICES,
+            'acres_per_field': SCENARIO_FIELD_SIZES}
+    export = scenario_grid_bytes(grid, fixed=params)
+    return sensitivity, scenarios, simulation, export
+
+
+CASES = {
+    'ingest_cold': ('ingest', _cold_ingest_setup, run_ingest),
+    'ingest_warm': ('ingest', lambda base_dir: base_dir, run_ingest),
+    'load': ('ingest', lambda base_dir: base_dir, _load),
+    'stats': ('stats', _load, case_stats),
+    'correlation': ('correlation', _load, case_correlation),
+    'categorical': ('categorical', _load, case_categorical),
+    'cube_build': ('dashboard', lambda base_dir: unify_columns(_load(base_dir)), build_cube),
+    'dashboard_load': ('dashboard', lambda base_dir: base_dir, _load_dashboard),
+    'page_overview': ('dashboard', _load_dashboard, page_overview),
+    'page_soil_health': ('dashboard', _load_dashboard, page_soil_health),
+    'page_cover_crop': ('dashboard', _load_dashboard, page_cover_crop),
+    'page_economic_summary': ('dashboard', _load_dashboard, page_economic_summary),
+    'page_correlation_explorer': ('dashboard', _load_dashboard, page_correlation_explorer),
+    'page_custom_analysis': ('dashboard', _load_dashboard, page_custom_analysis),
+    'economic_load': ('dashboard', lambda base_dir: base_dir, _load_economic),
+    'page_economic_analysis': ('dashboard', _load_economic, page_economic_analysis),
+}
+
+
+# ============================================================================
+# HARNESS
+# ============================================================================
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(name, base_dir, repeat, connection):
+    """Child process: set up, run the case repeat times, send back the measurements."""
+    _, setup, run = CASES[name]
+    result = {'error': None}
+    try:
+        start = time.perf_counter()
+        state = setup(base_dir)
+        result['setup_seconds'] = time.perf_counter() - start
+        result['setup_rss_mb'] = _peak_rss_mb()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - start)
+        result['seconds'] = float(np.median(timings))
+        result['min_seconds'] = min(timings)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['peak_rss_mb'] = _peak_rss_mb()
+    connection.send(result)
+    connection.close()
+
+
+def measure(name, base_dir, repeat):
+    """Run one case in a forked process and return its measurements."""
+    context = pool_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(name, base_dir, repeat, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {'error': f'process exited with code {process.exitcode}'}
+    process.join()
+    return result
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def dataset_size(base_dir):
+    """(rows, raw files) of a dataset; rows from the combined data once it exists."""
+    csv_files, _ = discover_csv_files(base_dir / 'data')
+    store = combined_path_for(base_dir)
+    rows = len(load_dataset(store, columns=['_source_batch'])) if store.exists() else np.nan
+    return rows, len(csv_files)
+
+
+def compare(results, previous):
+    """Current results next to the latest earlier run of each dataset and case."""
+    table = results[['dataset', 'case', 'seconds', 'peak_rss_mb']].copy()
+    if previous is not None and len(previous):
+        last = (previous.dropna(subset=['seconds'])
+                .drop_duplicates(['dataset', 'case'], keep='last')
+                .set_index(['dataset', 'case']))
+        keys = pd.MultiIndex.from_frame(table[['dataset', 'case']])
+        table['previous_seconds'] = last['seconds'].reindex(keys).to_numpy()
+        table['change_%'] = ((table['seconds'] / table['previous_seconds'] - 1) * 100).round(1)
+        table['previous_rss_mb'] = last['peak_rss_mb'].reindex(keys).to_numpy()
+    return table
+
+
+def main():
+    """Run the benchmark cases over the requested datasets."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--datasets', nargs='+', default=['sample'],
+                        help="datasets to run: 'sample', 'xN' (sample scaled N times) and/or "
+                             "'synN' (synthetic data N times the sample)")
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES), metavar='CASE',
+                        help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (median is recorded)')
+    parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                        help='where benchmark datasets and their outputs are built')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='results file to append to')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("BENCHMARK SUITE")
+    print("="*80)
+    run_id = time.strftime('%Y-%m-%d %H:%M:%S')
+    commit = current_commit()
+    print(f"Run: {run_id} | commit {commit or 'unknown'} | Python {platform.python_version()} | "
+          f"pandas {pd.__version__}")
+
+    previous = pd.read_csv(args.output) if args.output.exists() else None
+    records = []
+    for dataset in args.datasets:
+        base_dir = prepare_dataset(args.work_dir, dataset)
+        # Every case but the cold ingest reads an ingested dataset
+        if not combined_path_for(base_dir).exists():
+            print(f"\nIngesting {dataset} once for the read-only cases...")
+            error = measure('ingest_warm', base_dir, 1)['error']
+            if error:
+                print(f"✗ Ingest failed: {error}")
+                return 1
+        rows, files = dataset_size(base_dir)
+        print(f"\n{dataset}: {rows:,} rows from {files:,} files")
+
+        for name in args.cases:
+            result = measure(name, base_dir, 1 if name == 'ingest_cold' else args.repeat)
+            records.append({
+                'run': run_id, 'commit': commit, 'dataset': dataset, 'rows': rows, 'files': files,
+                'case': name, 'group': CASES[name][0], 'repeat': args.repeat,
+                'python': platform.python_version(), 'pandas': pd.__version__, **result,
+            })
+            if result['error']:
+                print(f"  ✗ {name:<28} {result['error']}")
+            else:
+                print(f"  ✓ {name:<28} {result['seconds']:9.3f}s  peak {result['peak_rss_mb']:8.1f} MB")
+
+    results = pd.DataFrame(records).reindex(columns=RESULT_COLUMNS)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.output, mode='a', header=not args.output.exists(), index=False)
+
+    print(f"\n{'='*80}")
+    print("RESULTS VS PREVIOUS RUN")
+    print(f"{'='*80}")
+    print(compare(results, previous).round(3).to_string(index=False))
+    print(f"\n✓ Results appended to: {args.output}")
+    return 1 if results['error'].notna().any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
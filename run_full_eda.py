@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+FULL DATASET EDA - CACHED STAGE PIPELINE
+Runs the full-dataset scripts as stages of one pipeline:
+
+1. ingest         - full_eda_pipeline.py: incremental load, quality and statistics tables
+2. visualizations - full_eda_visualizations.py: distributions, correlations, heatmaps
+3. categorical    - full_eda_categorical_advanced.py: crop, cover crop and N-P-K analysis
+
+Each stage is keyed by the content of the files it reads (raw CSVs for
+ingest, the combined dataset for the others), its script and the shared
+pipeline code. A stage whose key matches the cache in
+agwise_eda/.stage_cache is skipped and any missing outputs are restored,
+so a rerun with unchanged data finishes in seconds instead of re-rendering
+every table and 300-dpi figure.
+
+Usage:
+    python run_full_eda.py [--workers N] [--base-dir DIR] [--dedup | --stream] [--no-cache]
+
+Author: Claude Code
+Date: October 6, 2025
+"""
+
+import argparse
+import runpy
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT_DIR / 'agwise_eda'))
+from pipeline import (Stage, StageCache, code_version, cube_path_for, dtype_map_path_for, dtype_profile_path_for,
+                      provenance_path_for, row_index_path_for, run_pipeline, score_path_for, sketch_path_for,
+                      store_path_for)
+from pipeline.manifest import MANIFEST_NAME
+
+PIPELINE_DIR = ROOT_DIR / 'agwise_eda' / 'pipeline'
+DEFAULT_BASE_DIR = Path('/Users/deyus-ex-machina/agwise')
+
+
+def script_stage(name, script_name, base_dir, files=(), sources=(), params=None):
+    """Stage that runs one of the full-dataset scripts with BASE_DIR (and params) set."""
+    script_path = ROOT_DIR / script_name
+
+    def run(**params):
+        runpy.run_path(str(script_path), init_globals={'BASE_DIR': base_dir, **params},
+                       run_name='__main__')
+        return {}
+
+    return Stage(name, run, files=files, sources=sources, params=params,
+                 version=code_version(script_path, PIPELINE_DIR))
+
+
+def build_stages(base_dir, dedup=False, stream=False):
+    """Declare the full-dataset stages, the files they read and the files they write."""
+    eda_dir = base_dir / 'agwise_eda'
+    tables = eda_dir / 'outputs' / 'tables'
+    viz = eda_dir / 'outputs' / 'visualizations'
+    combined_path = eda_dir / 'data' / 'processed' / 'combined_soil_data_FULL.csv'
+    dataset_files = [combined_path, dtype_map_path_for(combined_path), store_path_for(combined_path),
+                     provenance_path_for(combined_path)]
+
+    return [
+        script_stage('ingest', 'full_eda_pipeline.py', base_dir, sources=[base_dir / 'data'],
+                     params={'DEDUP': dedup, 'STREAM': stream}, files=[
+            *dataset_files, row_index_path_for(combined_path), sketch_path_for(combined_path),
+            score_path_for(combined_path), cube_path_for(combined_path),
+            dtype_profile_path_for(combined_path), combined_path.parent / MANIFEST_NAME,
+            tables / 'ingest_log_FULL.csv', tables / 'missing_values_report_FULL.csv',
+            tables / 'descriptive_statistics_FULL.csv',
+            tables / 'descriptive_statistics_all_numeric_FULL.csv',
+            tables / 'descriptive_statistics_by_batch_FULL.csv', tables / 'outlier_analysis_FULL.csv'
+        ]),
+        script_stage('visualizations', 'full_eda_visualizations.py', eda_dir, sources=dataset_files, files=[
+            viz / 'distributions_FULL.png', viz / 'boxplots_FULL.png', viz / 'missing_pattern_FULL.png',
+            tables / 'correlation_matrix_all_numeric_FULL.csv',
+            tables / 'spearman_matrix_all_numeric_FULL.csv', tables / 'correlation_pair_counts_FULL.csv',
+            tables / 'correlation_matrix_FULL.csv', viz / 'correlation_heatmap_FULL.png',
+            tables / 'strong_correlations_FULL.csv', viz / 'scatter_correlations_FULL.png',
+            tables / 'strong_correlations_by_batch_FULL.csv', tables / 'soil_health_correlations_FULL.csv',
+            viz / 'soil_health_distribution_FULL.png', viz / 'soil_health_factors_FULL.png',
+            tables / 'figure_render_log_visualizations_FULL.csv'
+        ]),
+        script_stage('categorical', 'full_eda_categorical_advanced.py', eda_dir, sources=dataset_files, files=[
+            viz / 'cover_crop*_distribution_FULL.png', tables / 'crop_summary_FULL.csv',
+            viz / 'crop_distribution_FULL.png', tables / 'soil_health_by_cover_crop*_FULL.csv',
+            viz / 'soil_health_by_cover_boxplot_FULL.png', viz / 'npk_comparison_FULL.png',
+            viz / 'traditional_vs_haney_FULL.png', viz / 'om_vs_health_FULL.png',
+            tables / 'figure_render_log_categorical_FULL.csv'
+        ]),
+    ]
+
+
+def main():
+    """Run the full-dataset EDA stages."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parallel stages (default: CPU count)')
+    parser.add_argument('--base-dir', type=Path, default=DEFAULT_BASE_DIR,
+                        help='directory holding data/ and agwise_eda/')
+    parser.add_argument('--dedup', action='store_true',
+                        help='store each unique sample once, with a provenance table of its source files')
+    parser.add_argument('--stream', action='store_true',
+                        help='ingest and profile chunk by chunk, for datasets larger than memory')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='run every stage even if its cached result is current')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record peak Python heap per stage (tracemalloc; slows stages)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("FULL DATASET EDA - STAGE PIPELINE")
+    print("="*80)
+    print(f"Start time: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    eda_dir = args.base_dir / 'agwise_eda'
+    cache = None if args.no_cache else StageCache(eda_dir / '.stage_cache')
+    start_time = time.time()
+    stages = build_stages(args.base_dir, dedup=args.dedup, stream=args.stream)
+    _, run_log = run_pipeline(stages, workers=args.workers, cache=cache,
+                              trace_memory=args.trace_memory)
+    total_time = time.time() - start_time
+
+    run_log_path = eda_dir / 'outputs' / 'tables' / 'full_eda_run_log.csv'
+    run_log_path.parent.mkdir(parents=True, exist_ok=True)
+    run_log.to_csv(run_log_path, index=False)
+
+    print(f"\n{'='*80}")
+    print("FULL EDA COMPLETE")
+    print(f"{'='*80}")
+    print(f"Total runtime: {total_time:.2f} seconds")
+    print(run_log[['stage', 'status', 'seconds', 'max_rss_mb']].to_string(index=False))
+    print(f"\n✓ Stage log saved to: {run_log_path}")
+
+    return 0 if run_log['status'].isin(['ok', 'cached']).all() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())